@@ -0,0 +1,244 @@
+"""
+Outcome and choice-path analytics over reflection sheet submissions.
+
+Submissions are loaded once into a pandas frame with one row per submission
+and, for path reports, an exploded frame with one row per choice. Reports:
+1. Outcome distribution per scenario
+2. Most common choice sequences per scenario
+3. Branch-level drop-off: for each choice at each step, how many submissions
+   reached it and how many ended there instead of continuing
+4. Per-section comparisons using the roster's Class Period column
+
+Analyses are cached by data version (a digest of the submission rows and the
+roster file, or the SQLite mirror's sync counter), so repeated views of
+unchanged data reuse the computed reports.
+
+Usage:
+    python analytics.py --csv reflections.csv --roster fall25roster.csv
+    python analytics.py --mirror reflections.sqlite3 --roster fall25roster.csv
+    python analytics.py --csv reflections.csv --scenario "The Rio Grande Dilemma" --top 5
+"""
+
+import argparse
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+PATH_SEPARATOR = " → "
+NO_CHOICES = "No choices recorded"
+UNMATCHED_SECTION = "Unmatched"
+CACHE_SIZE = 8
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def records_version(records):
+    """Digest of the submission rows, used as the cache key for their analysis."""
+    digest = hashlib.blake2b(digest_size=16)
+    for record in records:
+        digest.update("\x1f".join(str(value) for value in record.values()).encode("utf-8"))
+        digest.update(b"\x1e")
+    return digest.hexdigest()
+
+
+def roster_version(roster_file):
+    if not roster_file or not os.path.exists(roster_file):
+        return None
+    stat = os.stat(roster_file)
+    return f"{os.path.abspath(roster_file)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def submissions_frame(records):
+    """Build the per-submission frame from sheet records."""
+    frame = pd.DataFrame.from_records(records)
+    for column in ("Timestamp", "Student Name", "Scenario Title", "Scenario Outcome", "Choices Made",
+                   "Completion Status"):
+        if column not in frame:
+            frame[column] = ""
+    frame = pd.DataFrame({
+        "submitted": pd.to_datetime(frame["Timestamp"], format="%Y-%m-%d %H:%M:%S", errors="coerce"),
+        "student": frame["Student Name"].fillna("").astype(str).str.strip(),
+        "scenario": frame["Scenario Title"].fillna("").astype(str).str.strip(),
+        "outcome": frame["Scenario Outcome"].fillna("").astype(str).str.strip(),
+        "path": frame["Choices Made"].fillna("").astype(str).str.strip(),
+        "completed": frame["Completion Status"].fillna("").astype(str).str.strip().str.lower() == "completed",
+    })
+    frame = frame[frame["scenario"] != ""].reset_index(drop=True)
+    frame.loc[frame["path"] == NO_CHOICES, "path"] = ""
+    frame["steps"] = frame["path"].str.count(PATH_SEPARATOR).where(frame["path"] != "", -1) + 1
+    return frame
+
+
+def choices_frame(submissions):
+    """Explode submissions into one row per choice with its step number."""
+    choices = submissions.loc[submissions["steps"] > 0, ["scenario", "path", "steps"]].copy()
+    choices["choice"] = choices["path"].str.split(PATH_SEPARATOR)
+    choices = choices.explode("choice")
+    choices["submission"] = choices.index
+    choices["step"] = choices.groupby(level=0).cumcount() + 1
+    return choices.reset_index(drop=True)[["submission", "scenario", "step", "choice", "steps"]]
+
+
+def roster_sections(roster_file):
+    """Return {lower-cased name: Class Period} for both roster name formats."""
+    roster = pd.read_csv(roster_file, dtype=str).fillna("")
+    if "Class Period" not in roster:
+        roster["Class Period"] = ""
+    section = roster["Class Period"].str.strip().replace("", UNMATCHED_SECTION)
+    last_first = (roster["Last Name"].str.strip() + ", " + roster["First Name"].str.strip()).str.lower()
+    first_last = (roster["First Name"].str.strip() + " " + roster["Last Name"].str.strip()).str.lower()
+    return {**dict(zip(first_last, section)), **dict(zip(last_first, section))}
+
+
+class SubmissionAnalytics:
+    """Reports over one version of the submission data; each report is computed once."""
+
+    def __init__(self, submissions, version, sections=None):
+        self.submissions = submissions
+        self.version = version
+        if sections is not None:
+            self.submissions = submissions.assign(
+                section=submissions["student"].str.lower().map(sections).fillna(UNMATCHED_SECTION)
+            )
+        self._choices = None
+        self._reports = {}
+        self._lock = threading.Lock()
+
+    @property
+    def choices(self):
+        if self._choices is None:
+            self._choices = choices_frame(self.submissions)
+        return self._choices
+
+    def _report(self, key, build):
+        with self._lock:
+            if key not in self._reports:
+                self._reports[key] = build()
+            return self._reports[key]
+
+    def scenarios(self):
+        return sorted(self.submissions["scenario"].unique())
+
+    def outcome_distribution(self, completed_only=True):
+        """Columns scenario, outcome, count, share (of the scenario's submissions)."""
+        def build():
+            frame = self.submissions[self.submissions["completed"]] if completed_only else self.submissions
+            counts = frame.groupby(["scenario", "outcome"]).size().rename("count").reset_index()
+            counts["share"] = counts["count"] / counts.groupby("scenario")["count"].transform("sum")
+            return counts.sort_values(["scenario", "count"], ascending=[True, False], ignore_index=True)
+        return self._report(("outcomes", completed_only), build)
+
+    def common_paths(self, top=10):
+        """The top most frequent full choice sequences per scenario, with count and share."""
+        def build():
+            frame = self.submissions[self.submissions["completed"]]
+            counts = frame.groupby(["scenario", "path", "outcome"]).size().rename("count").reset_index()
+            counts["share"] = counts["count"] / counts.groupby("scenario")["count"].transform("sum")
+            counts = counts.sort_values(["scenario", "count"], ascending=[True, False], ignore_index=True)
+            return counts.groupby("scenario", sort=False).head(top).reset_index(drop=True)
+        return self._report(("paths", top), build)
+
+    def drop_off(self):
+        """Per scenario, step and choice: submissions reaching it, ending there, and the drop-off rate."""
+        def build():
+            choices = self.choices
+            frame = choices.assign(ended=choices["step"] == choices["steps"])
+            branches = frame.groupby(["scenario", "step", "choice"]).agg(
+                reached=("submission", "size"), ended=("ended", "sum")
+            ).reset_index()
+            branches["continued"] = branches["reached"] - branches["ended"]
+            branches["drop_off"] = branches["ended"] / branches["reached"]
+            return branches.sort_values(["scenario", "step", "reached"], ascending=[True, True, False],
+                                        ignore_index=True)
+        return self._report(("drop_off",), build)
+
+    def by_section(self):
+        """Per section and scenario: submissions, distinct students and outcome shares (one column per outcome)."""
+        def build():
+            if "section" not in self.submissions:
+                raise ValueError("No roster loaded; pass roster_file to analyze()")
+            frame = self.submissions[self.submissions["completed"]]
+            # Count a student once however they capitalized their name
+            frame = frame.assign(student=frame["student"].str.lower())
+            summary = frame.groupby(["section", "scenario"]).agg(
+                submissions=("student", "size"), students=("student", "nunique")
+            )
+            shares = pd.crosstab([frame["section"], frame["scenario"]], frame["outcome"], normalize="index")
+            return summary.join(shares).reset_index()
+        return self._report(("sections",), build)
+
+
+def analyze(records, roster_file=None, data_version=None):
+    """Return the cached SubmissionAnalytics for these records and roster, building it on a new data version.
+
+    Callers that already know the records' version (such as the SQLite mirror's
+    sync counter) can pass it as data_version to skip hashing the rows.
+    """
+    version = (data_version or records_version(records), roster_version(roster_file))
+    with _cache_lock:
+        analytics = _cache.get(version)
+        if analytics is not None:
+            _cache.move_to_end(version)
+            return analytics
+
+    sections = roster_sections(roster_file) if version[1] else None
+    analytics = SubmissionAnalytics(submissions_frame(records), version, sections)
+    with _cache_lock:
+        _cache[version] = analytics
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return analytics
+
+
+def _print_frame(title, frame):
+    print(f"\n{title}")
+    print("-" * len(title))
+    print(frame.to_string(index=False, float_format=lambda value: f"{value:.2f}") if len(frame) else "(none)")
+
+
+def main():
+    """Print the analytics reports for a reflection sheet export."""
+    from sheet_archive import ARCHIVE_DIR, archive_version, with_archived
+    from workload_replay import load_sheet_export
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv", help="CSV export of the reflection sheet")
+    source.add_argument("--mirror", help="SQLite mirror of the reflection sheet (see sheet_mirror.py)")
+    parser.add_argument("--roster", help="Roster CSV with a Class Period column for section comparisons")
+    parser.add_argument("--scenario", help="Only report on this scenario title")
+    parser.add_argument("--top", type=int, default=10, help="Choice sequences to show per scenario")
+    parser.add_argument("--archive", default=ARCHIVE_DIR,
+                        help=f"Include rows archived by sheet_archive.py in this directory (default {ARCHIVE_DIR})")
+    args = parser.parse_args()
+
+    if args.mirror:
+        import sheet_mirror
+
+        conn = sheet_mirror.connect(args.mirror)
+        try:
+            analytics = analyze(with_archived(sheet_mirror.load_records(conn), archive_dir=args.archive), args.roster,
+                                f"{os.path.abspath(args.mirror)}:{sheet_mirror.data_version(conn)}:"
+                                f"{archive_version(args.archive)}")
+        finally:
+            conn.close()
+    else:
+        analytics = analyze(with_archived(load_sheet_export(args.csv), archive_dir=args.archive), args.roster)
+    print(f"{len(analytics.submissions)} submissions across {len(analytics.scenarios())} scenarios")
+
+    def only(frame):
+        return frame[frame["scenario"] == args.scenario] if args.scenario else frame
+
+    _print_frame("Outcomes", only(analytics.outcome_distribution()))
+    _print_frame("Most common choice sequences", only(analytics.common_paths(args.top)))
+    _print_frame("Branch drop-off", only(analytics.drop_off()))
+    if args.roster:
+        _print_frame("By section", only(analytics.by_section()))
+
+
+if __name__ == "__main__":
+    main()
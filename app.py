@@ -1,7 +1,14 @@
 import streamlit as st
+import hmac
 import os
+from datetime import datetime
 from pathlib import Path
-from scenario_engine import ScenarioEngine, get_available_scenarios
+from scenario_engine import ScenarioEngine, get_available_scenarios, get_current_scene_id
+from profiling import profile_rerun, should_profile
+from dashboard_data import REFRESH_SECONDS, get_dashboard
+from generate_grades import CUTOFF_DATE
+import grade_export
+import sheet_archive
 
 def get_scenario_icon(scenario_id):
     """Get appropriate icon for each scenario"""
@@ -16,19 +23,149 @@ def get_scenario_icon(scenario_id):
 def main():
     # Check if we're running a specific scenario
     scenario_param = st.query_params.get("scenario")
-    
-    if scenario_param:
-        # Run specific scenario
-        scenario_path = Path(f"scenarios/{scenario_param}")
-        if scenario_path.exists() and (scenario_path / "config.json").exists():
-            engine = ScenarioEngine(scenario_path)
-            engine.run()
+
+    # Capture this rerun with cProfile/tracemalloc when profiling is requested
+    with profile_rerun(
+        scenario_param or "selector",
+        get_current_scene_id() or "start",
+        enabled=should_profile(st.query_params)
+    ):
+        if st.query_params.get("page") == "instructor":
+            show_instructor_dashboard()
+        elif st.query_params.get("page") == "grades":
+            show_grade_export()
+        elif scenario_param:
+            # Run specific scenario
+            scenario_path = Path(f"scenarios/{scenario_param}")
+            if scenario_path.exists() and (scenario_path / "config.json").exists():
+                engine = ScenarioEngine(scenario_path)
+                engine.run()
+            else:
+                st.error(f"Scenario '{scenario_param}' not found")
+                show_scenario_selector()
         else:
-            st.error(f"Scenario '{scenario_param}' not found")
+            # Show scenario selector
             show_scenario_selector()
-    else:
-        # Show scenario selector
-        show_scenario_selector()
+
+def show_instructor_dashboard():
+    st.set_page_config(
+        page_title="Instructor Dashboard",
+        page_icon="📊",
+        layout="wide"
+    )
+
+    if not has_instructor_key():
+        return
+
+    st.title("📊 Class Progress")
+    st.caption(f"Completed reflections by scenario and class period, updated every {REFRESH_SECONDS:g} seconds.")
+    display_dashboard_panel()
+
+def has_instructor_key():
+    """Instructor pages need &key=<SCENARIO_INSTRUCTOR_TOKEN> and stay closed while no token is set"""
+    token = os.getenv("SCENARIO_INSTRUCTOR_TOKEN")
+    if not token:
+        st.error("Instructor pages are disabled. Set SCENARIO_INSTRUCTOR_TOKEN to enable them.")
+        return False
+    if not hmac.compare_digest(str(st.query_params.get("key", "")), token):
+        st.error("This page requires the instructor link.")
+        return False
+    return True
+
+def show_grade_export():
+    st.set_page_config(
+        page_title="Grade Export",
+        page_icon="📝",
+        layout="centered"
+    )
+
+    if not has_instructor_key():
+        return
+
+    st.title("📝 Grade Export")
+    st.caption(f"Grades every completed scenario against {grade_export.ROSTER_FILE} and packs the grade "
+               "import CSVs and gradebooks into one ZIP.")
+    cutoff = st.date_input("Names are \"LastName, FirstName\" from", value=CUTOFF_DATE.date())
+
+    if st.button("Build grade export", type="primary"):
+        with st.spinner("Reading the sheet and matching names..."):
+            try:
+                st.session_state.grade_export = grade_export.export_grades(
+                    datetime.combine(cutoff, datetime.min.time())
+                )
+            except Exception as e:
+                st.session_state.pop("grade_export", None)
+                st.error(f"Error building grade export: {e}")
+
+    if "grade_export" in st.session_state:
+        data, summary = st.session_state.grade_export
+        col1, col2 = st.columns(2)
+        col1.metric("Grades", summary["graded"])
+        col2.metric("Unmatched entries", summary["unmatched"])
+        st.download_button(
+            "Download grades (ZIP)",
+            data=data,
+            file_name=f"grades_{datetime.now():%Y-%m-%d}.zip",
+            mime="application/zip",
+            on_click="ignore"
+        )
+        st.dataframe(
+            [{"File": filename, "Rows": count} for filename, count in summary["files"]],
+            width="stretch",
+            hide_index=True
+        )
+        if summary["unmatched"]:
+            st.warning("Some names couldn't be matched. Fill in OrgDefinedId in unmatched_students.csv "
+                       "and import it with name_aliases.py.")
+        if summary["live_only"]:
+            st.warning(f"No archive found in {sheet_archive.ARCHIVE_DIR}/ on this server, so this export covers "
+                       "the live sheet only. If old terms were moved out with sheet_archive.py, their grades "
+                       "are missing; run generate_grades.py where the archive is kept.")
+
+@st.fragment(run_every=REFRESH_SECONDS)
+def display_dashboard_panel():
+    """Completion and outcome tables from the shared live aggregates"""
+    dashboard = get_dashboard()
+    dashboard.refresh()
+    if dashboard.error:
+        st.error(f"Error reading submissions: {dashboard.error}")
+
+    completions = dashboard.aggregates.completions
+    outcomes = dashboard.aggregates.outcomes
+    if completions.empty:
+        st.info("No completed reflections yet.")
+        return
+
+    col1, col2 = st.columns(2)
+    with col1:
+        scenario = st.selectbox("Scenario", ["All scenarios"] + sorted(completions["scenario"].unique()))
+    with col2:
+        section = st.selectbox("Class Period", ["All periods"] + sorted(completions["section"].unique()))
+    if scenario != "All scenarios":
+        completions = completions[completions["scenario"] == scenario]
+        outcomes = outcomes[outcomes["scenario"] == scenario]
+    if section != "All periods":
+        completions = completions[completions["section"] == section]
+        outcomes = outcomes[outcomes["section"] == section]
+
+    col1, col2 = st.columns(2)
+    col1.metric("Students finished", int(completions["students"].sum()))
+    col2.metric("Reflections submitted", int(completions["submissions"].sum()))
+
+    st.subheader("Students finished")
+    st.dataframe(
+        completions.pivot_table(index="scenario", columns="section", values="students", aggfunc="sum", fill_value=0),
+        width="stretch"
+    )
+
+    st.subheader("Outcomes")
+    st.dataframe(
+        outcomes.pivot_table(index=["scenario", "section"], columns="outcome", values="count", aggfunc="sum", fill_value=0),
+        width="stretch"
+    )
+
+    if dashboard.last_refresh:
+        st.caption(f"Last checked {datetime.fromtimestamp(dashboard.last_refresh):%H:%M:%S}")
 
 def show_scenario_selector():
     st.set_page_config(
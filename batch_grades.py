@@ -0,0 +1,191 @@
+"""
+Generate grades for several courses and terms at once from a job manifest.
+
+Each job names a reflection sheet, a roster, an output directory and the date
+the form switched to "LastName, FirstName" names. With a partitioned sheet
+(SCENARIO_SHEET_PARTITION), "term" picks the partitions to read, by default the
+current term:
+
+    {
+      "jobs": [
+        {"name": "Fall 25", "sheet_url": "https://docs.google.com/...", "roster": "fall25roster.csv",
+         "output_dir": "grades/fall25", "cutoff_date": "2025-10-09"},
+        {"name": "Spring 26", "sheet_url": "https://docs.google.com/...", "roster": "spring26roster.csv",
+         "output_dir": "grades/spring26", "cutoff_date": "2026-01-05", "term": "Spring 2026"}
+      ]
+    }
+
+Sheets are fetched concurrently by a thread pool (each distinct sheet and term
+once, even if several jobs share it). As each sheet arrives, its jobs are handed to
+a process pool for the CPU-bound name matching, so the whole batch takes
+about as long as its slowest job. Each output directory gets its grade CSVs,
+the gradebook matrix and per-section gradebooks, plus unmatched_students.csv,
+which lists every submission name the roster could not place, grouped by name
+and scenario. Jobs share each roster's alias table (see name_aliases.py).
+
+Usage:
+    python batch_grades.py grade_jobs.json
+    python batch_grades.py grade_jobs.json --fetch-workers 4 --match-workers 2
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+from generate_grades import (
+    CUTOFF_DATE,
+    get_google_sheets_client,
+    load_roster,
+    match_completions,
+    read_google_sheet,
+    write_grade_csvs,
+    write_gradebook,
+)
+from name_aliases import NameAliases, export_unmatched
+from sheet_partitions import current_term, partitioned
+
+FETCH_WORKERS = int(os.getenv("SCENARIO_FETCH_WORKERS", "8"))
+MATCH_WORKERS = int(os.getenv("SCENARIO_MATCH_WORKERS", str(os.cpu_count() or 2)))
+
+_local = threading.local()
+
+
+def load_manifest(path):
+    """Read a manifest file into a list of job dicts with defaults filled in."""
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    jobs = manifest["jobs"] if isinstance(manifest, dict) else manifest
+
+    base = Path(path).resolve().parent
+    loaded = []
+    for number, job in enumerate(jobs, start=1):
+        sheet_url = job.get("sheet_url") or os.getenv("GOOGLE_SHEET_URL")
+        if not sheet_url:
+            raise ValueError(f"Job {number} has no sheet_url and GOOGLE_SHEET_URL is not set")
+        name = job.get("name", f"job{number}")
+        cutoff = job.get("cutoff_date")
+        loaded.append({
+            "name": name,
+            "sheet_url": sheet_url,
+            "roster": str(base / job.get("roster", "fall25roster.csv")),
+            "output_dir": str(base / job.get("output_dir", f"grade_outputs/{name}")),
+            "cutoff_date": datetime.strptime(cutoff, "%Y-%m-%d") if cutoff else CUTOFF_DATE,
+            "term": job.get("term") or (current_term() if partitioned() else None),
+        })
+    return loaded
+
+
+def _thread_client():
+    # Each fetch thread keeps its own authorized client (and HTTP session)
+    if not hasattr(_local, "client"):
+        _local.client = get_google_sheets_client()
+    return _local.client
+
+
+def fetch_sheet(sheet_url, term=None, client=None):
+    records = read_google_sheet(sheet_url, client=client or _thread_client(), terms=[term] if term else None)
+    if records is None:
+        raise RuntimeError("Could not read Google Sheet")
+    return records
+
+
+def grade_job(job, records):
+    """Match one job's records against its roster and write its outputs (runs in a worker process)."""
+    started = time.perf_counter()
+    roster_lastname_first, roster_firstname_last, all_names = load_roster(job["roster"])
+    aliases = NameAliases.for_roster(job["roster"])
+    result = match_completions(records, roster_lastname_first, roster_firstname_last, all_names,
+                               job["cutoff_date"], aliases=aliases)
+    aliases.save()
+    files = write_grade_csvs(result["completions"], job["output_dir"])
+    gradebooks = write_gradebook(result["completions"], job["roster"], job["output_dir"])
+    report, unmatched_names = export_unmatched(result["unmatched"], job["output_dir"])
+    return {
+        "name": job["name"],
+        "files": files,
+        "gradebooks": gradebooks,
+        "records": len(records),
+        "graded": sum(count for _, count in files),
+        "unmatched": len(result["unmatched"]),
+        "unmatched_names": unmatched_names,
+        "unmatched_report": report,
+        "seconds": time.perf_counter() - started,
+        "error": None,
+    }
+
+
+def _failed(job, error):
+    return {"name": job["name"], "files": [], "gradebooks": [], "records": 0, "graded": 0, "unmatched": 0,
+            "unmatched_names": 0, "unmatched_report": None, "seconds": 0.0, "error": error}
+
+
+def run_batch(jobs, fetch_workers=FETCH_WORKERS, match_workers=MATCH_WORKERS, client=None):
+    """Run all jobs; returns one result dict per job, in manifest order."""
+    by_sheet = {}
+    for index, job in enumerate(jobs):
+        by_sheet.setdefault((job["sheet_url"], job.get("term")), []).append(index)
+
+    results = [None] * len(jobs)
+    with ThreadPoolExecutor(max_workers=max(1, min(fetch_workers, len(by_sheet)))) as fetchers, \
+            ProcessPoolExecutor(max_workers=max(1, min(match_workers, len(jobs)))) as matchers:
+        fetches = {fetchers.submit(fetch_sheet, sheet_url, term, client): (sheet_url, term)
+                   for sheet_url, term in by_sheet}
+        grading = {}
+        for fetch in as_completed(fetches):
+            indexes = by_sheet[fetches[fetch]]
+            try:
+                records = fetch.result()
+            except Exception as e:
+                for index in indexes:
+                    results[index] = _failed(jobs[index], str(e))
+                continue
+            for index in indexes:
+                grading[matchers.submit(grade_job, jobs[index], records)] = index
+
+        for future in as_completed(grading):
+            index = grading[future]
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                results[index] = _failed(jobs[index], str(e))
+    return results
+
+
+def main():
+    """Run a grade manifest and print a summary per job."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("manifest", help="JSON job manifest")
+    parser.add_argument("--fetch-workers", type=int, default=FETCH_WORKERS)
+    parser.add_argument("--match-workers", type=int, default=MATCH_WORKERS)
+    args = parser.parse_args()
+
+    jobs = load_manifest(args.manifest)
+    print(f"Batch Grade Generator: {len(jobs)} jobs")
+    print("=" * 60)
+    started = time.perf_counter()
+    results = run_batch(jobs, args.fetch_workers, args.match_workers)
+
+    for result in results:
+        if result["error"]:
+            print(f"\n[FAILED] {result['name']}: {result['error']}")
+            continue
+        print(f"\n{result['name']}: {result['graded']} grades in {len(result['files'])} files "
+              f"from {result['records']} records ({result['seconds']:.1f}s)")
+        for filename, count in result["files"] + result["gradebooks"]:
+            print(f"  - {filename}: {count} students")
+        if result["unmatched"]:
+            print(f"  [WARNING] {result['unmatched']} entries ({result['unmatched_names']} names) unmatched, "
+                  f"see {result['unmatched_report']}")
+
+    failed = sum(1 for result in results if result["error"])
+    print("\n" + "=" * 60)
+    print(f"{len(results) - failed} of {len(results)} jobs succeeded in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
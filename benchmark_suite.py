@@ -0,0 +1,361 @@
+"""
+Micro-benchmarks for the scenario engine and grade generation hot paths.
+
+Each benchmark runs on synthetic inputs of growing size, records the best of
+several timed runs, and writes the results to a JSON file. Results are compared
+against a stored baseline and the run fails when any case is slower than the
+baseline by more than the regression threshold.
+
+Usage:
+    python benchmark_suite.py                      # quick sizes, compare to baseline
+    python benchmark_suite.py --full               # include the largest sizes
+    python benchmark_suite.py --update-baseline    # store current results as the baseline
+    python benchmark_suite.py --only match_student_name --threshold 0.5
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from synthetic_data import generate_roster, generate_sheet_values, write_roster_csv
+
+DEFAULT_RESULTS_FILE = "bench_output.json"
+DEFAULT_BASELINE_FILE = "benchmark_baseline.json"
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_MIN_DELTA = 1e-3  # slowdowns smaller than this are timer and scheduler noise
+CALIBRATION_KEY = "_calibration"
+
+RECORD_SIZES = [10, 100, 1000, 10000]
+FULL_RECORD_SIZES = RECORD_SIZES + [100000]
+ROSTER_SIZES = [70, 500, 2000]
+FULL_ROSTER_SIZES = ROSTER_SIZES + [10000]
+SCENE_SIZES = [10, 100, 1000]
+SCENARIO_COUNTS = [5, 50, 200]
+
+def make_scenario_config(scene_count):
+    """Build a scenario config with a chain of choice scenes and variables."""
+    scenes = {}
+    for i in range(1, scene_count):
+        scenes[str(i)] = {
+            "title": f"Scene {i}",
+            "description": "A synthetic scene " * 10,
+            "narration": "Narration text for the scene. " * 20,
+            "type": "choice",
+            "choices": [
+                {"text": f"Option A for scene {i}", "next": str(i + 1), "effects": {"Support": 1}},
+                {"text": f"Option B for scene {i}", "next": str(i + 1), "effects": {"Support": -1}},
+            ],
+        }
+    scenes[str(scene_count)] = {"title": "The End", "narration": "Done.", "type": "end", "outcome": "success"}
+    return {
+        "metadata": {"title": f"Synthetic {scene_count}", "description": "Benchmark scenario"},
+        "variables": {"Support": 0, "Opposition": 0},
+        "reflection_questions": ["Q1?", "Q2?", "Q3?"],
+        "reflection_prompts": ["P1", "P2", "P3"],
+        "scenes": scenes,
+    }
+
+
+def write_scenario(directory, scene_count):
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / "config.json", "w", encoding="utf-8") as f:
+        json.dump(make_scenario_config(scene_count), f, indent=2)
+
+
+def measure(func, repeat=5, min_time=0.05):
+    """Return the best per-call time of func, looping short calls to reduce timer noise."""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or loops >= 1_000_000:
+            break
+        loops *= 10
+
+    timings = [elapsed / loops]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        timings.append((time.perf_counter() - start) / loops)
+    return min(timings)
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the progress output printed by the functions under test."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+@contextlib.contextmanager
+def working_directory(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def bench_load_config(workdir, full):
+    from scenario_engine import ScenarioEngine
+
+    results = {}
+    for size in SCENE_SIZES:
+        scenario_dir = workdir / f"load_config_{size}"
+        write_scenario(scenario_dir, size)
+        engine = ScenarioEngine(scenario_dir)
+        results[size] = measure(engine.load_config)
+    return results
+
+
+def bench_index_config(workdir, full):
+    import scene_index
+
+    results = {}
+    for size in SCENE_SIZES:
+        config_file = workdir / f"load_config_{size}" / "config.json"
+        if not config_file.exists():
+            write_scenario(config_file.parent, size)
+        data = config_file.read_bytes()
+        # Cold path of load_config: build the scene offset index for a changed file
+        results[size] = measure(lambda: scene_index.index_config(data))
+    return results
+
+
+def bench_evaluate_condition(workdir, full):
+    from scenario_engine import ScenarioEngine
+
+    scenario_dir = workdir / "evaluate_condition"
+    write_scenario(scenario_dir, 10)
+    engine = ScenarioEngine(scenario_dir)
+
+    results = {}
+    for size in [2, 20, 200]:
+        variables = {f"Var{i}": i for i in range(size)}
+        terms = [f"Var{i} >= {i}" for i in range(min(size, 4))]
+        condition = " && ".join(terms) + " || Var0 < -5"
+        results[size] = measure(lambda: engine.evaluate_condition(condition, variables))
+    return results
+
+
+def bench_get_available_scenarios(workdir, full):
+    from scenario_engine import get_available_scenarios
+
+    results = {}
+    for count in SCENARIO_COUNTS:
+        root = workdir / f"available_{count}"
+        for i in range(count):
+            write_scenario(root / "scenarios" / f"scenario_{i}", 20)
+        with working_directory(root):
+            results[count] = measure(get_available_scenarios, repeat=3)
+    return results
+
+
+def bench_load_student_roster(workdir, full):
+    from roster_loader import load_student_roster
+
+    results = {}
+    for size in (FULL_ROSTER_SIZES if full else ROSTER_SIZES):
+        roster_file = workdir / f"roster_{size}.csv"
+        write_roster_csv(generate_roster(size), roster_file)
+        # Time the uncached load; st.cache_data would otherwise return instantly
+        results[size] = measure(lambda: load_student_roster.__wrapped__(str(roster_file)), repeat=3)
+    return results
+
+
+def bench_match_student_name(workdir, full):
+    from generate_grades import load_roster, match_student_name
+
+    cutoff = datetime(2025, 10, 9)
+    results = {}
+    for size in (FULL_ROSTER_SIZES if full else ROSTER_SIZES):
+        rows = generate_roster(size)
+        roster_file = workdir / f"match_roster_{size}.csv"
+        write_roster_csv(rows, roster_file)
+        lastname_first, firstname_last, all_names = load_roster(str(roster_file))
+
+        student = rows[size // 2]
+        exact = f"{student['Last Name']}, {student['First Name']}"
+        typo = f"{student['First Name']} {student['Last Name']}"[:-1]
+
+        results[f"exact_{size}"] = measure(lambda: match_student_name(
+            exact, cutoff, datetime(2025, 10, 15), lastname_first, firstname_last, all_names))
+        results[f"fuzzy_{size}"] = measure(lambda: match_student_name(
+            typo, cutoff, datetime(2025, 9, 15), lastname_first, firstname_last, all_names), repeat=3)
+    return results
+
+
+def _repeats(size):
+    """Loop and repeat small record counts like any short call; time the largest ones once."""
+    return {"repeat": 5} if size < 10000 else {"repeat": 1, "min_time": 0}
+
+
+def _bench_grades(workdir, full, engine):
+    from generate_grades import generate_grade_csvs, load_roster, parse_sheet_values
+
+    rows = generate_roster(ROSTER_SIZES[0])
+    roster_file = workdir / "grades_roster.csv"
+    write_roster_csv(rows, roster_file)
+    lastname_first, firstname_last, all_names = load_roster(str(roster_file))
+
+    results = {}
+    for size in (FULL_RECORD_SIZES if full else RECORD_SIZES):
+        records = parse_sheet_values(generate_sheet_values(size, rows), verbose=False)
+        output_dir = str(workdir / f"grades_{size}")
+        with quiet():
+            results[size] = measure(lambda: generate_grade_csvs(
+                records, lastname_first, firstname_last, all_names, output_dir=output_dir, engine=engine),
+                **_repeats(size))
+    return results
+
+
+def bench_generate_grade_csvs(workdir, full):
+    return _bench_grades(workdir, full, "rows")
+
+
+def bench_generate_grade_csvs_pandas(workdir, full):
+    return _bench_grades(workdir, full, "pandas")
+
+
+def bench_find_similar_reflections(workdir, full):
+    from generate_grades import parse_sheet_values
+    from reflection_similarity import find_similar_reflections
+
+    rows = generate_roster(ROSTER_SIZES[0])
+    results = {}
+    for size in (FULL_RECORD_SIZES if full else RECORD_SIZES):
+        records = parse_sheet_values(generate_sheet_values(size, rows), verbose=False)
+        results[size] = measure(lambda: find_similar_reflections(records), **_repeats(size))
+    return results
+
+
+BENCHMARKS = {
+    "load_config": bench_load_config,
+    "index_config": bench_index_config,
+    "evaluate_condition": bench_evaluate_condition,
+    "get_available_scenarios": bench_get_available_scenarios,
+    "load_student_roster": bench_load_student_roster,
+    "match_student_name": bench_match_student_name,
+    "generate_grade_csvs": bench_generate_grade_csvs,
+    "generate_grade_csvs_pandas": bench_generate_grade_csvs_pandas,
+    "find_similar_reflections": bench_find_similar_reflections,
+}
+
+
+def calibrate():
+    """Time a fixed pure-Python workload so results can be normalised for machine speed."""
+    def workload():
+        total = 0
+        for i in range(20000):
+            total += len(str(i).strip().lower())
+        return total
+    return measure(workload, repeat=7)
+
+
+def run_benchmarks(names=None, full=False):
+    """Run the selected benchmarks and return {"case[size]": seconds}."""
+    results = {CALIBRATION_KEY: calibrate()}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, bench in BENCHMARKS.items():
+            if names and name not in names:
+                continue
+            print(f"Running {name}...")
+            workdir = Path(tmp) / name
+            workdir.mkdir()
+            for size, seconds in bench(workdir, full).items():
+                results[f"{name}[{size}]"] = seconds
+    return results
+
+
+def compare_results(results, baseline, threshold=DEFAULT_THRESHOLD, min_delta=DEFAULT_MIN_DELTA):
+    """Return (case, baseline, current, ratio) for every case slower than baseline * (1 + threshold)."""
+    # Scale the baseline by how much faster or slower this machine ran the calibration workload
+    speed = 1.0
+    if results.get(CALIBRATION_KEY) and baseline.get(CALIBRATION_KEY):
+        speed = results[CALIBRATION_KEY] / baseline[CALIBRATION_KEY]
+
+    regressions = []
+    for case, seconds in results.items():
+        previous = baseline.get(case)
+        if not previous or case == CALIBRATION_KEY:
+            continue
+        previous *= speed
+        ratio = seconds / previous
+        # Ignore jitter on the fastest cases, where a fraction of a millisecond is a large ratio
+        if ratio > 1 + threshold and seconds - previous > min_delta:
+            regressions.append((case, previous, seconds, ratio))
+    return regressions
+
+
+def write_results(results, path):
+    payload = {
+        "generated": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, sort_keys=True)
+
+
+def read_results(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+
+def main():
+    """Run benchmarks, write results and fail on regressions."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--full", action="store_true", help="Include the largest input sizes")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="Run only these benchmarks")
+    parser.add_argument("--output", default=DEFAULT_RESULTS_FILE)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_FILE)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown as a fraction of the baseline (default 0.25)")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.only, args.full)
+    write_results(results, args.output)
+
+    print("\nResults:")
+    for case, seconds in results.items():
+        print(f"  {case:<45} {seconds * 1000:12.4f} ms")
+    print(f"\nWrote {args.output}")
+
+    if args.update_baseline:
+        baseline = read_results(args.baseline) if os.path.exists(args.baseline) else {}
+        baseline.update(results)
+        write_results(baseline, args.baseline)
+        print(f"Updated baseline {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"[WARNING] No baseline at {args.baseline}; run with --update-baseline to create one")
+        return 0
+
+    regressions = compare_results(results, read_results(args.baseline), args.threshold)
+    if regressions:
+        print(f"\n[FAIL] {len(regressions)} cases regressed by more than {args.threshold:.0%}:")
+        for case, previous, seconds, ratio in regressions:
+            print(f"  - {case}: {previous * 1000:.4f} ms -> {seconds * 1000:.4f} ms ({ratio:.2f}x)")
+        return 1
+
+    print(f"\n[OK] No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+"""
+Live class-progress aggregates for the instructor dashboard.
+
+Instead of reading the whole reflection sheet on every page view, each server
+process keeps running totals of completions by scenario, section and outcome.
+It reads only the rows appended since its last read, with one ranged read
+("A<next row>:I") every SCENARIO_DASHBOARD_REFRESH seconds (default 15).
+However many teachers have the page open, a process makes at most one Sheets
+read per interval, and it never writes, so student submissions keep their
+quota.
+
+Sections come from the Class Period column of SCENARIO_ROSTER_FILE (default
+spring26roster.csv). Each read also re-reads the last row seen; if it is
+gone or different (rows were deleted above it, as sheet_archive.py does), the
+totals are rebuilt from the first row straight away. Every
+SCENARIO_DASHBOARD_REBUILD seconds (default 1800) they are rebuilt anyway,
+which picks up edits to older rows. With a partitioned sheet (SCENARIO_SHEET_PARTITION), only the
+current term's partitions are followed, plus the current term's rows still
+in the unpartitioned first worksheet; partitions created since the last
+rebuild are picked up at the next one.
+"""
+
+import os
+import threading
+import time
+from collections import Counter
+
+import pandas as pd
+
+from analytics import UNMATCHED_SECTION, roster_sections, submissions_frame
+from generate_grades import detect_headers, parse_sheet_values
+from sheet_partitions import current_term, legacy_records, partitioned, select_partitions, unpartitioned
+from tracing import span
+
+REFRESH_SECONDS = float(os.getenv("SCENARIO_DASHBOARD_REFRESH", "15"))
+REBUILD_SECONDS = float(os.getenv("SCENARIO_DASHBOARD_REBUILD", "1800"))
+ROSTER_FILE = os.getenv("SCENARIO_ROSTER_FILE", "spring26roster.csv")
+LAST_COLUMN = "I"
+
+_dashboard = None
+_dashboard_lock = threading.Lock()
+
+
+class LiveAggregates:
+    """Completion totals that grow batch by batch; readers get small immutable frames."""
+
+    def __init__(self, sections=None):
+        self.sections = sections or {}
+        self.rows = 0
+        self._outcome_counts = Counter()
+        self._students = {}
+        self.completions = pd.DataFrame(columns=["scenario", "section", "students", "submissions"])
+        self.outcomes = pd.DataFrame(columns=["scenario", "section", "outcome", "count"])
+
+    def add_records(self, records):
+        """Fold new sheet records into the totals."""
+        self.rows += len(records)
+        if not records:
+            return
+        frame = submissions_frame(records)
+        frame = frame[frame["completed"]]
+        if frame.empty:
+            return
+        student = frame["student"].str.lower()
+        frame = frame.assign(student=student, section=student.map(self.sections).fillna(UNMATCHED_SECTION))
+
+        for key, count in frame.groupby(["scenario", "section", "outcome"]).size().items():
+            self._outcome_counts[key] += count
+        for key, names in frame.groupby(["scenario", "section"])["student"]:
+            self._students.setdefault(key, set()).update(names)
+        self._publish()
+
+    def _publish(self):
+        outcomes = pd.DataFrame(
+            [(*key, count) for key, count in self._outcome_counts.items()],
+            columns=["scenario", "section", "outcome", "count"],
+        )
+        submissions = outcomes.groupby(["scenario", "section"])["count"].sum()
+        completions = pd.DataFrame(
+            [(scenario, section, len(names), submissions[(scenario, section)])
+             for (scenario, section), names in self._students.items()],
+            columns=["scenario", "section", "students", "submissions"],
+        )
+        # Swap whole frames so concurrent readers never see a half-updated table
+        self.outcomes = outcomes.sort_values(["scenario", "section", "outcome"], ignore_index=True)
+        self.completions = completions.sort_values(["scenario", "section"], ignore_index=True)
+
+
+class SheetTail:
+    """Reads the rows appended to a worksheet since the previous read."""
+
+    def __init__(self, worksheet, terms=None):
+        self.worksheet = worksheet
+        self.terms = terms  # keep only these terms' rows (for the unpartitioned worksheet)
+        self.next_row = 1
+        self.last_row = None
+        self.headers = None
+
+    def fetch(self):
+        """Records appended since the last fetch, or None if the rows already read have moved."""
+        with span("sheets.get_tail"):
+            values = self.worksheet.get(f"A{max(self.next_row - 1, 1)}:{LAST_COLUMN}")
+        values = [list(row) for row in values]
+        if self.last_row is not None:
+            # The last row read must still be where we left it
+            if not values or values[0] != self.last_row:
+                return None
+            values = values[1:]
+        if not values:
+            return []
+        self.next_row += len(values)
+        self.last_row = values[-1]
+        if self.headers is None:
+            self.headers, values = detect_headers(values)
+        records = parse_sheet_values(values, verbose=False, headers=self.headers)
+        return legacy_records(records, self.terms) if self.terms else records
+
+
+def _open_reflection_worksheet():
+    """The reflection worksheet, or the current term's partitions when SCENARIO_SHEET_PARTITION is set."""
+    from sheets_integration import _authorize_client, get_sheet_url
+
+    sheet_url = get_sheet_url()
+    if not sheet_url:
+        raise RuntimeError("Google Sheet URL not configured in environment or secrets.")
+    with span("sheets.open_by_url"):
+        spreadsheet = _authorize_client().open_by_url(sheet_url)
+    if partitioned():
+        return select_partitions(spreadsheet, [current_term()])
+    return spreadsheet.sheet1
+
+
+class LiveDashboard:
+    """Process-wide aggregates, refreshed by at most one caller per interval."""
+
+    def __init__(self, open_worksheet=_open_reflection_worksheet, roster_file=ROSTER_FILE,
+                 refresh_seconds=REFRESH_SECONDS, rebuild_seconds=REBUILD_SECONDS):
+        self.open_worksheet = open_worksheet
+        self.roster_file = roster_file
+        self.refresh_seconds = refresh_seconds
+        self.rebuild_seconds = rebuild_seconds
+        self.aggregates = LiveAggregates()
+        self.last_refresh = None
+        self.error = None
+        self._tails = None
+        self._rebuilt_at = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self, force=False):
+        """Read new rows if the interval has passed; callers arriving mid-refresh use the current totals."""
+        now = time.time()
+        if not force and self.last_refresh is not None and now - self.last_refresh < self.refresh_seconds:
+            return
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if force or self._tails is None or now - self._rebuilt_at >= self.rebuild_seconds:
+                self._rebuild(now)
+            else:
+                batches = [tail.fetch() for tail in self._tails]
+                if any(records is None for records in batches):
+                    self._rebuild(now)
+                else:
+                    for records in batches:
+                        self.aggregates.add_records(records)
+            self.error = None
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self.last_refresh = now
+            self._lock.release()
+
+    def _rebuild(self, now):
+        """Recount from the first row of every worksheet."""
+        sections = roster_sections(self.roster_file) if os.path.exists(self.roster_file) else {}
+        worksheets = self.open_worksheet()
+        if not isinstance(worksheets, list):
+            worksheets = [worksheets]
+        # Alongside partitions, the unpartitioned worksheet counts only the current term's rows
+        terms = [current_term()] if partitioned() else None
+        tails = [SheetTail(worksheet, terms if terms and unpartitioned(worksheet) else None)
+                 for worksheet in worksheets]
+        aggregates = LiveAggregates(sections)
+        for tail in tails:
+            aggregates.add_records(tail.fetch())
+        self._tails, self.aggregates, self._rebuilt_at = tails, aggregates, now
+
+
+def get_dashboard():
+    """Return this process's LiveDashboard."""
+    global _dashboard
+    if _dashboard is None:
+        with _dashboard_lock:
+            if _dashboard is None:
+                _dashboard = LiveDashboard()
+    return _dashboard
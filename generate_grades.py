@@ -16,6 +16,9 @@ import os
 from datetime import datetime
 from difflib import get_close_matches
 from pathlib import Path
+import sheet_cache
+from name_aliases import NameAliases, export_unmatched
+from tracing import span
 
 
 def get_google_sheets_client():
@@ -107,7 +110,7 @@ def load_roster(roster_file="fall25roster.csv"):
 
 
 def match_student_name(student_name, cutoff_date, entry_date,
-                      roster_lastname_first, roster_firstname_last, all_names):
+                      roster_lastname_first, roster_firstname_last, all_names, aliases=None):
     """
     Match student name to roster entry.
 
@@ -118,15 +121,20 @@ def match_student_name(student_name, cutoff_date, entry_date,
         roster_lastname_first: Dict with "LastName, FirstName" format
         roster_firstname_last: Dict with "FirstName LastName" format
         all_names: List of all name variations for fuzzy matching
+        aliases: Optional NameAliases (name_aliases.py); manual aliases apply
+            to any entry, and fuzzy results are looked up and remembered there
 
     Returns:
         OrgDefinedId or None if no match found
     """
     student_name_lower = student_name.strip().lower()
 
-    # After cutoff date, use exact "LastName, FirstName" matching
+    # After cutoff date, use exact "LastName, FirstName" matching (or a name resolved by hand)
     if entry_date >= cutoff_date:
-        return roster_lastname_first.get(student_name_lower)
+        org_id = roster_lastname_first.get(student_name_lower)
+        if org_id is None and aliases is not None:
+            org_id = aliases.manual.get(student_name_lower)
+        return org_id
 
     # Before cutoff date, try multiple approaches
     # 1. Try exact match with both formats
@@ -135,96 +143,152 @@ def match_student_name(student_name, cutoff_date, entry_date,
     if student_name_lower in roster_firstname_last:
         return roster_firstname_last[student_name_lower]
 
-    # 2. Try fuzzy matching
+    # 2. Try the alias table
+    if aliases is not None:
+        if student_name_lower in aliases.manual:
+            return aliases.manual[student_name_lower]
+        learned = aliases.learned.get(student_name)
+        if learned is not None:
+            return learned or None
+
+    # 3. Try fuzzy matching
     name_strings = [name for name, _ in all_names]
     matches = get_close_matches(student_name, name_strings, n=1, cutoff=0.85)
+    match = None
     if matches:
         # Find the org_id for the matched name
         for name, org_id in all_names:
             if name == matches[0]:
-                return org_id
+                match = org_id
+                break
+    if aliases is not None:
+        aliases.learn(student_name, match)
+    return match
+
+
+# Points written for each completed scenario
+GRADE_POINTS = '20'
+
+# "rows" (one record at a time) or "pandas" (vectorized_grades.py)
+GRADE_ENGINE = os.getenv("SCENARIO_GRADE_ENGINE", "rows")
+
+# Date the reflection form switched to "LastName, FirstName" names
+CUTOFF_DATE = datetime(2025, 10, 9)
+
+# Expected headers based on sheets_integration.py
+EXPECTED_HEADERS = [
+    "Timestamp",
+    "Student Name",
+    "Scenario Title",
+    "Scenario Outcome",
+    "Choices Made",
+    "Reflection 1",
+    "Reflection 2",
+    "Reflection 3",
+    "Completion Status"
+]
+
+
+def detect_headers(all_values, verbose=False):
+    """Return (headers, data rows) for raw sheet rows that may or may not start with a header row."""
+    # Check if first row contains headers or data
+    # If first cell looks like a timestamp, there are no headers
+    first_cell = all_values[0][0] if all_values and all_values[0] else ""
+    has_headers = not (first_cell and ("-" in first_cell or "/" in first_cell) and ":" in first_cell)
+
+    if has_headers:
+        # Standard case: first row is headers
+        if verbose:
+            print("   Detected header row in sheet")
+        return all_values[0], all_values[1:]
+
+    # No headers: use expected headers and treat all rows as data
+    if verbose:
+        print("   No headers detected - using expected column order")
+    return EXPECTED_HEADERS, all_values
 
-    return None
 
+def parse_sheet_values(all_values, verbose=True, headers=None):
+    """Convert raw sheet rows (with or without a header row) into record dicts.
 
-def read_google_sheet(sheet_url):
-    """Read all student activity data from Google Sheet."""
-    client = get_google_sheets_client()
+    Pass headers when all_values are data rows read after a known header row.
+    """
+    if headers is None:
+        headers, data_rows = detect_headers(all_values, verbose)
+    else:
+        data_rows = all_values
+
+    # Parse records
+    records = []
+    for row in data_rows:
+        if row and any(row):  # Skip completely empty rows
+            # Pad row if needed
+            while len(row) < len(headers):
+                row.append("")
+            record = dict(zip(headers, row))
+            records.append(record)
+
+    return records
+
+
+def read_google_sheet(sheet_url, client=None, terms=None):
+    """Read all student activity data from Google Sheet.
+
+    With SCENARIO_SHEET_PARTITION set, only the partitions for terms (a list
+    of labels like "Fall 2025"; None for every term) are read. Rows moved to
+    the local archive (sheet_archive.py) for those terms are included.
+    """
+    client = client or get_google_sheets_client()
     if not client:
         return None
 
     try:
-        spreadsheet = client.open_by_url(sheet_url)
+        with span("sheets.open_by_url"):
+            spreadsheet = client.open_by_url(sheet_url)
+
+        import sheet_partitions
+        from sheet_archive import with_archived
+        if sheet_partitions.partitioned():
+            records = with_archived(sheet_partitions.read_partitions(spreadsheet, terms), terms)
+            print(f"   Read {', '.join(terms) if terms else 'every term'} from the partitioned sheet")
+            return records or None
+
         sheet = spreadsheet.sheet1
 
-        # Get all values
-        all_values = sheet.get_all_values()
+        # Get all values (from the local snapshot if the spreadsheet hasn't changed)
+        all_values = sheet_cache.get_all_values(sheet)
         if not all_values:
             print("Google Sheet is empty")
             return None
 
-        # Expected headers based on sheets_integration.py
-        expected_headers = [
-            "Timestamp",
-            "Student Name",
-            "Scenario Title",
-            "Scenario Outcome",
-            "Choices Made",
-            "Reflection 1",
-            "Reflection 2",
-            "Reflection 3",
-            "Completion Status"
-        ]
-
-        # Check if first row contains headers or data
-        # If first cell looks like a timestamp, there are no headers
-        first_cell = all_values[0][0] if all_values and all_values[0] else ""
-        has_headers = not (first_cell and ("-" in first_cell or "/" in first_cell) and ":" in first_cell)
-
-        if has_headers:
-            # Standard case: first row is headers
-            print("   Detected header row in sheet")
-            headers = all_values[0]
-            data_rows = all_values[1:]
-        else:
-            # No headers: use expected headers and treat all rows as data
-            print("   No headers detected - using expected column order")
-            headers = expected_headers
-            data_rows = all_values
-
-        # Parse records
-        records = []
-        for row in data_rows:
-            if row and any(row):  # Skip completely empty rows
-                # Pad row if needed
-                while len(row) < len(headers):
-                    row.append("")
-                record = dict(zip(headers, row))
-                records.append(record)
-
-        return records
+        return with_archived(parse_sheet_values(all_values), terms)
     except Exception as e:
         print(f"Error reading Google Sheet: {str(e)}")
         return None
 
 
-def generate_grade_csvs(records, roster_lastname_first, roster_firstname_last, all_names, output_dir="grade_outputs", debug=False):
-    """Generate grade CSV files for each unique scenario."""
-    Path(output_dir).mkdir(exist_ok=True)
+def match_completions(records, roster_lastname_first, roster_firstname_last, all_names, cutoff_date=CUTOFF_DATE,
+                      engine=GRADE_ENGINE, aliases=None):
+    """Match completed records to the roster.
+
+    Returns a dict with "completions" (scenario name -> list of (org_id,
+    student_name), one entry per student), "unmatched" (list of (student_name,
+    scenario_name, timestamp)), "status_counts" and "completed".
 
-    cutoff_date = datetime(2025, 10, 9)
+    engine="pandas" uses the columnar matcher in vectorized_grades.py, which
+    returns the same result faster on large sheets. aliases (a NameAliases)
+    is consulted before fuzzy matching and learns its results; call its
+    save() afterwards to keep them.
+    """
+    if engine == "pandas":
+        from vectorized_grades import match_completions_frame
+        return match_completions_frame(records, roster_lastname_first, roster_firstname_last, all_names,
+                                       cutoff_date, aliases)
 
     # Group completions by scenario
     scenario_completions = {}  # scenario_name -> list of (org_id, student_name)
     unmatched_students = []
 
-    if debug:
-        print("\n[DEBUG] First few records:")
-        for i, record in enumerate(records[:3]):
-            print(f"\nRecord {i+1}:")
-            for key, value in record.items():
-                print(f"  {key}: {value}")
-
     # Track statistics
     status_counts = {}
     completed_count = 0
@@ -250,12 +314,12 @@ def generate_grade_csvs(records, roster_lastname_first, roster_firstname_last, a
             entry_date = datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M:%S")
         except:
             # Default to before cutoff if can't parse (use fuzzy matching)
-            entry_date = datetime(2025, 1, 1)
+            entry_date = datetime.min
 
         # Match student to roster
         org_id = match_student_name(
             student_name, cutoff_date, entry_date,
-            roster_lastname_first, roster_firstname_last, all_names
+            roster_lastname_first, roster_firstname_last, all_names, aliases
         )
 
         if org_id:
@@ -268,37 +332,143 @@ def generate_grade_csvs(records, roster_lastname_first, roster_firstname_last, a
         else:
             unmatched_students.append((student_name, scenario_name, timestamp_str))
 
-    # Generate CSV for each scenario
-    csv_files_created = []
+    return {
+        "completions": scenario_completions,
+        "unmatched": unmatched_students,
+        "status_counts": status_counts,
+        "completed": completed_count,
+    }
+
+
+def _safe_filename(name):
+    """Create safe filename from a scenario or section name."""
+    safe_filename = "".join(c if c.isalnum() or c in (' ', '-', '_') else '_' for c in name)
+    return safe_filename.replace(' ', '_')
+
+
+def grade_tables(scenario_completions):
+    """One grade CSV per scenario as [(filename, header, rows)]."""
+    tables = []
     for scenario_name, completions in scenario_completions.items():
-        # Create safe filename from scenario name
-        safe_filename = "".join(c if c.isalnum() or c in (' ', '-', '_') else '_' for c in scenario_name)
-        safe_filename = safe_filename.replace(' ', '_')
-        csv_filename = f"{output_dir}/{safe_filename}_grades.csv"
+        # Append "Points Grade" to the scenario name, and strip the "#" from OrgDefinedId
+        header = ['OrgDefinedId', f'{scenario_name} Points Grade', 'End-of-Line Indicator']
+        rows = [[org_id.lstrip('#'), GRADE_POINTS, '#'] for org_id, student_name in completions]
+        tables.append((f"{_safe_filename(scenario_name)}_grades.csv", header, rows))
+    return tables
+
 
+def write_tables(tables, output_dir="grade_outputs"):
+    """Write (filename, header, rows) tables as CSVs; returns [(csv_filename, row_count)]."""
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+
+    csv_files_created = []
+    for filename, header, rows in tables:
+        csv_filename = f"{output_dir}/{filename}"
         with open(csv_filename, 'w', newline='', encoding='utf-8') as f:
             writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+        csv_files_created.append((csv_filename, len(rows)))
+
+    return csv_files_created
+
+
+def write_grade_csvs(scenario_completions, output_dir="grade_outputs"):
+    """Write one grade CSV per scenario; returns [(csv_filename, student_count)]."""
+    return write_tables(grade_tables(scenario_completions), output_dir)
+
+
+def load_roster_students(roster_file="fall25roster.csv"):
+    """Roster rows in file order as (org_id, last_name, first_name, class_period)."""
+    with open(roster_file, 'r', encoding='utf-8') as f:
+        return [
+            (row['OrgDefinedId'].strip(), row['Last Name'].strip(), row['First Name'].strip(),
+             (row.get('Class Period') or '').strip())
+            for row in csv.DictReader(f)
+        ]
+
+
+def build_gradebook(scenario_completions, students):
+    """Aggregate completions into a student x scenario matrix.
+
+    Returns (scenarios, rows, sections): scenarios in column order, one row per
+    roster student ([org_id, last, first, grade per scenario]), and the row
+    indexes belonging to each Class Period.
+    """
+    scenarios = sorted(scenario_completions)
+    completed = {
+        (org_id, scenario_name)
+        for scenario_name, completions in scenario_completions.items()
+        for org_id, _ in completions
+    }
+
+    rows = []
+    sections = {}
+    for org_id, last_name, first_name, class_period in students:
+        grades = [GRADE_POINTS if (org_id, scenario_name) in completed else '' for scenario_name in scenarios]
+        if class_period:
+            sections.setdefault(class_period, []).append(len(rows))
+        rows.append([org_id.lstrip('#'), last_name, first_name, *grades])
+    return scenarios, rows, sections
+
+
+def gradebook_tables(scenario_completions, roster_file):
+    """gradebook.csv (every roster student x scenario) and one gradebook per Class Period.
+
+    Returns [(filename, header, rows)].
+    """
+    scenarios, rows, sections = build_gradebook(scenario_completions, load_roster_students(roster_file))
+    header = ['OrgDefinedId', 'Last Name', 'First Name',
+              *[f'{scenario_name} Points Grade' for scenario_name in scenarios], 'End-of-Line Indicator']
+    rows = [[*row, '#'] for row in rows]
 
-            # Write header (append "Points Grade" to scenario name)
-            writer.writerow(['OrgDefinedId', f'{scenario_name} Points Grade', 'End-of-Line Indicator'])
+    tables = [("gradebook.csv", header, rows)]
+    for class_period, indexes in sorted(sections.items()):
+        tables.append((f"gradebook_{_safe_filename(class_period)}.csv", header, [rows[index] for index in indexes]))
+    return tables
 
-            # Write student grades
-            for org_id, student_name in completions:
-                # Strip the "#" from OrgDefinedId
-                clean_org_id = org_id.lstrip('#')
-                writer.writerow([clean_org_id, '20', '#'])
 
-        csv_files_created.append((csv_filename, len(completions)))
-        print(f"Created: {csv_filename} ({len(completions)} students)")
+def write_gradebook(scenario_completions, roster_file, output_dir="grade_outputs"):
+    """Write the gradebook matrix and per-section gradebooks; returns [(csv_filename, student_count)]."""
+    return write_tables(gradebook_tables(scenario_completions, roster_file), output_dir)
+
+
+def generate_grade_csvs(records, roster_lastname_first, roster_firstname_last, all_names, output_dir="grade_outputs",
+                        debug=False, cutoff_date=CUTOFF_DATE, roster_file=None, engine=GRADE_ENGINE, aliases=None):
+    """Generate grade CSV files for each unique scenario.
+
+    With roster_file, the same matched completions also produce the gradebook
+    matrix and per-section gradebooks (see write_gradebook), and unmatched
+    names are exported to unmatched_students.csv for review.
+    """
+    if debug:
+        print("\n[DEBUG] First few records:")
+        for i, record in enumerate(records[:3]):
+            print(f"\nRecord {i+1}:")
+            for key, value in record.items():
+                print(f"  {key}: {value}")
+
+    result = match_completions(records, roster_lastname_first, roster_firstname_last, all_names, cutoff_date,
+                               engine, aliases)
+    scenario_completions = result["completions"]
+    unmatched_students = result["unmatched"]
+
+    # Generate CSV for each scenario
+    csv_files_created = write_grade_csvs(scenario_completions, output_dir)
+    for csv_filename, count in csv_files_created:
+        print(f"Created: {csv_filename} ({count} students)")
+    if roster_file:
+        for csv_filename, count in write_gradebook(scenario_completions, roster_file, output_dir):
+            print(f"Created: {csv_filename} ({count} students)")
 
     # Print statistics
     if debug:
         print(f"\n[DEBUG] Statistics:")
         print(f"  Total records processed: {len(records)}")
         print(f"  Completion Status breakdown:")
-        for status, count in status_counts.items():
+        for status, count in result["status_counts"].items():
             print(f"    '{status}': {count}")
-        print(f"  Records with 'Completed' status: {completed_count}")
+        print(f"  Records with 'Completed' status: {result['completed']}")
         print(f"  Successfully matched students: {sum(len(comps) for comps in scenario_completions.values())}")
         print(f"  Unmatched students: {len(unmatched_students)}")
 
@@ -307,6 +477,9 @@ def generate_grade_csvs(records, roster_lastname_first, roster_firstname_last, a
         print(f"\n[WARNING] {len(unmatched_students)} entries could not be matched to roster:")
         for student_name, scenario, timestamp in unmatched_students:
             print(f"  - {student_name} ({scenario}) at {timestamp}")
+        if roster_file:
+            report, _ = export_unmatched(unmatched_students, output_dir)
+            print(f"Fill in OrgDefinedId in {report} and run: python name_aliases.py import {report}")
 
     return csv_files_created
 
@@ -325,12 +498,27 @@ def main():
 
     # Load roster
     print("\n1. Loading student roster...")
-    roster_lastname_first, roster_firstname_last, all_names = load_roster()
-    print(f"   Loaded {len(roster_lastname_first)} students from roster")
-
-    # Read Google Sheet
+    roster_file = "fall25roster.csv"
+    roster_lastname_first, roster_firstname_last, all_names = load_roster(roster_file)
+    aliases = NameAliases.for_roster(roster_file)
+    print(f"   Loaded {len(roster_lastname_first)} students from roster "
+          f"({len(aliases.manual)} manual and {len(aliases.learned)} learned aliases)")
+
+    # Read Google Sheet: only the current term's partitions if SCENARIO_SHEET_PARTITION is set,
+    # otherwise through the local SQLite mirror if SCENARIO_MIRROR_DB is set
     print("\n2. Reading Google Sheet data...")
-    records = read_google_sheet(sheet_url)
+    import sheet_partitions
+    mirror_db = os.getenv("SCENARIO_MIRROR_DB")
+    if sheet_partitions.partitioned():
+        records = read_google_sheet(sheet_url, terms=[sheet_partitions.current_term()])
+    elif mirror_db:
+        from sheet_archive import with_archived
+        from sheet_mirror import read_mirrored_sheet
+
+        # Verifies every row when the sheet was edited or SCENARIO_MIRROR_VERIFY_SECONDS has passed
+        records = with_archived(read_mirrored_sheet(sheet_url, mirror_db))
+    else:
+        records = read_google_sheet(sheet_url)
     if not records:
         print("   Error: Could not read Google Sheet")
         return
@@ -338,7 +526,11 @@ def main():
 
     # Generate grade CSVs
     print("\n3. Generating grade CSV files...")
-    csv_files = generate_grade_csvs(records, roster_lastname_first, roster_firstname_last, all_names, debug=True)
+    csv_files = generate_grade_csvs(records, roster_lastname_first, roster_firstname_last, all_names, debug=True,
+                                    roster_file=roster_file, aliases=aliases)
+    learned = aliases.save()
+    if learned:
+        print(f"Saved {learned} new aliases to {aliases.path}")
 
     print("\n" + "=" * 60)
     print(f"[SUCCESS] Created {len(csv_files)} grade CSV files")
@@ -0,0 +1,102 @@
+"""
+In-memory grade exports for the app's grade download page (?page=grades).
+
+Runs the same pipeline as generate_grades.py against the reflection sheet and
+SCENARIO_ROSTER_FILE, and packs the per-scenario grade CSVs, the gradebook
+matrix, the per-section gradebooks and unmatched_students.csv into one ZIP
+built in a BytesIO buffer. Nothing is written to the server's disk. Each
+export has its own buffer, so concurrent exports don't contend for temp
+files, and the alias table is read but not updated (learned aliases stay in
+memory for that export).
+
+Archived terms come from this server's SCENARIO_ARCHIVE_DIR. On a host whose
+disk doesn't outlive a deploy, that directory may be empty even though old
+terms were archived out of the sheet; the export then says that it covers
+live rows only.
+"""
+
+import csv
+import io
+import os
+import zipfile
+
+import sheet_cache
+import sheet_partitions
+from dashboard_data import ROSTER_FILE
+from generate_grades import (
+    CUTOFF_DATE,
+    GRADE_ENGINE,
+    grade_tables,
+    gradebook_tables,
+    load_roster,
+    match_completions,
+    parse_sheet_values,
+)
+from name_aliases import UNMATCHED_FIELDS, UNMATCHED_REPORT, NameAliases, unmatched_rows
+from sheet_archive import archive_version, with_archived
+from tracing import span
+
+
+def read_reflection_records():
+    """Current reflection sheet records (through the sheet cache, without writing its snapshot to disk).
+
+    With a partitioned sheet (SCENARIO_SHEET_PARTITION), only the current term is read.
+    Archived rows (sheet_archive.py) for the terms read are included.
+    """
+    from sheets_integration import _authorize_client, get_sheet_url
+
+    sheet_url = get_sheet_url()
+    if not sheet_url:
+        raise RuntimeError("Google Sheet URL not configured in environment or secrets.")
+    with span("sheets.open_by_url"):
+        spreadsheet = _authorize_client().open_by_url(sheet_url)
+    if sheet_partitions.partitioned():
+        terms = [sheet_partitions.current_term()]
+        return with_archived(sheet_partitions.read_partitions(spreadsheet, terms, persist=False), terms)
+    return with_archived(parse_sheet_values(sheet_cache.get_all_values(spreadsheet.sheet1, persist=False), verbose=False))
+
+
+def build_grade_zip(records, roster_file, cutoff_date=CUTOFF_DATE, engine=GRADE_ENGINE):
+    """Grade records against a roster; returns (zip bytes, summary dict).
+
+    The summary has "files" ([(filename, row_count)] in archive order),
+    "records", "graded" and "unmatched".
+    """
+    aliases = NameAliases.for_roster(roster_file)
+    result = match_completions(records, *load_roster(roster_file), cutoff_date, engine, aliases)
+    tables = grade_tables(result["completions"]) + gradebook_tables(result["completions"], roster_file)
+    if result["unmatched"]:
+        tables.append((UNMATCHED_REPORT, UNMATCHED_FIELDS, unmatched_rows(result["unmatched"])))
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for filename, header, rows in tables:
+            # Same bytes as write_tables() puts on disk
+            text = io.StringIO(newline="")
+            writer = csv.writer(text)
+            writer.writerow(header)
+            writer.writerows(rows)
+            archive.writestr(filename, text.getvalue().encode("utf-8"))
+
+    summary = {
+        "files": [(filename, len(rows)) for filename, _, rows in tables],
+        "records": len(records),
+        "graded": sum(len(completions) for completions in result["completions"].values()),
+        "unmatched": len(result["unmatched"]),
+    }
+    return buffer.getvalue(), summary
+
+
+def export_grades(cutoff_date=CUTOFF_DATE):
+    """Read the sheet and build the grade ZIP for SCENARIO_ROSTER_FILE.
+
+    The summary also has "live_only": True when every term is read but this
+    server has no archive to add the archived ones from.
+    """
+    if not os.path.exists(ROSTER_FILE):
+        raise RuntimeError(f"Roster file {ROSTER_FILE} not found (set SCENARIO_ROSTER_FILE).")
+    with span("grades.export"):
+        data, summary = build_grade_zip(read_reflection_records(), ROSTER_FILE, cutoff_date)
+    # A partitioned read takes only the current term, which archiving leaves in the sheet
+    summary["live_only"] = not sheet_partitions.partitioned() and archive_version() is None
+    return data, summary
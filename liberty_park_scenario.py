@@ -49,7 +49,7 @@ def display_scene(scene_id, scenario_data, scenario_key):
         image_path = f"scenarios/{scenario_key}/images/{scene['image']}"
         
         if os.path.exists(image_path):
-            st.image(image_path, use_container_width=True)
+            st.image(image_path, width="stretch")
         elif scene.get("description"):
             st.info(scene["description"])
     elif scene.get("description"):
@@ -0,0 +1,259 @@
+"""
+Persistent name-alias table for roster matching.
+
+Free-form names from before the cutoff ("Kyleigh Adams", "kyliegh adams")
+need a fuzzy search over the whole roster every grade run. This table, stored
+next to the roster as <roster>_aliases.csv, remembers the answers:
+1. Manual aliases are names an instructor resolved by hand. They apply to any
+   entry, before or after the cutoff, ignoring case.
+2. Learned aliases record each fuzzy search result, including "no match".
+   They are tied to the roster's contents, so they give the same answer a
+   fresh search would and are discarded when the roster file changes.
+
+Exact roster matches are still checked first; aliases are checked before any
+fuzzy search. Each grade run writes unmatched_students.csv to its output
+directory. Fill in the OrgDefinedId column for the names you can place, then
+import the file once; those names resolve on every later run.
+
+Usage:
+    python name_aliases.py import grade_outputs/unmatched_students.csv --roster fall25roster.csv
+    python name_aliases.py add "Kylie Adams" 50434962 --roster fall25roster.csv
+    python name_aliases.py remove "Kylie Adams" --roster fall25roster.csv
+    python name_aliases.py list --roster fall25roster.csv
+"""
+
+import argparse
+import contextlib
+import csv
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+MANUAL = "manual"
+FUZZY = "fuzzy"
+FIELDS = ["Name", "OrgDefinedId", "Source", "Roster", "Added"]
+UNMATCHED_REPORT = "unmatched_students.csv"
+LOCK_STALE_SECONDS = 30  # a lock file older than this was left by a crashed run
+UNMATCHED_FIELDS = ["Student Name", "OrgDefinedId", "Scenario Title", "Submissions", "First Submitted",
+                    "Last Submitted"]
+
+
+def alias_path(roster_file):
+    roster_file = Path(roster_file)
+    return roster_file.with_name(f"{roster_file.stem}_aliases.csv")
+
+
+@contextlib.contextmanager
+def _file_lock(path):
+    """Hold <path>.lock (created exclusively) for the duration of a read-merge-write."""
+    lock_path = path.with_name(f"{path.name}.lock")
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - lock_path.stat().st_mtime > LOCK_STALE_SECONDS:
+                    os.remove(lock_path)
+                    continue
+            except FileNotFoundError:
+                continue
+            time.sleep(0.02)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(lock_path)
+
+
+def roster_version(roster_file):
+    """Digest of the roster file; learned aliases are only trusted for the roster they were learned from."""
+    with open(roster_file, "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+
+
+def _row_key(row):
+    # Manual aliases ignore case; learned ones must match exactly, as get_close_matches is case-sensitive
+    name = row["Name"].strip()
+    return (row["Source"], name.lower() if row["Source"] == MANUAL else name)
+
+
+class NameAliases:
+    """Alias lookups for one roster, with new entries merged into the file on save()."""
+
+    def __init__(self, path, version=None, roster_ids=None):
+        self.path = Path(path)
+        self.version = version
+        self.roster_ids = roster_ids
+        self.manual = {}  # lower-cased name -> org_id
+        self.learned = {}  # exact name -> org_id, or "" when fuzzy matching found nothing
+        self._changes = {}  # row key -> row to write, or None to delete
+        for row in self._read():
+            org_id = row["OrgDefinedId"].strip()
+            if row["Source"] == MANUAL and org_id and (roster_ids is None or org_id in roster_ids):
+                self.manual[row["Name"].strip().lower()] = org_id
+            elif row["Source"] == FUZZY and row["Roster"] == version:
+                self.learned[row["Name"].strip()] = org_id
+
+    @classmethod
+    def for_roster(cls, roster_file):
+        with open(roster_file, "r", encoding="utf-8") as f:
+            roster_ids = {row["OrgDefinedId"].strip() for row in csv.DictReader(f)}
+        return cls(alias_path(roster_file), roster_version(roster_file), roster_ids)
+
+    def _read(self):
+        if not self.path.exists():
+            return []
+        with open(self.path, "r", newline="", encoding="utf-8") as f:
+            return [row for row in csv.DictReader(f) if row.get("Name")]
+
+    def resolve_org_id(self, org_id):
+        """Accept an OrgDefinedId with or without its "#" prefix; returns the roster's form or None."""
+        org_id = org_id.strip()
+        if self.roster_ids is None:
+            return org_id or None
+        for candidate in (org_id, f"#{org_id.lstrip('#')}", org_id.lstrip("#")):
+            if candidate in self.roster_ids:
+                return candidate
+        return None
+
+    def _stage(self, name, org_id, source):
+        row = {"Name": name, "OrgDefinedId": org_id, "Source": source,
+               "Roster": self.version if source == FUZZY else "", "Added": datetime.now().strftime("%Y-%m-%d")}
+        self._changes[_row_key(row)] = row
+
+    def learn(self, name, org_id):
+        """Remember a fuzzy search result (org_id None for no match)."""
+        self.learned[name] = org_id or ""
+        self._stage(name, org_id or "", FUZZY)
+
+    def add(self, name, org_id):
+        """Add a manual alias; org_id must be in the roster."""
+        resolved = self.resolve_org_id(org_id)
+        if not resolved:
+            raise ValueError(f"{org_id} is not in the roster")
+        name = name.strip()
+        self.manual[name.lower()] = resolved
+        self._stage(name, resolved, MANUAL)
+        return resolved
+
+    def remove(self, name):
+        name = name.strip()
+        removed = self.manual.pop(name.lower(), None) is not None
+        if removed:
+            self._changes[(MANUAL, name.lower())] = None
+        return removed
+
+    def save(self):
+        """Merge staged changes into the file.
+
+        The file is re-read under a lock file, so concurrent runs (batch jobs on
+        the same roster) don't drop each other's entries.
+        """
+        if not self._changes:
+            return 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with _file_lock(self.path):
+            rows = {}
+            for row in self._read():
+                if row["Source"] == FUZZY and row["Roster"] != self.version:
+                    continue  # learned against an older roster
+                rows[_row_key(row)] = {field: row.get(field, "") for field in FIELDS}
+            for key, row in self._changes.items():
+                if row is None:
+                    rows.pop(key, None)
+                else:
+                    rows[key] = row
+
+            temp_path = self.path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(temp_path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=FIELDS)
+                writer.writeheader()
+                writer.writerows(sorted(rows.values(), key=lambda row: (row["Source"], row["Name"].lower())))
+            os.replace(temp_path, self.path)
+        saved = len(self._changes)
+        self._changes = {}
+        return saved
+
+
+def unmatched_rows(unmatched):
+    """One review row per unmatched (name, scenario), with its submission count and date range."""
+    grouped = {}
+    for student_name, scenario_name, timestamp in unmatched:
+        entry = grouped.setdefault((student_name, scenario_name), [0, timestamp, timestamp])
+        entry[0] += 1
+        entry[1] = min(entry[1], timestamp)
+        entry[2] = max(entry[2], timestamp)
+    return [[student_name, "", scenario_name, count, first, last]
+            for (student_name, scenario_name), (count, first, last) in sorted(grouped.items())]
+
+
+def export_unmatched(unmatched, output_dir):
+    """Write the unmatched-names report for review; returns (path, rows written)."""
+    rows = unmatched_rows(unmatched)
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    path = Path(output_dir) / UNMATCHED_REPORT
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(UNMATCHED_FIELDS)
+        writer.writerows(rows)
+    return str(path), len(rows)
+
+
+def import_resolved(report_file, aliases):
+    """Add a manual alias for every report row with an OrgDefinedId filled in; returns (added, rejected rows)."""
+    added, rejected = 0, []
+    with open(report_file, "r", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            org_id = (row.get("OrgDefinedId") or "").strip()
+            if not org_id:
+                continue
+            try:
+                aliases.add(row["Student Name"], org_id)
+                added += 1
+            except ValueError as e:
+                rejected.append((row["Student Name"], str(e)))
+    return added, rejected
+
+
+def main():
+    """Manage the alias table for a roster."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["import", "add", "remove", "list"])
+    parser.add_argument("args", nargs="*", help="import: REPORT_CSV; add: NAME ORG_ID; remove: NAME")
+    parser.add_argument("--roster", default="fall25roster.csv")
+    args = parser.parse_args()
+
+    aliases = NameAliases.for_roster(args.roster)
+    if args.command == "list":
+        print(f"{aliases.path}: {len(aliases.manual)} manual, {len(aliases.learned)} learned for this roster")
+        for name, org_id in sorted(aliases.manual.items()):
+            print(f"  {name} -> {org_id}")
+        return
+
+    if args.command == "import" and len(args.args) == 1:
+        added, rejected = import_resolved(args.args[0], aliases)
+        for name, error in rejected:
+            print(f"[WARNING] {name}: {error}")
+        print(f"Added {added} manual aliases")
+    elif args.command == "add" and len(args.args) == 2:
+        try:
+            print(f"{args.args[0]} -> {aliases.add(*args.args)}")
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+    elif args.command == "remove" and len(args.args) == 1:
+        if not aliases.remove(args.args[0]):
+            print(f"No manual alias for {args.args[0]}")
+            return
+    else:
+        parser.error(f"wrong arguments for {args.command}")
+    aliases.save()
+    print(f"Saved {aliases.path}")
+
+
+if __name__ == "__main__":
+    main()
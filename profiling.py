@@ -0,0 +1,203 @@
+"""
+On-demand cProfile and tracemalloc capture for live sessions.
+
+Profiling is off by default. A rerun is captured when either:
+1. SCENARIO_PROFILE is set; SCENARIO_PROFILE_SAMPLE (default 1.0) is the
+   fraction of reruns captured, so a busy class can be sampled lightly
+2. The URL carries ?profile=<token> and <token> matches SCENARIO_PROFILE_TOKEN
+
+Each capture writes three files to SCENARIO_PROFILE_DIR (default profiles/):
+    <stamp>_<scenario>_<scene>.prof      cProfile stats (pstats format)
+    <stamp>_<scenario>_<scene>.snapshot  tracemalloc snapshot
+    <stamp>_<scenario>_<scene>.json      tags and wall time
+
+Usage:
+    python profiling.py report profiles/ --top 25 --scenario rio_grande
+"""
+
+import argparse
+import contextlib
+import cProfile
+import hmac
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+PROFILE_DIR = os.getenv("SCENARIO_PROFILE_DIR", "profiles")
+TRACEMALLOC_FRAMES = 10
+
+# tracemalloc is process-wide, so only one rerun at a time can take a memory snapshot
+_memory_lock = threading.Lock()
+
+
+def _env_sample_rate():
+    if not os.getenv("SCENARIO_PROFILE"):
+        return 0.0
+    try:
+        return float(os.getenv("SCENARIO_PROFILE_SAMPLE", "1.0"))
+    except ValueError:
+        return 1.0
+
+
+def should_profile(query_params=None):
+    """Decide whether to capture the current rerun."""
+    token = os.getenv("SCENARIO_PROFILE_TOKEN")
+    if token and query_params is not None:
+        requested = query_params.get("profile")
+        if requested and hmac.compare_digest(str(requested), token):
+            return True
+
+    rate = _env_sample_rate()
+    return rate > 0 and random.random() < rate
+
+
+def _safe_tag(value):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "-", str(value or "none"))[:40]
+
+
+@contextlib.contextmanager
+def profile_rerun(scenario, scene, enabled=True, output_dir=None):
+    """Profile the wrapped block with cProfile and tracemalloc and write the capture."""
+    if not enabled:
+        yield
+        return
+
+    output_dir = Path(output_dir or PROFILE_DIR)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stem = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}_{_safe_tag(scenario)}_{_safe_tag(scene)}_{uuid.uuid4().hex[:6]}"
+
+    capture_memory = _memory_lock.acquire(blocking=False)
+    if capture_memory and not tracemalloc.is_tracing():
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    elif capture_memory:
+        # Someone else started tracemalloc; leave it alone
+        _memory_lock.release()
+        capture_memory = False
+
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        elapsed = time.perf_counter() - start
+        try:
+            profiler.dump_stats(output_dir / f"{stem}.prof")
+            if capture_memory:
+                tracemalloc.take_snapshot().dump(str(output_dir / f"{stem}.snapshot"))
+            with open(output_dir / f"{stem}.json", "w", encoding="utf-8") as f:
+                json.dump({
+                    "scenario": scenario,
+                    "scene": scene,
+                    "started": datetime.now().isoformat(timespec="seconds"),
+                    "seconds": elapsed,
+                    "memory": capture_memory,
+                }, f)
+        except OSError as e:
+            print(f"Error writing profile {stem}: {str(e)}")
+        finally:
+            if capture_memory:
+                tracemalloc.stop()
+                _memory_lock.release()
+
+
+def load_captures(directory, scenario=None, scene=None):
+    """Return (stem path, metadata) for every capture matching the tags."""
+    captures = []
+    for meta_file in sorted(Path(directory).glob("*.json")):
+        with open(meta_file, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if scenario and meta.get("scenario") != scenario:
+            continue
+        if scene and str(meta.get("scene")) != scene:
+            continue
+        captures.append((meta_file.with_suffix(""), meta))
+    return captures
+
+
+def hottest_functions(captures, top=20, sort="cumulative"):
+    """Aggregate cProfile stats across captures; return (function, calls, tottime, cumtime) rows."""
+    stats = None
+    for stem, _ in captures:
+        prof_file = stem.with_suffix(".prof")
+        if not prof_file.exists():
+            continue
+        if stats is None:
+            stats = pstats.Stats(str(prof_file))
+        else:
+            stats.add(str(prof_file))
+    if stats is None:
+        return []
+
+    key = 3 if sort == "cumulative" else 2
+    rows = []
+    for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append((f"{filename}:{line}({name})", calls, tottime, cumtime))
+    rows.sort(key=lambda row: row[key], reverse=True)
+    return rows[:top]
+
+
+def biggest_allocators(captures, top=20):
+    """Sum tracemalloc sizes per source line across captures; return (location, bytes, count) rows."""
+    totals = {}
+    for stem, _ in captures:
+        snapshot_file = stem.with_suffix(".snapshot")
+        if not snapshot_file.exists():
+            continue
+        snapshot = tracemalloc.Snapshot.load(str(snapshot_file))
+        snapshot = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ])
+        for stat in snapshot.statistics("lineno"):
+            frame = stat.traceback[0]
+            location = f"{frame.filename}:{frame.lineno}"
+            size, count = totals.get(location, (0, 0))
+            totals[location] = (size + stat.size, count + stat.count)
+    rows = [(location, size, count) for location, (size, count) in totals.items()]
+    rows.sort(key=lambda row: row[1], reverse=True)
+    return rows[:top]
+
+
+def main():
+    """Print the hottest functions and biggest allocators across captured reruns."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    report = subparsers.add_parser("report", help="Aggregate captures in a directory")
+    report.add_argument("directory", nargs="?", default=PROFILE_DIR)
+    report.add_argument("--top", type=int, default=20)
+    report.add_argument("--scenario")
+    report.add_argument("--scene")
+    report.add_argument("--sort", choices=["cumulative", "tottime"], default="cumulative")
+    args = parser.parse_args()
+
+    captures = load_captures(args.directory, args.scenario, args.scene)
+    if not captures:
+        print(f"No captures found in {args.directory}")
+        return
+
+    seconds = [meta["seconds"] for _, meta in captures]
+    print(f"{len(captures)} captures, {sum(seconds):.2f}s total, slowest {max(seconds):.3f}s")
+
+    print(f"\nHottest functions (by {args.sort}):")
+    print(f"  {'calls':>9} {'tottime':>9} {'cumtime':>9}  function")
+    for function, calls, tottime, cumtime in hottest_functions(captures, args.top, args.sort):
+        print(f"  {calls:>9} {tottime:>9.4f} {cumtime:>9.4f}  {function}")
+
+    print("\nBiggest allocators:")
+    print(f"  {'KiB':>10} {'blocks':>9}  location")
+    for location, size, count in biggest_allocators(captures, args.top):
+        print(f"  {size / 1024:>10.1f} {count:>9}  {location}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Near-duplicate reflection detection with MinHash and locality-sensitive hashing.
+
+Comparing every pair of reflections is quadratic, so this works in four steps:
+1. Each Reflection 1-3 response is normalized and split into overlapping
+   word shingles (SHINGLE_WORDS words each).
+2. Every response gets a MinHash signature of NUM_PERM values. The share of
+   positions where two signatures agree estimates the Jaccard similarity of
+   their shingle sets.
+3. Signatures are cut into BANDS bands. Responses to the same question of the
+   same scenario that share an identical band land in the same bucket and
+   become candidate pairs. With 32 bands of 4 rows, a pair at 0.6 similarity
+   is a candidate about 99% of the time, and one below 0.2 almost never.
+4. Candidates are checked with the exact Jaccard similarity of their shingles.
+   Pairs at or above the threshold are reported.
+
+Submissions from the same student (resubmissions) are never flagged. Responses
+shorter than MIN_WORDS words are skipped, because short stock answers match by
+chance.
+
+Usage:
+    python reflection_similarity.py --csv reflections.csv --roster fall25roster.csv
+    python reflection_similarity.py --mirror reflections.sqlite3 --threshold 0.5 --out flagged.csv
+"""
+
+import argparse
+import re
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+from analytics import UNMATCHED_SECTION, roster_sections
+
+REFLECTION_COLUMNS = ["Reflection 1", "Reflection 2", "Reflection 3"]
+SHINGLE_WORDS = 3
+MIN_WORDS = 8
+NUM_PERM = 128
+BANDS = 32
+THRESHOLD = 0.6
+CHUNK_ROWS = 1 << 16  # shingles hashed per block, bounding the (NUM_PERM, rows) temporary
+
+# Multiply-shift hash family: h(x) = (a * x + b) >> 32 with odd a, in wrapping 64-bit arithmetic
+_rng = np.random.default_rng(20251009)
+_A = _rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_B = _rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64)
+_SHIFT = np.uint64(32)
+_WORD = re.compile(r"[a-z0-9']+")
+
+FLAGGED_COLUMNS = ["scenario", "similarity", "reflections", "student_a", "section_a", "submitted_a",
+                   "student_b", "section_b", "submitted_b"]
+
+
+def shingle_sets(texts):
+    """Word shingles of each text as uint64 codes, laid out flat.
+
+    Returns (keep, codes, starts, lengths): keep marks the texts with at least
+    MIN_WORDS words, and the shingles of the k-th kept text are
+    codes[starts[k]:starts[k] + lengths[k]] (repeats included; they don't
+    change a MinHash).
+    """
+    words = [_WORD.findall(str(text).lower()) for text in texts]
+    keep = np.fromiter((len(found) >= MIN_WORDS for found in words), dtype=bool, count=len(words))
+    words = [found for found, kept in zip(words, keep) if kept]
+    counts = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+    ids, vocabulary = pd.factorize(np.fromiter(chain.from_iterable(words), dtype=object, count=int(counts.sum())))
+    ids = ids.astype(np.uint64)
+    document = np.repeat(np.arange(len(counts)), counts)
+
+    # A shingle starts at every word with SHINGLE_WORDS - 1 more words in the same text
+    size = np.uint64(len(vocabulary))
+    span = max(len(ids) - SHINGLE_WORDS + 1, 0)
+    codes = ids[:span].copy()
+    for offset in range(1, SHINGLE_WORDS):
+        codes = codes * size + ids[offset:offset + span]
+    valid = document[:span] == document[SHINGLE_WORDS - 1:]
+    codes = codes[valid]
+    lengths = counts - (SHINGLE_WORDS - 1)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    return keep, codes, starts, lengths
+
+
+def minhash_signatures(codes, starts, lengths):
+    """Return an (n, NUM_PERM) array of MinHash signatures for the shingle sets laid out as in shingle_sets()."""
+    signatures = np.empty((NUM_PERM, len(starts)), dtype=np.uint32)
+    first = 0
+    while first < len(starts):
+        # Take whole documents until the block reaches CHUNK_ROWS shingles
+        last = max(int(np.searchsorted(starts, starts[first] + CHUNK_ROWS, side="left")), first + 1)
+        lo, hi = starts[first], starts[last - 1] + lengths[last - 1]
+        # One row per hash function keeps each reduction contiguous in memory
+        block = np.multiply.outer(_A, codes[lo:hi])
+        block += _B[:, None]
+        block >>= _SHIFT
+        signatures[:, first:last] = np.minimum.reduceat(block, starts[first:last] - lo, axis=1)
+        first = last
+    return signatures.T
+
+
+def candidate_pairs(signatures, groups):
+    """Index pairs (i < j) in the same group that share at least one LSH band."""
+    rows = NUM_PERM // BANDS
+    groups = np.asarray(groups, dtype=np.uint64)
+    pairs = set()
+    for band in range(BANDS):
+        # Fold the group and the band's rows into one 64-bit bucket key; a rare
+        # collision only adds a candidate that the exact check then rejects
+        keys = groups * _A[band]
+        for row in range(band * rows, (band + 1) * rows):
+            keys = (keys ^ signatures[:, row].astype(np.uint64)) * _A[row]
+        _, bucket, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        members = np.flatnonzero(counts[bucket] > 1)
+        if not len(members):
+            continue
+        order = members[np.argsort(bucket[members], kind="stable")]
+        boundaries = np.flatnonzero(np.diff(bucket[order])) + 1
+        for same_bucket in np.split(order, boundaries):
+            same_bucket = same_bucket.tolist()
+            for x, i in enumerate(same_bucket):
+                for j in same_bucket[x + 1:]:
+                    pairs.add((i, j))
+    return pairs
+
+
+def find_similar_reflections(records, roster_file=None, threshold=THRESHOLD):
+    """Return a frame of submission pairs with near-identical reflections, most similar first per scenario."""
+    frame = pd.DataFrame.from_records(records)
+    for column in ["Timestamp", "Student Name", "Scenario Title", *REFLECTION_COLUMNS]:
+        if column not in frame:
+            frame[column] = ""
+    frame["Scenario Title"] = frame["Scenario Title"].fillna("").astype(str).str.strip()
+    frame["Student Name"] = frame["Student Name"].fillna("").astype(str).str.strip()
+    frame = frame[frame["Scenario Title"] != ""]
+
+    # One document per (submission, reflection question)
+    documents = frame.melt(id_vars=["Scenario Title"], value_vars=REFLECTION_COLUMNS,
+                           var_name="column", value_name="text", ignore_index=False)
+    keep, codes, starts, lengths = shingle_sets(documents["text"].to_numpy())
+    documents = documents[keep]
+    if documents.empty:
+        return pd.DataFrame(columns=FLAGGED_COLUMNS)
+
+    groups = pd.factorize(documents["Scenario Title"] + "\x1f" + documents["column"])[0]
+    submission = documents.index.to_numpy()
+    column = documents["column"].str.rsplit(" ", n=1).str[-1].to_numpy()
+    student = frame["Student Name"].str.lower()
+
+    flagged = {}
+    for i, j in candidate_pairs(minhash_signatures(codes, starts, lengths), groups):
+        a, b = sorted((submission[i], submission[j]))
+        if student[a] == student[b]:
+            continue
+        first = np.unique(codes[starts[i]:starts[i] + lengths[i]])
+        second = np.unique(codes[starts[j]:starts[j] + lengths[j]])
+        shared = len(np.intersect1d(first, second, assume_unique=True))
+        similarity = shared / (len(first) + len(second) - shared)
+        if similarity >= threshold:
+            pair = flagged.setdefault((a, b), {"similarity": 0.0, "reflections": set()})
+            pair["similarity"] = max(pair["similarity"], similarity)
+            pair["reflections"].add(column[i])
+
+    sections = roster_sections(roster_file) if roster_file else {}
+    rows = []
+    for (a, b), pair in flagged.items():
+        row = {"scenario": frame.at[a, "Scenario Title"], "similarity": pair["similarity"],
+               "reflections": ", ".join(sorted(pair["reflections"]))}
+        for suffix, index in (("a", a), ("b", b)):
+            row[f"student_{suffix}"] = frame.at[index, "Student Name"]
+            row[f"section_{suffix}"] = sections.get(student[index], UNMATCHED_SECTION)
+            row[f"submitted_{suffix}"] = frame.at[index, "Timestamp"]
+        rows.append(row)
+    flagged = pd.DataFrame(rows, columns=FLAGGED_COLUMNS)
+    return flagged.sort_values(["scenario", "similarity"], ascending=[True, False], ignore_index=True)
+
+
+def main():
+    """Print (or write) flagged reflection pairs and a per-section summary."""
+    from sheet_archive import ARCHIVE_DIR, with_archived
+    from workload_replay import load_sheet_export
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv", help="CSV export of the reflection sheet")
+    source.add_argument("--mirror", help="SQLite mirror of the reflection sheet (see sheet_mirror.py)")
+    parser.add_argument("--roster", help="Roster CSV with a Class Period column")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help=f"Minimum shingle Jaccard similarity to flag (default {THRESHOLD})")
+    parser.add_argument("--out", help="Write flagged pairs to this CSV instead of printing them")
+    parser.add_argument("--archive", default=ARCHIVE_DIR,
+                        help=f"Include rows archived by sheet_archive.py in this directory (default {ARCHIVE_DIR})")
+    args = parser.parse_args()
+
+    if args.mirror:
+        import sheet_mirror
+
+        conn = sheet_mirror.connect(args.mirror)
+        try:
+            records = sheet_mirror.load_records(conn)
+        finally:
+            conn.close()
+    else:
+        records = load_sheet_export(args.csv)
+    records = with_archived(records, archive_dir=args.archive)
+
+    flagged = find_similar_reflections(records, args.roster, args.threshold)
+    print(f"{len(flagged)} flagged pairs in {len(records)} submissions")
+    if flagged.empty:
+        return
+    if args.out:
+        flagged.to_csv(args.out, index=False)
+        print(f"Wrote {args.out}")
+    else:
+        print(flagged.to_string(index=False, float_format=lambda value: f"{value:.2f}"))
+
+    sections = pd.concat([flagged[["scenario", "section_a"]].set_axis(["scenario", "section"], axis=1),
+                          flagged[["scenario", "section_b"]].set_axis(["scenario", "section"], axis=1)])
+    print("\nFlagged submissions by scenario and section")
+    print(sections.groupby(["scenario", "section"]).size().rename("flagged").reset_index().to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
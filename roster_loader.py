@@ -1,16 +1,25 @@
 import pandas as pd
 import streamlit as st
+import shared_store
+
+def read_roster_names(roster_file):
+    """Read a roster CSV and return its names as a sorted "Last Name, First Name" list."""
+    df = pd.read_csv(roster_file)
+    # Format as "Last Name, First Name"
+    names = df.apply(lambda row: f"{row['Last Name']}, {row['First Name']}", axis=1).tolist()
+    # Sort alphabetically
+    names.sort()
+    return names
 
 @st.cache_data
-def load_student_roster():
+def load_student_roster(roster_file='spring26roster.csv'):
     """Load student names from the roster CSV file and return formatted list."""
     try:
-        df = pd.read_csv('spring26roster.csv')
-        # Format as "Last Name, First Name"
-        names = df.apply(lambda row: f"{row['Last Name']}, {row['First Name']}", axis=1).tolist()
-        # Sort alphabetically
-        names.sort()
-        return names
+        # Workers attached to a shared store skip pandas entirely
+        names = shared_store.load_roster(roster_file)
+        if names is not None:
+            return list(names)
+        return read_roster_names(roster_file)
     except Exception as e:
         st.error(f"Error loading roster: {str(e)}")
         return []
@@ -1,9 +1,27 @@
 import streamlit as st
 import json
 import os
+import time
+import uuid
 from pathlib import Path
-from sheets_integration import save_reflection_to_sheets, initialize_google_sheet
+from sheets_integration import append_reflection_row, build_reflection_row, get_sheet_url, initialize_google_sheet
 from roster_loader import load_student_roster
+from workload_replay import capture_session_trace
+from profiling import profile_rerun, should_profile
+from tracing import span, set_context, start_rerun
+from scenario_state import CompiledScenario
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import scene_index
+import session_registry
+import shared_store
+import state_token
+import submission_queue
+
+# How often the page checks on a background reflection write
+SUBMISSION_POLL_SECONDS = 1.0
+
+# Compiled scenarios shared by every session, keyed by scenario id
+_compiled_scenarios = {}
 
 class ScenarioEngine:
     def __init__(self, scenario_path):
@@ -14,36 +32,53 @@ class ScenarioEngine:
         self.reflection_questions = self.config.get("reflection_questions", [])
         self.reflection_prompts = self.config.get("reflection_prompts", [])
         self.variables = self.config.get("variables", {})
-    
+        self.scenario_id = self.scenario_path.name
+        self.compiled = self.get_compiled()
+
+    def get_compiled(self):
+        """Return the shared compiled scenario, rebuilding it if config.json changed."""
+        signature = (self.scenario_path / "config.json").stat().st_mtime_ns
+        cached = _compiled_scenarios.get(self.scenario_id)
+        if cached is None or cached[0] != signature:
+            shared = shared_store.load_scenario(self.scenario_id, self.scenario_path / "config.json")
+            compiled = shared[1] if shared else CompiledScenario(self.scenes, self.variables)
+            cached = (signature, compiled)
+            _compiled_scenarios[self.scenario_id] = cached
+        return cached[1]
+
+    @property
+    def progress(self):
+        return st.session_state.scenario_progress
+
     def load_config(self):
         config_file = self.scenario_path / "config.json"
         if not config_file.exists():
             raise FileNotFoundError(f"Config file not found: {config_file}")
         
-        with open(config_file, 'r') as f:
-            return json.load(f)
+        # Workers attached to a shared store reuse its parsed copy
+        shared = shared_store.load_scenario(self.scenario_path.name, config_file)
+        if shared:
+            return shared[0]
+        
+        # Scenes are decoded on first access; the index is reused until config.json changes
+        with span("engine.load_config", scenario=self.scenario_path.name):
+            return scene_index.load_config(config_file)
     
     def get_image_path(self, scene_id):
         # Replace dots with underscores for image filenames (e.g., "5.fragile" -> "scene_5_fragile.png")
         image_scene_id = scene_id.replace(".", "_")
         return self.scenario_path / "images" / f"scene_{image_scene_id}.png"
 
-    def apply_effects(self, effects):
-        """Apply variable effects from a choice"""
-        if not effects:
-            return
-        for var_name, change in effects.items():
-            if var_name in st.session_state.scenario_variables:
-                st.session_state.scenario_variables[var_name] += change
-
-    def evaluate_condition(self, condition_str):
+    def evaluate_condition(self, condition_str, variables=None):
         """Evaluate a condition string using scenario variables"""
         try:
             # Convert JavaScript-style operators to Python
             python_condition = condition_str.replace("&&", " and ").replace("||", " or ")
 
             # Create a safe namespace with only the scenario variables
-            namespace = st.session_state.scenario_variables.copy()
+            if variables is None:
+                variables = self.compiled.variables_dict(self.progress)
+            namespace = dict(variables)
             # Evaluate the condition
             return eval(python_condition, {"__builtins__": {}}, namespace)
         except Exception as e:
@@ -51,14 +86,44 @@ class ScenarioEngine:
             return False
 
     def initialize_session_state(self):
-        if 'current_scene' not in st.session_state:
-            st.session_state.current_scene = "1"
-        if 'scene_history' not in st.session_state:
-            st.session_state.scene_history = []
-        if 'choices_made' not in st.session_state:
-            st.session_state.choices_made = []
-        if 'scenario_variables' not in st.session_state:
-            st.session_state.scenario_variables = self.variables.copy()
+        progress = st.session_state.get("scenario_progress")
+        if progress is None:
+            # Pick up where the student left off: after the idle reaper parked the session,
+            # or from the signed token in the URL after a reconnect gave them a new session
+            progress = session_registry.resume() or state_token.decode(st.query_params.get(state_token.QUERY_PARAM))
+            if progress is not None:
+                st.session_state.scenario_progress = progress
+        # Start fresh when switching scenarios or when the config no longer matches the progress
+        if (progress is None or progress.scenario != self.scenario_id
+                or not self.compiled.fits(progress)):
+            st.session_state.scenario_progress = self.compiled.new_progress(self.scenario_id)
+    
+    def save_state_token(self):
+        """Keep a signed copy of the progress in the URL so a new session can resume it"""
+        token = state_token.encode(self.progress)
+        if st.query_params.get(state_token.QUERY_PARAM) != token:
+            st.query_params[state_token.QUERY_PARAM] = token
+
+    def current_scene_id(self):
+        return self.compiled.scene_ids[self.progress.scene]
+
+    def choices_made(self):
+        """Derive the choices made so far as {"scene", "choice", "next"} dicts"""
+        times = self.progress.choice_times
+        made = []
+        for i, (scene_id, choice_index) in enumerate(self.compiled.choice_pairs(self.progress)):
+            choice = self.scenes[scene_id]["choices"][choice_index]
+            entry = {"scene": scene_id, "choice": choice["text"], "next": choice["next"]}
+            if i < len(times):
+                entry["at"] = times[i]
+            made.append(entry)
+        return made
+
+    def restart(self):
+        """Send the student back to the first scene, keeping submitted reflections"""
+        submitted = self.progress.submitted
+        st.session_state.scenario_progress = self.compiled.new_progress(self.scenario_id)
+        st.session_state.scenario_progress.submitted = submitted
     
     def display_scene(self, scene_id):
         if scene_id not in self.scenes:
@@ -77,10 +142,14 @@ class ScenarioEngine:
         else:
             image_path = self.get_image_path(scene_id)
 
-        if image_path.exists():
-            st.image(str(image_path), use_container_width=True)
-        elif scene.get("description"):
-            st.info(scene["description"])
+        with span("scene.image"):
+            shared_image = shared_store.load_image(image_path)
+            if shared_image is not None:
+                st.image(shared_image, width="stretch")
+            elif image_path.exists():
+                st.image(str(image_path), width="stretch")
+            elif scene.get("description"):
+                st.info(scene["description"])
 
         # Display narration
         st.markdown(scene.get('narration', ''))
@@ -94,58 +163,42 @@ class ScenarioEngine:
             
             for i, choice in enumerate(scene["choices"]):
                 if st.button(f"{chr(65+i)}. {choice['text']}", key=f"choice_{scene_id}_{i}"):
-                    # Apply any effects from this choice
-                    if "effects" in choice:
-                        self.apply_effects(choice["effects"])
-
-                    st.session_state.choices_made.append({
-                        "scene": scene_id,
-                        "choice": choice["text"],
-                        "next": choice["next"]
-                    })
-                    st.session_state.scene_history.append(st.session_state.current_scene)
-                    st.session_state.current_scene = choice["next"]
-                    st.rerun()
+                    # Apply any effects from this choice and record it by index
+                    # (click times are only kept when traces are being captured)
+                    at = time.time() if os.getenv("SCENARIO_CAPTURE_FILE") else None
+                    self.compiled.apply_choice(self.progress, i, at)
+                    _rerun_fragment()
         
         elif scene["type"] == "auto_advance":
             st.markdown("---")
             if st.button("Continue", key=f"continue_{scene_id}"):
-                st.session_state.scene_history.append(st.session_state.current_scene)
-                st.session_state.current_scene = scene["next"]
-                st.rerun()
+                self.compiled.advance(self.progress, scene["next"])
+                _rerun_fragment()
 
         elif scene["type"] == "conditional":
             # Evaluate conditions and determine next scene
             st.markdown("---")
 
-            # Store the determined next scene in session state if not already done
-            conditional_key = f"conditional_next_{scene_id}"
-            if conditional_key not in st.session_state:
-                next_scene = None
-
-                # Check each condition in order
-                if "conditions" in scene:
-                    for condition_obj in scene["conditions"]:
-                        if self.evaluate_condition(condition_obj["condition"]):
-                            next_scene = condition_obj["next"]
-                            break
+            # Variables don't change while on this scene, so the result is stable across reruns
+            next_scene = None
 
-                # Use default if no condition matched
-                if next_scene is None and "default" in scene:
-                    next_scene = scene["default"]
+            # Check each condition in order
+            if "conditions" in scene:
+                variables = self.compiled.variables_dict(self.progress)
+                for condition_obj in scene["conditions"]:
+                    if self.evaluate_condition(condition_obj["condition"], variables):
+                        next_scene = condition_obj["next"]
+                        break
 
-                st.session_state[conditional_key] = next_scene
-            else:
-                next_scene = st.session_state[conditional_key]
+            # Use default if no condition matched
+            if next_scene is None and "default" in scene:
+                next_scene = scene["default"]
 
             # Show a continue button to advance
             if next_scene:
                 if st.button("Continue", key=f"conditional_continue_{scene_id}"):
-                    # Clean up the conditional key
-                    del st.session_state[conditional_key]
-                    st.session_state.scene_history.append(st.session_state.current_scene)
-                    st.session_state.current_scene = next_scene
-                    st.rerun()
+                    self.compiled.advance(self.progress, next_scene)
+                    _rerun_fragment()
             else:
                 st.error("No valid condition matched and no default scene specified")
 
@@ -172,109 +225,182 @@ class ScenarioEngine:
         
         st.markdown("---")
         if st.button("Start Over", key="restart"):
-            st.session_state.current_scene = "1"
-            st.session_state.scene_history = []
-            st.session_state.choices_made = []
-            st.rerun()
+            self.restart()
+            _rerun_fragment()
     
+    @st.fragment
     def display_reflection_form(self, scene, scene_id, outcome):
         st.markdown("---")
         st.subheader("📝 Complete Your Reflection")
         
-        # Check if reflection already submitted
-        reflection_key = f"reflection_submitted_{scene_id}"
-        if st.session_state.get(reflection_key, False):
+        # Check if reflection already submitted, or a background write just finished
+        scene_pos = self.compiled.scene_index[scene_id]
+        token_key = f"submission_token_{scene_id}"
+        token = st.session_state.get(token_key)
+        state, error = submission_queue.status(token) if token else (None, None)
+        if state == submission_queue.DONE and not self.progress.is_submitted(scene_pos):
+            self.complete_submission(scene_pos)
+        
+        if self.progress.is_submitted(scene_pos):
             st.success("✅ Reflection submitted successfully!")
             st.info(f"Thank you for completing the {self.metadata.get('title', 'scenario')} and sharing your thoughts!")
+        elif state == submission_queue.PENDING:
+            self.display_submission_status(token)
         else:
-            # Student name input with roster autocomplete
-            roster_names = load_student_roster()
-            student_name = st.selectbox(
-                "Student Name:",
-                options=[""] + roster_names,
-                key=f"student_name_{scene_id}",
-                help="Select your name to receive completion credit"
-            )
-            
-            # Dynamic reflection questions
-            st.markdown("**Please reflect on your experience:**")
-            
-            reflections = {}
-            for i, (question, prompt) in enumerate(zip(self.reflection_questions, self.reflection_prompts)):
-                reflections[f"reflection_{i+1}"] = st.text_area(
-                    f"{i+1}. {question}",
-                    key=f"reflection_{i+1}_{scene_id}",
-                    height=100,
-                    help=prompt
+            # Inputs stay in the browser until Submit, so typing doesn't rerun the script
+            with st.form(key=f"reflection_form_{scene_id}"):
+                # Student name input with roster autocomplete
+                with span("roster.load"):
+                    roster_names = load_student_roster()
+                student_name = st.selectbox(
+                    "Student Name:",
+                    options=[""] + roster_names,
+                    key=f"student_name_{scene_id}",
+                    help="Select your name to receive completion credit"
                 )
+                
+                # Dynamic reflection questions
+                st.markdown("**Please reflect on your experience:**")
+                
+                reflections = {}
+                for i, (question, prompt) in enumerate(zip(self.reflection_questions, self.reflection_prompts)):
+                    reflections[f"reflection_{i+1}"] = st.text_area(
+                        f"{i+1}. {question}",
+                        key=f"reflection_{i+1}_{scene_id}",
+                        height=100,
+                        help=prompt
+                    )
+                
+                submitted = st.form_submit_button("Submit Reflection", key=f"submit_reflection_{scene_id}", type="primary")
             
-            # Submit button
-            if st.button("Submit Reflection", key=f"submit_reflection_{scene_id}", type="primary"):
+            if state == submission_queue.FAILED:
+                st.error(f"There was an error submitting your reflection. Please try again. ({error})")
+            
+            # Validate in the same rerun as the submit, then hand the write to a background worker
+            if submitted:
                 if student_name and all(reflections.values()):
-                    # Save to Google Sheets
-                    success = save_reflection_to_sheets(
+                    row_data = build_reflection_row(
                         student_name=student_name,
                         outcome=outcome,
                         scenario=self.metadata.get('title', 'Unknown Scenario'),
-                        choices_made=st.session_state.choices_made,
+                        choices_made=self.choices_made(),
                         **reflections
                     )
-                    
-                    if success:
-                        st.session_state[reflection_key] = True
-                        st.rerun()
-                    else:
-                        st.error("There was an error submitting your reflection. Please try again.")
+                    # One token per session and end scene, so repeated clicks send one write
+                    token = token or uuid.uuid4().hex
+                    st.session_state[token_key] = token
+                    submission_queue.submit(token, append_reflection_row, row_data, get_sheet_url())
+                    _rerun_fragment()
                 else:
                     st.error("Please fill in all fields before submitting.")
     
+    @st.fragment(run_every=SUBMISSION_POLL_SECONDS)
+    def display_submission_status(self, token):
+        """Poll a background reflection write; rerun the page once it finishes"""
+        state, _ = submission_queue.status(token)
+        if state == submission_queue.PENDING:
+            st.info("⏳ Submitting your reflection...")
+        else:
+            st.rerun()
+    
+    def complete_submission(self, scene_pos):
+        """Record a successful reflection write in this session"""
+        # Optionally record this playthrough as a replayable workload trace
+        capture_file = os.getenv("SCENARIO_CAPTURE_FILE")
+        if capture_file:
+            capture_session_trace(
+                capture_file,
+                self.scenario_id,
+                self.choices_made()
+            )
+        self.progress.mark_submitted(scene_pos)
+    
     def display_progress(self):
-        if st.session_state.choices_made:
+        if self.progress.choices:
             with st.sidebar:
                 st.subheader("Your Journey")
-                for i, choice in enumerate(st.session_state.choices_made):
-                    st.write(f"**Step {i+1}:** {choice['choice']}")
+                for i, (scene_id, choice_index) in enumerate(self.compiled.choice_pairs(self.progress)):
+                    st.write(f"**Step {i+1}:** {self.scenes[scene_id]['choices'][choice_index]['text']}")
     
     def display_navigation_controls(self):
         with st.sidebar:
             st.markdown("---")
-            if st.session_state.scene_history and st.button("Go Back"):
-                previous_scene = st.session_state.scene_history.pop()
-                st.session_state.current_scene = previous_scene
-                if st.session_state.choices_made:
-                    st.session_state.choices_made.pop()
-                st.rerun()
+            if self.progress.history and st.button("Go Back"):
+                self.compiled.go_back(self.progress)
+                _rerun_fragment()
             
             if st.button("Restart Scenario"):
-                st.session_state.current_scene = "1"
-                st.session_state.scene_history = []
-                st.session_state.choices_made = []
-                st.rerun()
+                self.restart()
+                _rerun_fragment()
     
     def run(self):
-        # Set page config
-        st.set_page_config(
-            page_title=self.metadata.get("page_title", "Scenario"),
-            page_icon=self.metadata.get("page_icon", "📖"),
-            layout="wide"
-        )
-        
-        # Initialize Google Sheets on first run if completion tracking is enabled
-        if self.metadata.get("completion_tracking", False):
-            initialize_google_sheet()
-        
-        self.initialize_session_state()
-        
-        # Main content
-        current_scene_id = st.session_state.current_scene
-        scene = self.display_scene(current_scene_id)
-        
-        if scene:
-            self.handle_choice(scene, current_scene_id)
-        
-        # Sidebar content
-        self.display_progress()
-        self.display_navigation_controls()
+        start_rerun(scenario=self.scenario_id)
+        with span("engine.run"):
+            # Set page config
+            st.set_page_config(
+                page_title=self.metadata.get("page_title", "Scenario"),
+                page_icon=self.metadata.get("page_icon", "📖"),
+                layout="wide"
+            )
+
+            # Initialize Google Sheets on first run if completion tracking is enabled
+            if self.metadata.get("completion_tracking", False):
+                initialize_google_sheet()
+
+            session_registry.track()
+            self.initialize_session_state()
+
+            self.display_scenario()
+
+    @st.fragment
+    def display_scenario(self):
+        """Scene panel plus sidebar journey and navigation; clicks rerun only this fragment"""
+        fragment_rerun = _in_fragment_rerun()
+        if fragment_rerun:
+            start_rerun(scenario=self.scenario_id, fragment="scenario")
+
+        # app.main profiles full runs; fragment reruns skip it, so they are captured here
+        with profile_rerun(self.scenario_id, get_current_scene_id() or "start",
+                           enabled=fragment_rerun and should_profile(st.query_params)):
+            if fragment_rerun:
+                session_registry.track()
+                self.initialize_session_state()
+
+            # Main content
+            current_scene_id = self.current_scene_id()
+            set_context(scene=current_scene_id)
+            with span("engine.display_scene"):
+                scene = self.display_scene(current_scene_id)
+
+            if scene:
+                with span("engine.handle_choice"):
+                    self.handle_choice(scene, current_scene_id)
+
+            # Sidebar content, redrawn in place on each fragment rerun
+            with span("engine.sidebar"):
+                self.display_progress()
+                self.display_navigation_controls()
+
+            self.save_state_token()
+
+def _in_fragment_rerun():
+    """True while Streamlit is rerunning fragments rather than the whole script"""
+    ctx = get_script_run_ctx()
+    return bool(ctx and ctx.fragment_ids_this_run)
+
+def _rerun_fragment():
+    """Rerun just the current fragment; clicks handled during a full run rerun the app"""
+    if _in_fragment_rerun():
+        st.rerun(scope="fragment")
+    st.rerun()
+
+def get_current_scene_id():
+    """Return the scene id of this session's progress, or None before a scenario starts"""
+    progress = st.session_state.get("scenario_progress")
+    cached = _compiled_scenarios.get(progress.scenario) if progress else None
+    if cached is None or progress.scene >= len(cached[1].scene_ids):
+        return None
+    return cached[1].scene_ids[progress.scene]
 
 def get_available_scenarios():
     """Get list of available scenarios from the scenarios directory"""
@@ -0,0 +1,242 @@
+"""
+Compact representation of scenarios and per-session progress.
+
+A CompiledScenario interns every scene id to a small integer and flattens
+choice targets and effects into index tuples as each scene is first reached.
+It is built once per scenario and shared by every session in the process.
+
+A ScenarioProgress is all a session stores: the current scene index, the
+visited scene indices, (scene, choice) index pairs for the choices made, and
+an array-backed variable vector. Display text such as the "Your Journey"
+sidebar or the "Choices Made" summary is derived from the compiled scenario on
+demand instead of being copied into every session.
+
+Progress carries a short digest of the scenario layout it was recorded
+against: the scene ids, each scene's choice targets and the variable names.
+Progress whose digest does not match the current config is not resumed, since
+its indices may now name different scenes or choices.
+"""
+
+import hashlib
+import json
+import struct
+from array import array
+
+START_SCENE_ID = "1"
+
+# Snapshot layout: version, scenario id, layout digest, scene, variable typecode, array lengths, then the raw arrays
+SNAPSHOT_VERSION = 2
+LAYOUT_BYTES = 8
+_SNAPSHOT_HEADER = struct.Struct(f"<{LAYOUT_BYTES}sHcHHHHH")
+
+
+def _variable_typecode(values):
+    """Use a signed integer vector unless some variable starts as a float."""
+    return "l" if all(isinstance(value, int) for value in values) else "d"
+
+
+def choice_targets(scene):
+    """Next scene ids of a scene's choices, as CompiledScenario interns them."""
+    if not isinstance(scene, dict) or scene.get("type") != "choice":
+        return []
+    return [choice["next"] for choice in scene.get("choices", [])]
+
+
+def scenes_digest(targets):
+    """Digest of {scene id: choice targets}, in config order."""
+    return hashlib.blake2b(json.dumps(targets).encode("utf-8"), digest_size=LAYOUT_BYTES).digest()
+
+
+class CompiledScenario:
+    """Scene ids, choice targets and effects of one scenario as integer tables."""
+
+    def __init__(self, scenes, variables):
+        self.scenes = scenes
+        self.scene_ids = list(scenes)
+        self.scene_index = {scene_id: i for i, scene_id in enumerate(self.scene_ids)}
+
+        self.variable_names = list(variables)
+        self.variable_index = {name: i for i, name in enumerate(self.variable_names)}
+        self.variable_typecode = _variable_typecode(list(variables.values()))
+        self.initial_variables = array(self.variable_typecode, variables.values())
+
+        # Per scene: next scene index of each choice, and (variable index, change) effects of each choice.
+        # Rows are compiled on first use, so a lazily loaded scenario only decodes scenes students reach.
+        self.choice_next = [None] * len(self.scene_ids)
+        self.choice_effects = [None] * len(self.scene_ids)
+
+        # Lazily loaded scenes bring the digest worked out while indexing the file
+        scenes_layout = getattr(scenes, "digest", None) or scenes_digest(
+            {scene_id: choice_targets(scene) for scene_id, scene in scenes.items()})
+        self.layout = hashlib.blake2b(scenes_layout + json.dumps(self.variable_names).encode("utf-8"),
+                                      digest_size=LAYOUT_BYTES).digest()
+
+        self.start = self.intern(START_SCENE_ID)
+
+    def _compile_row(self, index):
+        scene_id = self.scene_ids[index]
+        scene = self.scenes[scene_id] if scene_id in self.scenes else {}
+        choices = scene.get("choices", []) if scene.get("type") == "choice" else []
+        self.choice_effects[index] = tuple(
+            tuple((self.variable_index[name], change)
+                  for name, change in (choice.get("effects") or {}).items()
+                  if name in self.variable_index)
+            for choice in choices
+        )
+        # Interning may add rows for missing targets, so assign this row last
+        self.choice_next[index] = tuple(self.intern(choice["next"]) for choice in choices)
+
+    def next_scenes(self, index):
+        """Next scene index of each choice on a scene."""
+        row = self.choice_next[index]
+        if row is None:
+            self._compile_row(index)
+            row = self.choice_next[index]
+        return row
+
+    def effects(self, index):
+        """(variable index, change) effects of each choice on a scene."""
+        if self.choice_next[index] is None:
+            self._compile_row(index)
+        return self.choice_effects[index]
+
+    def compile_all(self):
+        """Compile every row and drop the scene mapping, e.g. before pickling."""
+        index = 0
+        while index < len(self.scene_ids):
+            self.next_scenes(index)
+            index += 1
+        self.scenes = {}
+
+    def intern(self, scene_id):
+        """Return the index of a scene id, adding ids that have no scene (shown as errors)."""
+        index = self.scene_index.get(scene_id)
+        if index is None:
+            index = len(self.scene_ids)
+            self.scene_ids.append(scene_id)
+            self.scene_index[scene_id] = index
+            self.choice_next.append(())
+            self.choice_effects.append(())
+        return index
+
+    def new_progress(self, scenario_id):
+        """Return progress for a student starting the scenario."""
+        return ScenarioProgress(scenario_id, self.start, self.initial_variables, self.layout)
+
+    def fits(self, progress):
+        """True if the progress was recorded against this layout and every index in it is valid."""
+        if progress.layout != self.layout:
+            return False
+        scenes = len(self.scene_ids)
+        if progress.scene >= scenes or any(scene >= scenes for scene in progress.history):
+            return False
+        choices = progress.choices
+        for k in range(0, len(choices), 2):
+            if choices[k] >= scenes or choices[k + 1] >= len(self.next_scenes(choices[k])):
+                return False
+        return (len(progress.variables) == len(self.variable_names)
+                and progress.variables.typecode == self.variable_typecode)
+
+    def variables_dict(self, progress):
+        """Return the progress variable vector as {name: value}."""
+        return dict(zip(self.variable_names, progress.variables))
+
+    def apply_choice(self, progress, choice_index, at=None):
+        """Apply a choice's effects and move progress to its next scene."""
+        scene = progress.scene
+        for variable, change in self.effects(scene)[choice_index]:
+            progress.variables[variable] += change
+        progress.choices.append(scene)
+        progress.choices.append(choice_index)
+        if at is not None:
+            progress.choice_times.append(at)
+        progress.history.append(scene)
+        progress.scene = self.next_scenes(scene)[choice_index]
+
+    def advance(self, progress, scene_id):
+        """Move progress to a scene without recording a choice (Continue buttons)."""
+        progress.history.append(progress.scene)
+        progress.scene = self.intern(scene_id)
+
+    def go_back(self, progress):
+        """Return to the previous scene, undoing the choice made there if any."""
+        previous = progress.history.pop()
+        if len(progress.choices) >= 2 and progress.choices[-2] == previous:
+            del progress.choices[-2:]
+            if len(progress.choice_times) > len(progress.choices) // 2:
+                progress.choice_times.pop()
+        progress.scene = previous
+
+    def choice_pairs(self, progress):
+        """Yield (scene id, choice index) for each choice made."""
+        choices = progress.choices
+        for k in range(0, len(choices), 2):
+            yield self.scene_ids[choices[k]], choices[k + 1]
+
+
+class ScenarioProgress:
+    """One session's position in a scenario, stored as small integers and arrays."""
+
+    __slots__ = ("scenario", "layout", "scene", "history", "choices", "choice_times", "variables", "submitted")
+
+    def __init__(self, scenario, scene, variables, layout):
+        self.scenario = scenario
+        self.layout = layout
+        self.scene = scene
+        self.history = array("H")
+        self.choices = array("H")
+        self.choice_times = array("d")
+        self.variables = array(variables.typecode, variables)
+        self.submitted = 0
+
+    def to_bytes(self):
+        """Pack the progress into a compact snapshot for parking or resuming a session."""
+        scenario = self.scenario.encode("utf-8")
+        submitted = self.submitted.to_bytes((self.submitted.bit_length() + 7) // 8, "little")
+        return b"".join((
+            bytes((SNAPSHOT_VERSION, len(scenario))),
+            scenario,
+            _SNAPSHOT_HEADER.pack(self.layout, self.scene, self.variables.typecode.encode("ascii"), len(self.history),
+                                  len(self.choices), len(self.choice_times), len(self.variables), len(submitted)),
+            self.history.tobytes(),
+            self.choices.tobytes(),
+            self.choice_times.tobytes(),
+            self.variables.tobytes(),
+            submitted,
+        ))
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Rebuild progress from to_bytes() output; raises ValueError on a malformed snapshot."""
+        try:
+            if data[0] != SNAPSHOT_VERSION:
+                raise ValueError(f"Unsupported snapshot version {data[0]}")
+            offset = 2 + data[1]
+            scenario = data[2:offset].decode("utf-8")
+            layout, scene, typecode, *lengths = _SNAPSHOT_HEADER.unpack_from(data, offset)
+            offset += _SNAPSHOT_HEADER.size
+
+            parts = []
+            for code, length in zip(("H", "H", "d", typecode.decode("ascii")), lengths):
+                values = array(code)
+                end = offset + length * values.itemsize
+                values.frombytes(data[offset:end])
+                parts.append(values)
+                offset = end
+            submitted_end = offset + lengths[-1]
+            if submitted_end != len(data):
+                raise ValueError("Snapshot length does not match its header")
+            submitted = int.from_bytes(data[offset:submitted_end], "little")
+        except (IndexError, struct.error, UnicodeDecodeError) as e:
+            raise ValueError(f"Malformed snapshot: {str(e)}") from e
+
+        progress = cls(scenario, scene, parts[3], layout)
+        progress.history, progress.choices, progress.choice_times = parts[:3]
+        progress.submitted = submitted
+        return progress
+
+    def is_submitted(self, scene):
+        return bool(self.submitted >> scene & 1)
+
+    def mark_submitted(self, scene):
+        self.submitted |= 1 << scene
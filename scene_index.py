@@ -0,0 +1,173 @@
+"""
+Lazy, scene-level access to scenario config files.
+
+A session only needs the scene it is on and the scenes its choices lead to,
+but json.load decodes every scene of a config.json. load_config() instead
+walks the file once, records the byte offsets of each entry in its top-level
+"scenes" object and keeps only the rest of the config decoded. The "scenes" value
+becomes a LazyScenes mapping that reads and decodes a scene on first access
+and keeps the most recently used SCENARIO_SCENE_CACHE (default 32) decoded.
+The walk also notes each scene's choice targets for the layout digest that
+scenario_state stamps on student progress.
+
+The index and the rest of the config are cached per process until the file's
+size or modification time changes.
+"""
+
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from json.decoder import scanstring
+
+from scenario_state import choice_targets, scenes_digest
+
+SCENE_CACHE_SIZE = int(os.getenv("SCENARIO_SCENE_CACHE", "32"))
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+_configs = {}
+_configs_lock = threading.Lock()
+
+
+def _skip(text, pos):
+    return _WHITESPACE.match(text, pos).end()
+
+
+def _members(text, pos):
+    """Yield (key, value start) for each member of the JSON object at text[pos]; returns the end position."""
+    if text[pos:pos + 1] != "{":
+        raise json.JSONDecodeError("Expecting '{'", text, pos)
+    pos = _skip(text, pos + 1)
+    if text[pos:pos + 1] == "}":
+        return pos + 1
+    while True:
+        if text[pos:pos + 1] != '"':
+            raise json.JSONDecodeError("Expecting property name enclosed in double quotes", text, pos)
+        key, pos = scanstring(text, pos + 1)
+        pos = _skip(text, pos)
+        if text[pos:pos + 1] != ":":
+            raise json.JSONDecodeError("Expecting ':' delimiter", text, pos)
+        pos = yield key, _skip(text, pos + 1)
+        pos = _skip(text, pos)
+        if text[pos:pos + 1] == ",":
+            pos = _skip(text, pos + 1)
+        elif text[pos:pos + 1] == "}":
+            return pos + 1
+        else:
+            raise json.JSONDecodeError("Expecting ',' delimiter", text, pos)
+
+
+def _walk(text, pos, visit):
+    """Call visit(key, value start) -> value end for each member of the object at text[pos]."""
+    members = _members(text, pos)
+    try:
+        key, value_start = next(members)
+        while True:
+            key, value_start = members.send(visit(key, value_start))
+    except StopIteration as done:
+        return done.value
+
+
+def index_config(data):
+    """Return (config without scenes, {scene id: (start, end)} byte offsets, scenes layout digest).
+
+    The offsets and digest are None if there is no "scenes" object.
+    """
+    text = data.decode("utf-8")
+    config = {}
+    offsets = None
+    targets = {}
+
+    def index_scene(scene_id, start):
+        # Decode to find where the scene ends and what its choices lead to, then let it go
+        scene, end = _decoder.raw_decode(text, start)
+        offsets[scene_id] = (start, end)
+        targets[scene_id] = choice_targets(scene)
+        return end
+
+    def visit(key, start):
+        nonlocal offsets
+        if key == "scenes" and text[start:start + 1] == "{":
+            offsets = {}
+            targets.clear()
+            return _walk(text, start, index_scene)
+        config[key], end = _decoder.raw_decode(text, start)
+        return end
+
+    _walk(text, _skip(text, 0), visit)
+
+    if offsets and not text.isascii():
+        # Character offsets differ from byte offsets once the file has multi-byte characters
+        positions = sorted({pos for span in offsets.values() for pos in span})
+        byte_positions, previous, byte_pos = {}, 0, 0
+        for pos in positions:
+            byte_pos += len(text[previous:pos].encode("utf-8"))
+            byte_positions[pos] = byte_pos
+            previous = pos
+        offsets = {scene_id: (byte_positions[start], byte_positions[end]) for scene_id, (start, end) in offsets.items()}
+    return config, offsets, scenes_digest(targets) if offsets is not None else None
+
+
+class LazyScenes(Mapping):
+    """Read-only {scene id: scene} mapping that decodes scenes from the file on demand."""
+
+    def __init__(self, path, offsets, digest=None, cache_size=SCENE_CACHE_SIZE):
+        self.path = path
+        self.offsets = offsets
+        self.digest = digest
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getitem__(self, scene_id):
+        with self._lock:
+            scene = self._cache.get(scene_id)
+            if scene is not None:
+                self._cache.move_to_end(scene_id)
+                return scene
+        start, end = self.offsets[scene_id]
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            scene = json.loads(f.read(end - start))
+        with self._lock:
+            self._cache[scene_id] = scene
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return scene
+
+    def __contains__(self, scene_id):
+        return scene_id in self.offsets
+
+    def __iter__(self):
+        return iter(self.offsets)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def cached(self):
+        """Scene ids currently held decoded."""
+        with self._lock:
+            return list(self._cache)
+
+
+def load_config(config_file):
+    """Return the config with "scenes" as a LazyScenes mapping, reusing the cached index while the file is unchanged."""
+    config_file = os.fspath(config_file)
+    stat = os.stat(config_file)
+    signature = (stat.st_size, stat.st_mtime_ns)
+    cached = _configs.get(config_file)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    with open(config_file, "rb") as f:
+        config, offsets, digest = index_config(f.read())
+    if offsets is not None:
+        config["scenes"] = LazyScenes(config_file, offsets, digest)
+
+    with _configs_lock:
+        _configs[config_file] = (signature, config)
+    return config
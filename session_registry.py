@@ -0,0 +1,269 @@
+"""
+Idle session reaper and per-session memory accounting.
+
+Streamlit keeps every connected tab's session state in server memory, and
+students leave tabs open across class periods. Each engine rerun calls
+track(), which records the session's last activity in a process-wide registry.
+A background reaper then applies SCENARIO_IDLE_POLICY to sessions idle longer
+than SCENARIO_IDLE_SECONDS (default 1800):
+
+    compact  Replace the progress object and widget values with a packed
+             ScenarioProgress snapshot kept in the session (default)
+    evict    Clear the session state entirely and park the snapshot in the
+             registry (at most SCENARIO_SNAPSHOT_LIMIT of them, oldest dropped)
+    off      Only account memory
+
+Either way, resume() rebuilds the progress on the student's next click, so
+they continue from the scene they left. The reaper acts while holding the
+session's lock and re-checks that it is still idle, and track() takes the same
+lock at the start of every run, so a run never reads state the reaper is
+halfway through packing. Submission tokens are kept, so a
+reflection written in the background is still recorded on return.
+
+Live sessions, idle sessions and bytes held are exported on the tracing
+/metrics endpoint.
+"""
+
+import os
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from scenario_state import ScenarioProgress
+from tracing import register_collector
+
+IDLE_POLICY = os.getenv("SCENARIO_IDLE_POLICY", "compact")
+IDLE_SECONDS = float(os.getenv("SCENARIO_IDLE_SECONDS", "1800"))
+REAP_INTERVAL = float(os.getenv("SCENARIO_REAP_INTERVAL", "60"))
+SNAPSHOT_LIMIT = int(os.getenv("SCENARIO_SNAPSHOT_LIMIT", "5000"))
+
+PROGRESS_KEY = "scenario_progress"
+SNAPSHOT_KEY = "scenario_snapshot"
+# Keys that survive compaction and eviction
+KEEP_PREFIXES = ("submission_token_",)
+
+ACTIVE = "active"
+COMPACTED = "compacted"
+EVICTED = "evicted"
+
+
+class _Session:
+    __slots__ = ("state", "last_seen", "bytes", "status", "lock")
+
+    def __init__(self, state, now):
+        # The SafeSessionState of the latest run; each run gets a new wrapper
+        # around the same per-session state, so hold the newest one
+        self.state = state
+        self.last_seen = now
+        self.bytes = 0
+        self.status = ACTIVE
+        # Held by the reaper while it packs the session, and by track() at the start of a run
+        self.lock = threading.Lock()
+
+
+_sessions = {}
+_parked = OrderedDict()
+_lock = threading.Lock()
+_reaper = None
+
+
+def deep_size(value, seen=None):
+    """Approximate bytes held by a session state value, following containers and slots."""
+    if seen is None:
+        seen = set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+
+    size = sys.getsizeof(value)
+    if isinstance(value, (str, bytes, bytearray, array, int, float, bool)) or value is None:
+        return size
+    if isinstance(value, dict):
+        return size + sum(deep_size(k, seen) + deep_size(v, seen) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return size + sum(deep_size(item, seen) for item in value)
+    for slot in getattr(type(value), "__slots__", ()):
+        if hasattr(value, slot):
+            size += deep_size(getattr(value, slot), seen)
+    if hasattr(value, "__dict__"):
+        size += deep_size(vars(value), seen)
+    return size
+
+
+def state_bytes(state):
+    """Bytes held by the user-visible keys of one session state."""
+    return sum(deep_size(key) + deep_size(value) for key, value in state.filtered_state.items())
+
+
+def _kept(key):
+    return key.startswith(KEEP_PREFIXES)
+
+
+def _current():
+    """Return (session id, SafeSessionState) for the running script, or (None, None)."""
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return None, None
+    return ctx.session_id, ctx.session_state
+
+
+def _closed(session_id):
+    """True once the runtime has dropped the session (tab closed). Without a runtime nothing closes."""
+    return runtime.exists() and not runtime.get_instance().is_active_session(session_id)
+
+
+def track():
+    """Record activity for the current session and start the reaper on first use.
+
+    Call it before the run reads session state: it waits for the reaper to
+    finish with this session, and the reaper leaves the session alone after it.
+    """
+    session_id, state = _current()
+    if session_id is None:
+        return
+    with _lock:
+        session = _sessions.get(session_id)
+        if session is None:
+            _sessions[session_id] = _Session(state, time.time())
+    if session is not None:
+        with session.lock:
+            session.state = state
+            session.last_seen = time.time()
+            session.status = ACTIVE
+    if IDLE_POLICY in ("compact", "evict"):
+        start_reaper()
+
+
+def resume():
+    """Return this session's compacted or parked progress, or None if there is none."""
+    session_id, state = _current()
+    if state is None:
+        return None
+    if SNAPSHOT_KEY in state:
+        snapshot = state[SNAPSHOT_KEY]
+        del state[SNAPSHOT_KEY]
+    else:
+        with _lock:
+            parked = _parked.pop(session_id, None)
+        if parked is None:
+            return None
+        snapshot, kept = parked
+        for key, value in kept.items():
+            state[key] = value
+    try:
+        return ScenarioProgress.from_bytes(snapshot)
+    except ValueError:
+        return None
+
+
+def compact(session_id, state):
+    """Swap the session's progress for a packed snapshot and drop widget values."""
+    values = state.filtered_state
+    progress = values.get(PROGRESS_KEY)
+    for key in values:
+        if not _kept(key) and key != SNAPSHOT_KEY:
+            del state[key]
+    if progress is not None:
+        state[SNAPSHOT_KEY] = progress.to_bytes()
+
+
+def evict(session_id, state):
+    """Clear the session state, parking a snapshot and the kept keys in the registry."""
+    values = state.filtered_state
+    progress = values.get(PROGRESS_KEY)
+    snapshot = progress.to_bytes() if progress is not None else values.get(SNAPSHOT_KEY)
+    kept = {key: value for key, value in values.items() if _kept(key)}
+    for key in values:
+        del state[key]
+    if snapshot is None:
+        return
+    with _lock:
+        _parked[session_id] = (snapshot, kept)
+        _parked.move_to_end(session_id)
+        while len(_parked) > SNAPSHOT_LIMIT:
+            _parked.popitem(last=False)
+
+
+def reap(now=None, policy=None, idle_seconds=None):
+    """Account every session's memory and apply the idle policy; return the sessions acted on."""
+    now = time.time() if now is None else now
+    policy = policy or IDLE_POLICY
+    idle_seconds = IDLE_SECONDS if idle_seconds is None else idle_seconds
+    action = {"compact": compact, "evict": evict}.get(policy)
+
+    with _lock:
+        sessions = list(_sessions.items())
+    acted = []
+    for session_id, session in sessions:
+        state = session.state
+        if _closed(session_id):
+            # Tab closed and Streamlit dropped the session
+            with _lock:
+                _sessions.pop(session_id, None)
+            continue
+        if action and session.status == ACTIVE and now - session.last_seen > idle_seconds:
+            with session.lock:
+                # The student may have come back since the list was taken
+                if session.status == ACTIVE and now - session.last_seen > idle_seconds:
+                    action(session_id, session.state)
+                    session.status = COMPACTED if policy == "compact" else EVICTED
+                    acted.append(session_id)
+        session.bytes = state_bytes(state)
+    return acted
+
+
+def _reap_forever():
+    while True:
+        time.sleep(REAP_INTERVAL)
+        try:
+            reap()
+        except Exception as e:
+            print(f"Error reaping idle sessions: {str(e)}")
+
+
+def start_reaper():
+    """Start the background reaper thread once per process."""
+    global _reaper
+    if _reaper is not None:
+        return
+    with _lock:
+        if _reaper is None:
+            _reaper = threading.Thread(target=_reap_forever, name="session-reaper", daemon=True)
+            _reaper.start()
+
+
+def session_report():
+    """Return (session id, status, idle seconds, bytes) rows as of the last reap."""
+    now = time.time()
+    with _lock:
+        return [(session_id, s.status, now - s.last_seen, s.bytes) for session_id, s in _sessions.items()]
+
+
+def _collect_metrics():
+    rows = session_report()
+    with _lock:
+        parked = len(_parked)
+        parked_bytes = sum(len(snapshot) for snapshot, _ in _parked.values())
+    lines = [
+        "# HELP scenario_sessions Sessions known to the registry by status",
+        "# TYPE scenario_sessions gauge",
+    ]
+    for status in (ACTIVE, COMPACTED, EVICTED):
+        lines.append(f'scenario_sessions{{status="{status}"}} {sum(1 for row in rows if row[1] == status)}')
+    lines += [
+        "# HELP scenario_session_state_bytes Approximate bytes held in session state as of the last reap",
+        "# TYPE scenario_session_state_bytes gauge",
+        f"scenario_session_state_bytes {sum(row[3] for row in rows) + parked_bytes}",
+        "# HELP scenario_parked_snapshots Evicted sessions waiting to resume",
+        "# TYPE scenario_parked_snapshots gauge",
+        f"scenario_parked_snapshots {parked}",
+    ]
+    return lines
+
+
+register_collector(_collect_metrics)
@@ -0,0 +1,257 @@
+"""
+Read-only store of compiled scenarios, rosters and images shared by worker processes.
+
+When several Streamlit processes serve the class, each one otherwise parses
+every config.json, compiles the scenarios, reads rosters through pandas and
+reads scene images from disk on its own. With SCENARIO_SHARED_STORE set to a
+file path (e.g. /dev/shm/scenario_store.bin), the first worker to start
+publishes all of it into that one file. Every worker memory-maps the file, so
+the bytes live once in the OS page cache however many workers attach.
+Images are served straight from the mapping; only the small scenario and
+roster entries are unpickled, once per process.
+
+File layout:
+    header   magic, format version, content version, index length
+    index    JSON {name: [offset, length, source signature, pickled]}
+    blobs    pickled (config, compiled) per scenario, pickled roster names,
+             raw image bytes
+
+The content version is a digest of the source files' paths, sizes and mtimes.
+A worker that finds a missing or stale store republishes it to a temporary
+file and atomically replaces the old one, so attached workers keep reading
+a consistent copy. Each entry also keeps its source signature, so a config
+edited after startup falls back to a local rebuild instead of serving stale data.
+
+Usage:
+    python shared_store.py publish --path /dev/shm/scenario_store.bin
+    python shared_store.py inspect --path /dev/shm/scenario_store.bin
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import struct
+import threading
+from pathlib import Path
+
+from tracing import span
+
+STORE_PATH = os.getenv("SCENARIO_SHARED_STORE")
+MAGIC = b"LPSTORE\0"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<8sI16sQ")
+
+ROSTER_GLOB = "*roster*.csv"
+
+_store = None
+_attach_lock = threading.Lock()
+
+
+def _scenario_dirs(root):
+    return sorted(path.parent for path in Path(root, "scenarios").glob("*/config.json"))
+
+
+def source_files(root="."):
+    """Every file the store is built from."""
+    files = []
+    for scenario_dir in _scenario_dirs(root):
+        files.append(scenario_dir / "config.json")
+        images_dir = scenario_dir / "images"
+        if images_dir.is_dir():
+            files.extend(sorted(path for path in images_dir.iterdir() if path.is_file()))
+    files.extend(sorted(Path(root).glob(ROSTER_GLOB)))
+    return files
+
+
+def signature(path):
+    """Source signature stored with each entry: size and modification time."""
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def content_version(root="."):
+    """16-byte digest of every source file's path, size and mtime."""
+    digest = hashlib.blake2b(digest_size=16)
+    for path in source_files(root):
+        digest.update(f"{path.relative_to(root)}:{signature(path)}\n".encode("utf-8"))
+    return digest.digest()
+
+
+def image_key(path):
+    return f"image/{Path(path).resolve()}"
+
+
+def roster_key(path):
+    return f"roster/{Path(path).resolve()}"
+
+
+def scenario_key(scenario_id):
+    return f"scenario/{scenario_id}"
+
+
+def build_entries(root="."):
+    """Return {name: (source signature, blob, pickled)} for every scenario, roster and image under root."""
+    from roster_loader import read_roster_names
+    from scenario_state import CompiledScenario
+
+    entries = {}
+    for scenario_dir in _scenario_dirs(root):
+        config_file = scenario_dir / "config.json"
+        with open(config_file, "r") as f:
+            config = json.load(f)
+        compiled = CompiledScenario(config.get("scenes", {}), config.get("variables", {}))
+        compiled.compile_all()
+        entries[scenario_key(scenario_dir.name)] = (
+            signature(config_file), pickle.dumps((config, compiled), protocol=pickle.HIGHEST_PROTOCOL), True
+        )
+
+    for path in source_files(root):
+        if path.parent.name == "images":
+            entries[image_key(path)] = (signature(path), path.read_bytes(), False)
+        elif path.suffix == ".csv":
+            names = read_roster_names(path)
+            entries[roster_key(path)] = (signature(path), pickle.dumps(names, protocol=pickle.HIGHEST_PROTOCOL), True)
+    return entries
+
+
+def publish(path, root="."):
+    """Build the store from the sources under root and atomically replace the file at path."""
+    with span("store.publish"):
+        version = content_version(root)
+        entries = build_entries(root)
+
+        index, offset = {}, 0
+        for name, (source_signature, blob, pickled) in entries.items():
+            index[name] = [offset, len(blob), list(source_signature), pickled]
+            offset += len(blob)
+        index_bytes = json.dumps(index).encode("utf-8")
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, version, len(index_bytes)))
+            f.write(index_bytes)
+            for _, blob, _ in entries.values():
+                f.write(blob)
+        os.replace(tmp_path, path)
+    return version
+
+
+class SharedStore:
+    """A memory-mapped store file; pickled entries are decoded once per process on first use."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, format_version, self.version, index_length = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a format {FORMAT_VERSION} scenario store")
+        index_start = _HEADER.size
+        self.index = json.loads(self._map[index_start:index_start + index_length])
+        self._blobs_start = index_start + index_length
+        self._decoded = {}
+        self.size = len(self._map)
+
+    def get(self, name, source=None):
+        """Return an entry's value, or None if missing or built from a different version of source."""
+        location = self.index.get(name)
+        if location is None:
+            return None
+        offset, length, entry_signature, pickled = location
+        if source is not None and tuple(entry_signature) != signature(source):
+            return None
+        if name in self._decoded:
+            return self._decoded[name]
+        start = self._blobs_start + offset
+        if not pickled:
+            return self._map[start:start + length]
+        value = pickle.loads(self._map[start:start + length])
+        self._decoded[name] = value
+        return value
+
+
+def attach(path=None, root=".", publish_if_stale=True):
+    """Map the store at path, publishing a fresh one first if it is missing or stale."""
+    path = path or STORE_PATH
+    version = content_version(root)
+    try:
+        store = SharedStore(path)
+        if store.version == version:
+            return store
+    except (OSError, ValueError):
+        pass
+    if not publish_if_stale:
+        return None
+    publish(path, root)
+    return SharedStore(path)
+
+
+def get_store():
+    """Return this process's attached store, or None when SCENARIO_SHARED_STORE is unset."""
+    global _store, STORE_PATH
+    if not STORE_PATH:
+        return None
+    if _store is None:
+        with _attach_lock:
+            if _store is None:
+                try:
+                    with span("store.attach"):
+                        _store = attach()
+                except Exception as e:
+                    print(f"Error attaching shared store {STORE_PATH}: {str(e)}")
+                    # Don't retry on every rerun; run from local files
+                    STORE_PATH = None
+                    return None
+    return _store
+
+
+def load_scenario(scenario_id, config_file):
+    """Return (config, compiled) from the shared store, or None to build locally."""
+    store = get_store()
+    return store.get(scenario_key(scenario_id), config_file) if store else None
+
+
+def load_image(path):
+    """Return image bytes from the shared store, or None to read the file."""
+    store = get_store()
+    return store.get(image_key(path), path) if store else None
+
+
+def load_roster(path):
+    """Return formatted roster names from the shared store, or None to read the CSV."""
+    store = get_store()
+    if not store or not os.path.exists(path):
+        return None
+    return store.get(roster_key(path), path)
+
+
+def main():
+    """Publish or inspect a shared store file."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["publish", "inspect"])
+    parser.add_argument("--path", default=STORE_PATH or "scenario_store.bin")
+    parser.add_argument("--root", default=".")
+    args = parser.parse_args()
+
+    if args.command == "publish":
+        publish(args.path, args.root)
+
+    store = SharedStore(args.path)
+    current = store.version == content_version(args.root)
+    print(f"{args.path}: {store.size / 1024 / 1024:.1f} MiB, {len(store.index)} entries, "
+          f"version {store.version.hex()} ({'current' if current else 'stale'})")
+    kinds = {}
+    for name, (_, length, *_) in store.index.items():
+        kind = name.split("/", 1)[0]
+        count, total = kinds.get(kind, (0, 0))
+        kinds[kind] = (count + 1, total + length)
+    for kind, (count, total) in sorted(kinds.items()):
+        print(f"  {kind:<10} {count:>5} entries {total / 1024:>10.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
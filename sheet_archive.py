@@ -0,0 +1,279 @@
+"""
+Archive old reflection rows to compressed local files.
+
+Google Sheets slows down and approaches its cell limit as the reflection
+sheet grows, while old terms are rarely read. `archive` moves every row from
+a term before --before (default: the current term) out of the live sheet
+into gzip CSV files, one per term and scenario:
+
+    archive/Fall_2025/Liberty_Park_Scenario.csv.gz
+
+and lists them in archive/manifest.json. Archived rows are deleted from the
+unpartitioned first worksheet; partition worksheets of archived terms (see
+sheet_partitions.py) are deleted whole. Once the first worksheet has been split
+into partitions and renamed "Unpartitioned (copied)", its rows from archived
+terms are deleted without being archived a second time, since their copies in
+the partitions are. Files and manifest are written before
+anything is deleted, and rows that are already in the archive (after an
+interrupted run) are not added twice.
+
+generate_grades.py, batch_grades.py, the grade export page, analytics.py and
+reflection_similarity.py read the archived rows for the terms they need along
+with the live sheet, so archiving doesn't change their results while the
+live sheet stays about one term long. The archive lives in
+SCENARIO_ARCHIVE_DIR (default archive/) and holds student responses; keep it
+private.
+
+Usage:
+    python sheet_archive.py archive                       # uses GOOGLE_SHEET_URL
+    python sheet_archive.py archive --before "Fall 2025" --dry-run
+    python sheet_archive.py list
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import os
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+import sheet_partitions
+from generate_grades import EXPECTED_HEADERS, _safe_filename, detect_headers, get_google_sheets_client
+from sheet_partitions import COPIED_TITLE, current_term, parse_title, term_for, term_key
+from tracing import span
+
+ARCHIVE_DIR = os.getenv("SCENARIO_ARCHIVE_DIR", "archive")
+MANIFEST = "manifest.json"
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+LAST_COLUMN = "I"
+
+
+def read_manifest(archive_dir=None):
+    path = Path(archive_dir or ARCHIVE_DIR) / MANIFEST
+    if not path.exists():
+        return {"generation": 0, "files": []}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def archive_version(archive_dir=None):
+    """A value that changes whenever the archive does (None without one)."""
+    manifest = read_manifest(archive_dir)
+    return manifest["generation"] if manifest["files"] else None
+
+
+def _read_rows(path):
+    with gzip.open(path, "rt", newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))[1:]
+
+
+def _write_rows(path, rows):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with gzip.open(temp_path, "wt", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPECTED_HEADERS)
+        writer.writerows(rows)
+    os.replace(temp_path, path)
+
+
+def _write_manifest(manifest, archive_dir):
+    path = Path(archive_dir) / MANIFEST
+    temp_path = path.with_name(f"{MANIFEST}.{os.getpid()}.tmp")
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def _data_rows(values):
+    """(sheet row number, row padded to the expected columns) for each non-empty data row."""
+    _, rows = detect_headers(values)
+    first_number = len(values) - len(rows) + 1
+    for number, row in enumerate(rows, start=first_number):
+        if any(cell.strip() for cell in row):
+            yield number, (list(row) + [""] * len(EXPECTED_HEADERS))[:len(EXPECTED_HEADERS)]
+
+
+def _scenario(row):
+    return row[2].strip() or "Unknown Scenario"
+
+
+def plan_archive(spreadsheet, before):
+    """Find the rows from terms before `before`.
+
+    Returns (rows, deletions, worksheets): rows grouped by (term, scenario),
+    the first worksheet's rows to delete by row number, and the partition
+    worksheets to delete whole. A first worksheet that was already split is
+    only trimmed: its rows are archived from their partitions.
+    """
+    rows, deletions, worksheets = {}, {}, []
+    first = spreadsheet.sheet1
+    if not parse_title(first.title):
+        copied = first.title == COPIED_TITLE
+        for number, row in _data_rows(first.get_all_values()):
+            try:
+                term = term_for(datetime.strptime(row[0].strip(), TIMESTAMP_FORMAT))
+            except ValueError:
+                continue  # rows without a usable timestamp stay live
+            if term_key(term) < term_key(before):
+                if not copied:
+                    rows.setdefault((term, _scenario(row)), []).append(row)
+                deletions[number] = row
+
+    for title, worksheet in sorted(sheet_partitions.partition_index(spreadsheet, refresh=True).items()):
+        term, _ = parse_title(title)
+        if term_key(term) < term_key(before):
+            for _, row in _data_rows(worksheet.get_all_values()):
+                rows.setdefault((term, _scenario(row)), []).append(row)
+            worksheets.append(worksheet)
+    return rows, deletions, worksheets
+
+
+def _archive_path(term, scenario, used):
+    path = f"{_safe_filename(term)}/{_safe_filename(scenario)}.csv.gz"
+    suffix = 2
+    while used.get(path, (term, scenario)) != (term, scenario):
+        path = f"{_safe_filename(term)}/{_safe_filename(scenario)}_{suffix}.csv.gz"
+        suffix += 1
+    return path
+
+
+def write_archive(rows, archive_dir=None):
+    """Add rows ({(term, scenario): [row]}) to the archive files and manifest; returns rows added per key."""
+    archive_dir = archive_dir or ARCHIVE_DIR
+    manifest = read_manifest(archive_dir)
+    entries = {(entry["term"], entry["scenario"]): entry for entry in manifest["files"]}
+    used = {entry["path"]: key for key, entry in entries.items()}
+
+    added = {}
+    for (term, scenario), new_rows in rows.items():
+        entry = entries.get((term, scenario))
+        path = entry["path"] if entry else _archive_path(term, scenario, used)
+        used[path] = (term, scenario)
+        existing = _read_rows(Path(archive_dir) / path) if entry else []
+
+        # Rows already archived by an interrupted run are still live; skip them once each
+        archived = Counter(map(tuple, existing))
+        fresh = []
+        for row in new_rows:
+            if archived[tuple(row)]:
+                archived[tuple(row)] -= 1
+            else:
+                fresh.append(row)
+        all_rows = existing + fresh
+        _write_rows(Path(archive_dir) / path, all_rows)
+
+        timestamps = [row[0] for row in all_rows]
+        entries[(term, scenario)] = {"term": term, "scenario": scenario, "path": path, "rows": len(all_rows),
+                                     "first": min(timestamps), "last": max(timestamps)}
+        added[(term, scenario)] = len(fresh)
+
+    _write_manifest({
+        "generation": manifest["generation"] + 1,
+        "files": sorted(entries.values(), key=lambda entry: (term_key(entry["term"]), entry["scenario"])),
+    }, archive_dir)
+    return added
+
+
+def archive_sheet(spreadsheet, before=None, archive_dir=None, dry_run=False):
+    """Move rows from terms before `before` (default: the current term) into the archive.
+
+    Returns the number of rows moved per (term, scenario).
+    """
+    before = before or current_term()
+    archive_dir = archive_dir or ARCHIVE_DIR
+    with span("archive.plan"):
+        rows, deletions, worksheets = plan_archive(spreadsheet, before)
+    counts = {key: len(key_rows) for key, key_rows in rows.items()}
+    if dry_run or not (rows or deletions):
+        return counts
+
+    Path(archive_dir).mkdir(parents=True, exist_ok=True)
+    if rows:
+        write_archive(rows, archive_dir)
+
+    # Only now remove them from the live sheet: bottom run first, so row numbers above stay valid
+    runs = []
+    for number in deletions:
+        if runs and runs[-1][1] == number - 1:
+            runs[-1][1] = number
+        else:
+            runs.append([number, number])
+    first = spreadsheet.sheet1
+    for start, end in reversed(runs):
+        # Appends don't move these rows, but hand edits might; never delete a row that isn't the one archived
+        current = [(row + [""] * len(EXPECTED_HEADERS))[:len(EXPECTED_HEADERS)]
+                   for row in first.get(f"A{start}:{LAST_COLUMN}{end}")]
+        if current != [deletions[number] for number in range(start, end + 1)]:
+            raise RuntimeError(f"Rows {start}-{end} changed while archiving. They are archived but still live; "
+                               "run archive again to remove them.")
+        with span("sheets.delete_rows"):
+            first.delete_rows(start, end)
+    for worksheet in worksheets:
+        with span("sheets.del_worksheet"):
+            spreadsheet.del_worksheet(worksheet)
+    sheet_partitions.clear()
+    return counts
+
+
+def load_archived_records(terms=None, scenarios=None, archive_dir=None):
+    """Archived rows for the given terms and scenarios (None means all) as sheet records, oldest first."""
+    archive_dir = archive_dir or ARCHIVE_DIR
+    records = []
+    for entry in read_manifest(archive_dir)["files"]:
+        if terms is not None and entry["term"] not in terms:
+            continue
+        if scenarios is not None and entry["scenario"] not in scenarios:
+            continue
+        records.extend(dict(zip(EXPECTED_HEADERS, row)) for row in _read_rows(Path(archive_dir) / entry["path"]))
+    # Files are per scenario; interleave them back into submission order, as they were in the sheet
+    records.sort(key=lambda record: record["Timestamp"])
+    return records
+
+
+def with_archived(records, terms=None, archive_dir=None):
+    """Archived records for terms (None for every term) followed by the live records; None stays None."""
+    if records is None:
+        return None
+    archived = load_archived_records(terms, archive_dir=archive_dir)
+    return archived + records if archived else records
+
+
+def main():
+    """Archive old terms or list the archive."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["archive", "list"])
+    parser.add_argument("--before", help='Archive terms before this one, e.g. "Spring 2026" (default: current term)')
+    parser.add_argument("--dir", default=ARCHIVE_DIR)
+    parser.add_argument("--dry-run", action="store_true", help="Only count the rows that would be archived")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        files = read_manifest(args.dir)["files"]
+        for entry in files:
+            print(f"  {entry['term']} | {entry['scenario']}: {entry['rows']} rows "
+                  f"({entry['first']} to {entry['last']}) {entry['path']}")
+        print(f"{sum(entry['rows'] for entry in files)} archived rows in {len(files)} files")
+        return
+
+    if args.before and not parse_title(args.before):
+        parser.error('--before must be a term such as "Spring 2026"')
+    sheet_url = os.getenv("GOOGLE_SHEET_URL")
+    if not sheet_url:
+        print("Error: GOOGLE_SHEET_URL environment variable not set")
+        return
+    client = get_google_sheets_client()
+    if not client:
+        return
+
+    counts = archive_sheet(client.open_by_url(sheet_url), args.before, args.dir, args.dry_run)
+    for (term, scenario), count in sorted(counts.items(), key=lambda item: (term_key(item[0][0]), item[0][1])):
+        print(f"  {term} | {scenario}: {count} rows")
+    verb = "Would archive" if args.dry_run else "Archived"
+    print(f"{verb} {sum(counts.values())} rows from terms before {args.before or current_term()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Revision-aware snapshots of Google Sheets worksheets.
+
+Reading a worksheet with get_all_values() downloads every row. Most reads,
+though, find the sheet exactly as it was last time: repeated grade runs, and
+header checks when a session starts. This module first asks Drive for the
+spreadsheet's modifiedTime (a single metadata call). If that matches the
+revision of the local snapshot, the snapshot is returned. Otherwise the
+worksheet is downloaded and becomes the new snapshot.
+
+Snapshots are kept in memory and, so separate grade runs can share them,
+written to SCENARIO_SHEET_CACHE (default .sheet_cache/). They hold student
+responses, so keep that directory private. Set SCENARIO_SHEET_CACHE=off to
+keep snapshots in memory only; callers that must not leave responses on disk
+(the app's grade export) pass persist=False.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from tracing import span
+
+CACHE_DIR = os.getenv("SCENARIO_SHEET_CACHE", ".sheet_cache")
+
+_snapshots = {}  # key -> (revision, values)
+_row_checks = {}  # key -> (revision, has rows)
+_lock = threading.Lock()
+
+
+def _cache_key(worksheet):
+    return f"{worksheet.spreadsheet.id}:{worksheet.id}"
+
+
+def _snapshot_path(key):
+    if not CACHE_DIR or CACHE_DIR.lower() == "off":
+        return None
+    return Path(CACHE_DIR) / f"{hashlib.blake2b(key.encode('utf-8'), digest_size=12).hexdigest()}.json"
+
+
+def sheet_revision(worksheet):
+    """The spreadsheet's last modified time, or None if Drive metadata can't be read."""
+    try:
+        with span("sheets.get_lastUpdateTime"):
+            return worksheet.spreadsheet.get_lastUpdateTime()
+    except Exception:
+        return None
+
+
+def _load_snapshot(key, revision):
+    with _lock:
+        snapshot = _snapshots.get(key)
+    if snapshot and snapshot[0] == revision:
+        return snapshot[1]
+
+    path = _snapshot_path(key)
+    if path is None or not path.exists():
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if stored.get("key") != key or stored.get("revision") != revision:
+        return None
+    with _lock:
+        _snapshots[key] = (revision, stored["values"])
+    return stored["values"]
+
+
+def _save_snapshot(key, revision, values, persist=True):
+    with _lock:
+        _snapshots[key] = (revision, values)
+    path = _snapshot_path(key) if persist else None
+    if path is None:
+        return
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "revision": revision, "values": values}, f)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"Warning: could not write sheet snapshot: {str(e)}")
+
+
+def get_all_values(worksheet, persist=True):
+    """worksheet.get_all_values(), served from the snapshot while the spreadsheet is unchanged.
+
+    With persist=False a new snapshot is kept in memory only.
+    """
+    key = _cache_key(worksheet)
+    revision = sheet_revision(worksheet)
+    if revision is not None:
+        values = _load_snapshot(key, revision)
+        if values is not None:
+            return [list(row) for row in values]
+
+    with span("sheets.get_all_values"):
+        values = worksheet.get_all_values()
+    if revision is not None:
+        _save_snapshot(key, revision, [list(row) for row in values], persist)
+    return values
+
+
+def has_rows(worksheet):
+    """Whether the worksheet has any rows, reading at most its first row when the spreadsheet has changed."""
+    key = _cache_key(worksheet)
+    revision = sheet_revision(worksheet)
+    if revision is not None:
+        with _lock:
+            checked = _row_checks.get(key)
+        if checked and checked[0] == revision:
+            return checked[1]
+        values = _load_snapshot(key, revision)
+        if values is not None:
+            return bool(values)
+
+    with span("sheets.get_first_row"):
+        found = bool(worksheet.get("A1:I1"))
+    if revision is not None:
+        with _lock:
+            _row_checks[key] = (revision, found)
+    return found
+
+
+def clear():
+    """Drop in-memory snapshots (files on disk are left for the next run)."""
+    with _lock:
+        _snapshots.clear()
+        _row_checks.clear()
@@ -0,0 +1,272 @@
+"""
+Local SQLite mirror of the reflection sheet.
+
+Every consumer that calls get_all_values() downloads the whole sheet and
+spends API quota again. sync() keeps a SQLite copy current instead:
+1. A normal sync first asks Drive for the spreadsheet's revision (see
+   sheet_cache.py) and reads nothing if it hasn't changed. Otherwise it reads
+   only the rows past the last mirrored row, plus that last row again. If the
+   re-read row's hash no longer matches, rows were edited, inserted or
+   removed above the tail, and the sync falls back to a full read.
+2. A verify sync reads the whole sheet once and updates or removes every row
+   whose hash changed. It runs on --verify, on the first sync of an empty
+   mirror, when the revision changed but no rows were appended (an edit
+   somewhere above the tail), and at least every SCENARIO_MIRROR_VERIFY_SECONDS
+   (default 3600), so hand corrections reach the mirror even when they
+   coincide with new submissions.
+
+Rows are stored by sheet row number with indexes on student, scenario,
+timestamp and status. load_records() returns them in the same dict form
+parse_sheet_values() produces, so generate_grades.py and analytics.py can
+read the mirror in place of the sheet.
+
+Usage:
+    python sheet_mirror.py sync                 # tail sync from GOOGLE_SHEET_URL
+    python sheet_mirror.py sync --verify        # full hash comparison
+    python sheet_mirror.py stats
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from generate_grades import EXPECTED_HEADERS, detect_headers, get_google_sheets_client
+from sheet_cache import sheet_revision
+from tracing import span
+
+MIRROR_DB = os.getenv("SCENARIO_MIRROR_DB", "reflections.sqlite3")
+VERIFY_SECONDS = float(os.getenv("SCENARIO_MIRROR_VERIFY_SECONDS", "3600"))
+LAST_COLUMN = "I"
+
+# Mirror columns, in sheet column order
+COLUMNS = ["timestamp", "student", "scenario", "outcome", "choices",
+           "reflection_1", "reflection_2", "reflection_3", "status"]
+HEADER_FOR_COLUMN = dict(zip(COLUMNS, EXPECTED_HEADERS))
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS submissions (
+    row_number INTEGER PRIMARY KEY,
+    {", ".join(f"{column} TEXT NOT NULL DEFAULT ''" for column in COLUMNS)},
+    student_key TEXT NOT NULL DEFAULT '',
+    row_hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS submissions_student ON submissions(student_key);
+CREATE INDEX IF NOT EXISTS submissions_scenario ON submissions(scenario, status);
+CREATE INDEX IF NOT EXISTS submissions_timestamp ON submissions(timestamp);
+CREATE INDEX IF NOT EXISTS submissions_status ON submissions(status);
+CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+def connect(path=None):
+    """Open (and create if needed) the mirror database."""
+    conn = sqlite3.connect(path or MIRROR_DB)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _cells(row):
+    """The mirrored cells of a raw sheet row, without trailing blanks (as the Sheets API trims them)."""
+    cells = [str(cell) for cell in row[:len(COLUMNS)]]
+    while cells and cells[-1] == "":
+        cells.pop()
+    return cells
+
+
+def row_hash(row):
+    return hashlib.blake2b("\x1f".join(_cells(row)).encode("utf-8"), digest_size=12).hexdigest()
+
+
+def _get_state(conn, key, default=None):
+    row = conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+    return json.loads(row[0]) if row else default
+
+
+def _set_state(conn, key, value):
+    conn.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+
+def _column_order(headers):
+    """Map mirror columns to positions in the sheet's header row."""
+    positions = {header: i for i, header in enumerate(headers)}
+    return [positions.get(HEADER_FOR_COLUMN[column], i) for i, column in enumerate(COLUMNS)]
+
+
+def _upsert(conn, row_number, row, order):
+    cells = [str(cell) for cell in row]
+    values = [cells[i] if i < len(cells) else "" for i in order]
+    conn.execute(
+        f"INSERT OR REPLACE INTO submissions (row_number, {', '.join(COLUMNS)}, student_key, row_hash) "
+        f"VALUES ({', '.join('?' * (len(COLUMNS) + 3))})",
+        (row_number, *values, values[1].strip().lower(), row_hash(row)),
+    )
+
+
+def _full_sync(conn, worksheet):
+    with span("sheets.get_all_values"):
+        values = worksheet.get_all_values()
+    headers, data = detect_headers(values) if values else (EXPECTED_HEADERS, [])
+    header_rows = len(values) - len(data)
+    order = _column_order(headers)
+
+    stored = dict(conn.execute("SELECT row_number, row_hash FROM submissions"))
+    added = updated = 0
+    for row_number, row in enumerate(data, start=header_rows + 1):
+        if not any(row):
+            continue
+        previous = stored.pop(row_number, None)
+        if previous == row_hash(row):
+            continue
+        _upsert(conn, row_number, row, order)
+        if previous is None:
+            added += 1
+        else:
+            updated += 1
+    # Whatever is left no longer exists in the sheet (or became blank)
+    conn.executemany("DELETE FROM submissions WHERE row_number = ?", [(row_number,) for row_number in stored])
+
+    last_row = len(values)
+    while last_row > header_rows and not any(values[last_row - 1]):
+        last_row -= 1
+    _set_state(conn, "headers", list(headers) if header_rows else None)
+    _set_state(conn, "header_rows", header_rows)
+    _set_state(conn, "next_row", last_row + 1)
+    _set_state(conn, "last_hash", row_hash(values[last_row - 1]) if last_row else None)
+    _set_state(conn, "verified_at", time.time())
+    return {"added": added, "updated": updated, "removed": len(stored), "full": True}
+
+
+def _tail_sync(conn, worksheet):
+    next_row = _get_state(conn, "next_row", 1)
+    headers = _get_state(conn, "headers") or EXPECTED_HEADERS
+    start = max(next_row - 1, 1)
+    with span("sheets.get_tail"):
+        values = [list(row) for row in worksheet.get(f"A{start}:{LAST_COLUMN}")]
+
+    if next_row > 1:
+        # The last mirrored row must still be where we left it
+        if not values or row_hash(values[0]) != _get_state(conn, "last_hash"):
+            return None
+        values = values[1:]
+
+    order = _column_order(headers)
+    added = 0
+    for row_number, row in enumerate(values, start=next_row):
+        if any(row):
+            _upsert(conn, row_number, row, order)
+            added += 1
+    if values:
+        _set_state(conn, "next_row", next_row + len(values))
+        _set_state(conn, "last_hash", row_hash(values[-1]))
+    return {"added": added, "updated": 0, "removed": 0, "full": False}
+
+
+def sync(conn, worksheet, sheet_url=None, verify=False, verify_seconds=None):
+    """Bring the mirror up to date with the worksheet; return counts of added, updated and removed rows."""
+    verify_seconds = VERIFY_SECONDS if verify_seconds is None else verify_seconds
+    with conn:
+        if sheet_url is not None and _get_state(conn, "sheet_url") != sheet_url:
+            # A different sheet: start over
+            conn.execute("DELETE FROM submissions")
+            conn.execute("DELETE FROM sync_state")
+            _set_state(conn, "sheet_url", sheet_url)
+
+        revision = sheet_revision(worksheet)
+        if time.time() - _get_state(conn, "verified_at", 0) >= verify_seconds:
+            verify = True
+        if not verify and revision is not None and revision == _get_state(conn, "revision"):
+            return {"added": 0, "updated": 0, "removed": 0, "full": False}
+
+        result = None
+        if not verify and _get_state(conn, "next_row") is not None:
+            result = _tail_sync(conn, worksheet)
+            if result is not None and not result["added"] and revision is not None:
+                result = None  # the sheet changed, but not at the tail: look for the edit
+        if result is None:
+            result = _full_sync(conn, worksheet)
+        _set_state(conn, "revision", revision)
+        if result["added"] or result["updated"] or result["removed"]:
+            _set_state(conn, "version", _get_state(conn, "version", 0) + 1)
+    return result
+
+
+def data_version(conn):
+    """Counter bumped whenever a sync changes the mirror; a cheap cache key for analyses."""
+    return _get_state(conn, "version", 0)
+
+
+def load_records(conn, scenario=None, status=None, student=None, since=None):
+    """Return mirrored rows as sheet record dicts, filtered on the indexed columns."""
+    clauses, params = [], []
+    if scenario is not None:
+        clauses.append("scenario = ?")
+        params.append(scenario)
+    if status is not None:
+        clauses.append("status = ?")
+        params.append(status)
+    if student is not None:
+        clauses.append("student_key = ?")
+        params.append(student.strip().lower())
+    if since is not None:
+        clauses.append("timestamp >= ?")
+        params.append(since)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM submissions {where} ORDER BY row_number", params)
+    return [dict(zip(EXPECTED_HEADERS, row)) for row in rows]
+
+
+def read_mirrored_sheet(sheet_url, db_path=None, client=None, verify=False, verify_seconds=None):
+    """Sync the mirror from the sheet at sheet_url and return all its records, or None if the sheet can't be read."""
+    client = client or get_google_sheets_client()
+    if not client:
+        return None
+    conn = connect(db_path)
+    try:
+        try:
+            with span("sheets.open_by_url"):
+                worksheet = client.open_by_url(sheet_url).sheet1
+            result = sync(conn, worksheet, sheet_url, verify, verify_seconds)
+            print(f"   Mirror sync: {result['added']} added, {result['updated']} updated, "
+                  f"{result['removed']} removed ({'full read' if result['full'] else 'new rows only'})")
+        except Exception as e:
+            print(f"Error syncing mirror, using last synced copy: {str(e)}")
+        return load_records(conn)
+    finally:
+        conn.close()
+
+
+def main():
+    """Sync the mirror or print its contents by scenario and status."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["sync", "stats"])
+    parser.add_argument("--db", default=MIRROR_DB)
+    parser.add_argument("--verify", action="store_true", help="Read the whole sheet and compare every row hash")
+    args = parser.parse_args()
+
+    if args.command == "sync":
+        sheet_url = os.getenv("GOOGLE_SHEET_URL")
+        if not sheet_url:
+            print("Error: GOOGLE_SHEET_URL environment variable not set")
+            return
+        records = read_mirrored_sheet(sheet_url, args.db, verify=args.verify)
+        if records is not None:
+            print(f"{len(records)} rows mirrored in {args.db}")
+        return
+
+    conn = connect(args.db)
+    try:
+        total = conn.execute("SELECT COUNT(*) FROM submissions").fetchone()[0]
+        print(f"{args.db}: {total} rows, version {data_version(conn)}, next sheet row {_get_state(conn, 'next_row')}")
+        query = "SELECT scenario, status, COUNT(*) FROM submissions GROUP BY scenario, status ORDER BY scenario"
+        for scenario, status, count in conn.execute(query):
+            print(f"  {count:>7}  {scenario} ({status or 'no status'})")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+Partitioned reflection sheet: one worksheet per term (and optionally per scenario).
+
+With SCENARIO_SHEET_PARTITION unset or "off", every submission goes to the
+first worksheet, as before. With "term", rows are appended to a worksheet
+named after the term of their timestamp ("Fall 2025", "Spring 2026"). With
+"scenario", they go to one worksheet per term and scenario ("Spring 2026 |
+Liberty Park Scenario"). A partition is created, with its header row, the
+first time a row is routed to it. Readers open only the partitions they ask
+for, so reading the current term costs the same however many years of
+history the spreadsheet holds.
+
+Terms run January-June (Spring) and July-December (Fall). SCENARIO_TERM
+overrides the term label that new submissions are written under.
+
+Each process caches the partition index (partition worksheets by title) and
+re-lists the spreadsheet's worksheets at most every SCENARIO_PARTITION_INDEX_TTL
+seconds (default 300), or when a writer can't find its partition.
+
+Rows written before partitioning was turned on stay in the first worksheet.
+Every read still includes them (term reads keep only that worksheet's rows of
+the requested terms, and warn that they are there). `split` copies them into
+their partitions and then renames that worksheet to "Unpartitioned (copied)",
+which readers skip, so no row is counted twice and nothing is deleted. Rows a
+partition already holds are not copied again, so a split interrupted before
+the rename can simply be run again.
+
+Usage:
+    python sheet_partitions.py list     # uses GOOGLE_SHEET_URL
+    python sheet_partitions.py split
+"""
+
+import argparse
+import os
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import sheet_cache
+from generate_grades import EXPECTED_HEADERS, detect_headers, get_google_sheets_client, parse_sheet_values
+from tracing import span
+
+PARTITION_MODE = os.getenv("SCENARIO_SHEET_PARTITION", "off")
+INDEX_SECONDS = float(os.getenv("SCENARIO_PARTITION_INDEX_TTL", "300"))
+TERM = os.getenv("SCENARIO_TERM")
+SEPARATOR = " | "
+COPIED_TITLE = "Unpartitioned (copied)"
+MAX_TITLE = 100  # Sheets' limit on worksheet titles
+
+_TITLE = re.compile(r"^(Spring|Fall) (\d{4})(?: \| (.+))?$")
+_indexes = {}  # spreadsheet id -> (listed_at, {title: worksheet})
+_indexes_lock = threading.Lock()
+
+
+def partitioned(mode=None):
+    return (mode or PARTITION_MODE) in ("term", "scenario")
+
+
+def term_for(when):
+    return f"{'Spring' if when.month <= 6 else 'Fall'} {when.year}"
+
+
+def term_key(term):
+    """Sort key putting terms in calendar order ("Spring 2026" after "Fall 2025")."""
+    season, year = term.split(" ")
+    return int(year), 0 if season == "Spring" else 1
+
+
+def current_term():
+    return TERM or term_for(datetime.now())
+
+
+def row_term(timestamp):
+    """Term of a "%Y-%m-%d %H:%M:%S" timestamp; unparseable ones belong to the current term."""
+    try:
+        return term_for(datetime.strptime(timestamp.strip(), "%Y-%m-%d %H:%M:%S"))
+    except ValueError:
+        return current_term()
+
+
+def partition_title(term, scenario=None, mode=None):
+    if (mode or PARTITION_MODE) != "scenario":
+        return term
+    return f"{term}{SEPARATOR}{scenario or 'Unknown Scenario'}"[:MAX_TITLE]
+
+
+def parse_title(title):
+    """(term, scenario or None) for a partition title, or None for any other worksheet."""
+    match = _TITLE.match(title)
+    if not match:
+        return None
+    return f"{match.group(1)} {match.group(2)}", match.group(3)
+
+
+def partition_index(spreadsheet, refresh=False):
+    """Partition worksheets by title, re-listed at most every INDEX_SECONDS."""
+    with _indexes_lock:
+        cached = _indexes.get(spreadsheet.id)
+        if cached and not refresh and time.monotonic() - cached[0] < INDEX_SECONDS:
+            return cached[1]
+    with span("sheets.list_worksheets"):
+        worksheets = spreadsheet.worksheets()
+    index = {worksheet.title: worksheet for worksheet in worksheets if parse_title(worksheet.title)}
+    with _indexes_lock:
+        _indexes[spreadsheet.id] = (time.monotonic(), index)
+    return index
+
+
+def clear():
+    """Forget every cached partition index."""
+    with _indexes_lock:
+        _indexes.clear()
+
+
+def get_partition(spreadsheet, title):
+    """The partition worksheet with this title, created with a header row if it doesn't exist yet."""
+    index = partition_index(spreadsheet)
+    if title not in index:
+        index = partition_index(spreadsheet, refresh=True)
+    if title in index:
+        return index[title]
+
+    try:
+        with span("sheets.add_worksheet"):
+            worksheet = spreadsheet.add_worksheet(title=title, rows=1000, cols=len(EXPECTED_HEADERS))
+            worksheet.append_row(EXPECTED_HEADERS)
+    except Exception:
+        # Another process created it first
+        index = partition_index(spreadsheet, refresh=True)
+        if title not in index:
+            raise
+        return index[title]
+    with _indexes_lock:
+        index[title] = worksheet
+    return worksheet
+
+
+def worksheet_for_row(spreadsheet, row_data, mode=None):
+    """The partition a reflection row (as built by build_reflection_row) belongs in."""
+    return get_partition(spreadsheet, partition_title(TERM or row_term(row_data[0]), row_data[2].strip(), mode))
+
+
+def unpartitioned(worksheet):
+    """Whether this is the first worksheet holding rows from before partitioning."""
+    return not parse_title(worksheet.title) and worksheet.title != COPIED_TITLE
+
+
+def select_partitions(spreadsheet, terms=None, scenarios=None):
+    """Worksheets holding the given terms and scenarios (None means all), after the
+    unpartitioned first worksheet if it hasn't been split yet."""
+    selected = []
+    for title, worksheet in sorted(partition_index(spreadsheet).items()):
+        term, scenario = parse_title(title)
+        if terms is not None and term not in terms:
+            continue
+        # (a long scenario name is cut short in its title)
+        if scenarios is not None and scenario is not None and not any(name.startswith(scenario) for name in scenarios):
+            continue
+        selected.append(worksheet)
+
+    first = spreadsheet.sheet1
+    if unpartitioned(first):
+        selected.insert(0, first)
+    return selected
+
+
+def legacy_records(records, terms):
+    """Keep the unpartitioned worksheet's records from the given terms, warning that they haven't been split."""
+    kept = [record for record in records if row_term(record.get("Timestamp", "")) in terms]
+    if kept:
+        print(f"Warning: {len(kept)} rows from {', '.join(terms)} are still in the unpartitioned first "
+              "worksheet; run `python sheet_partitions.py split` to move them into their partitions.")
+    return kept
+
+
+def read_partitions(spreadsheet, terms=None, scenarios=None, persist=True):
+    """Records from the selected partitions (each through the sheet cache), partition by partition."""
+    records = []
+    for worksheet in select_partitions(spreadsheet, terms, scenarios):
+        values = sheet_cache.get_all_values(worksheet, persist)
+        if not values:
+            continue
+        worksheet_records = parse_sheet_values(values, verbose=False)
+        if terms is not None and unpartitioned(worksheet):
+            worksheet_records = legacy_records(worksheet_records, terms)
+        records.extend(worksheet_records)
+    if scenarios is not None:
+        records = [record for record in records if record.get("Scenario Title", "").strip() in scenarios]
+    return records
+
+
+def _padded(row):
+    return (list(row) + [""] * len(EXPECTED_HEADERS))[:len(EXPECTED_HEADERS)]
+
+
+def split_unpartitioned(spreadsheet, mode=None):
+    """Copy the first worksheet's rows into their partitions and mark it copied; returns {title: rows copied}."""
+    first = spreadsheet.sheet1
+    if not unpartitioned(first):
+        return {}
+    _, rows = detect_headers(first.get_all_values())
+
+    # History goes by the term of its timestamps, whatever SCENARIO_TERM says
+    routed = {}
+    for row in rows:
+        if not any(cell.strip() for cell in row):
+            continue
+        row = _padded(row)
+        routed.setdefault(partition_title(row_term(row[0]), row[2].strip(), mode), []).append(row)
+
+    copied = {}
+    for title, title_rows in routed.items():
+        partition = get_partition(spreadsheet, title)
+        # Rows copied by an interrupted split are already there; skip them once each
+        _, existing = detect_headers(partition.get_all_values())
+        present = Counter(tuple(_padded(row)) for row in existing)
+        fresh = []
+        for row in title_rows:
+            if present[tuple(row)]:
+                present[tuple(row)] -= 1
+            else:
+                fresh.append(row)
+        if fresh:
+            with span("sheets.append_rows"):
+                partition.append_rows(fresh)
+        copied[title] = len(fresh)
+    first.update_title(COPIED_TITLE)
+    return copied
+
+
+def main():
+    """List the partitions or split the unpartitioned history into them."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["list", "split"])
+    parser.add_argument("--mode", choices=["term", "scenario"], default=PARTITION_MODE if partitioned() else "term")
+    args = parser.parse_args()
+
+    sheet_url = os.getenv("GOOGLE_SHEET_URL")
+    if not sheet_url:
+        print("Error: GOOGLE_SHEET_URL environment variable not set")
+        return
+    client = get_google_sheets_client()
+    if not client:
+        return
+    spreadsheet = client.open_by_url(sheet_url)
+
+    if args.command == "split":
+        copied = split_unpartitioned(spreadsheet, args.mode)
+        for title, count in sorted(copied.items()):
+            print(f"  {title}: {count} rows")
+        print(f"Copied {sum(copied.values())} rows into {len(copied)} partitions" if copied
+              else "Nothing to split")
+        return
+
+    print(f"Current term: {current_term()} (mode: {PARTITION_MODE})")
+    for title, worksheet in sorted(partition_index(spreadsheet).items()):
+        print(f"  {title}: {worksheet.row_count} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,120 +3,172 @@ from google.oauth2.service_account import Credentials
 import streamlit as st
 import json
 from datetime import datetime
+import sheet_cache
+import sheet_partitions
+from tracing import span, traced
 
+def _authorize_client():
+    """Build an authorized gspread client; raises on missing or bad credentials."""
+    import os
+    
+    # Try to read from secret file (Render) first, then fallback to Streamlit secrets
+    credentials_dict = None
+    
+    # Check for Render secret file locations
+    secret_file_paths = [
+        "/etc/secrets/google_credentials.json",  # Render secret file location
+        "google_credentials.json",               # Local/root directory
+    ]
+    
+    for file_path in secret_file_paths:
+        if os.path.exists(file_path):
+            with open(file_path, 'r') as f:
+                credentials_dict = json.load(f)
+            break
+    
+    # Fallback to Streamlit secrets if no file found
+    if not credentials_dict:
+        credentials_dict = {
+            "type": st.secrets["gcp_service_account"]["type"],
+            "project_id": st.secrets["gcp_service_account"]["project_id"],
+            "private_key_id": st.secrets["gcp_service_account"]["private_key_id"],
+            "private_key": st.secrets["gcp_service_account"]["private_key"],
+            "client_email": st.secrets["gcp_service_account"]["client_email"],
+            "client_id": st.secrets["gcp_service_account"]["client_id"],
+            "auth_uri": st.secrets["gcp_service_account"]["auth_uri"],
+            "token_uri": st.secrets["gcp_service_account"]["token_uri"],
+            "auth_provider_x509_cert_url": st.secrets["gcp_service_account"]["auth_provider_x509_cert_url"],
+            "client_x509_cert_url": st.secrets["gcp_service_account"]["client_x509_cert_url"]
+        }
+    
+    credentials = Credentials.from_service_account_info(
+        credentials_dict,
+        scopes=[
+            "https://www.googleapis.com/auth/spreadsheets",
+            "https://www.googleapis.com/auth/drive"
+        ]
+    )
+    
+    return gspread.authorize(credentials)
+
+@traced("sheets.client")
 def get_google_sheets_client():
     """Initialize Google Sheets client using service account credentials from file or Streamlit secrets."""
     try:
-        import os
-        
-        # Try to read from secret file (Render) first, then fallback to Streamlit secrets
-        credentials_dict = None
-        
-        # Check for Render secret file locations
-        secret_file_paths = [
-            "/etc/secrets/google_credentials.json",  # Render secret file location
-            "google_credentials.json",               # Local/root directory
-        ]
-        
-        for file_path in secret_file_paths:
-            if os.path.exists(file_path):
-                with open(file_path, 'r') as f:
-                    credentials_dict = json.load(f)
-                break
-        
-        # Fallback to Streamlit secrets if no file found
-        if not credentials_dict:
-            credentials_dict = {
-                "type": st.secrets["gcp_service_account"]["type"],
-                "project_id": st.secrets["gcp_service_account"]["project_id"],
-                "private_key_id": st.secrets["gcp_service_account"]["private_key_id"],
-                "private_key": st.secrets["gcp_service_account"]["private_key"],
-                "client_email": st.secrets["gcp_service_account"]["client_email"],
-                "client_id": st.secrets["gcp_service_account"]["client_id"],
-                "auth_uri": st.secrets["gcp_service_account"]["auth_uri"],
-                "token_uri": st.secrets["gcp_service_account"]["token_uri"],
-                "auth_provider_x509_cert_url": st.secrets["gcp_service_account"]["auth_provider_x509_cert_url"],
-                "client_x509_cert_url": st.secrets["gcp_service_account"]["client_x509_cert_url"]
-            }
-        
-        credentials = Credentials.from_service_account_info(
-            credentials_dict,
-            scopes=[
-                "https://www.googleapis.com/auth/spreadsheets",
-                "https://www.googleapis.com/auth/drive"
-            ]
-        )
-        
-        return gspread.authorize(credentials)
+        return _authorize_client()
     except Exception as e:
         st.error(f"Error connecting to Google Sheets: {str(e)}")
         return None
 
-def get_or_create_sheet():
-    """Get or create worksheet, shared helper function"""
+def get_sheet_url():
+    """Reflection sheet URL from the environment or Streamlit secrets"""
+    import os
+    try:
+        return os.getenv("GOOGLE_SHEET_URL") or st.secrets.get("google_sheet_url", "")
+    except Exception:
+        return ""
+
+def get_spreadsheet():
+    """Open the reflection spreadsheet, shared helper function"""
     try:
         client = get_google_sheets_client()
         if not client:
             return None
         
-        import os
-        sheet_url = os.getenv("GOOGLE_SHEET_URL") or st.secrets.get("google_sheet_url", "")
+        sheet_url = get_sheet_url()
         if not sheet_url:
             st.error("Google Sheet URL not configured in environment or secrets.")
             return None
             
-        spreadsheet = client.open_by_url(sheet_url)
-        return spreadsheet.sheet1
+        with span("sheets.open_by_url"):
+            return client.open_by_url(sheet_url)
         
     except Exception as e:
         st.error(f"Error accessing Google Sheets: {str(e)}")
         return None
 
+def get_or_create_sheet():
+    """Get or create worksheet, shared helper function"""
+    spreadsheet = get_spreadsheet()
+    return spreadsheet.sheet1 if spreadsheet else None
+
+def build_reflection_row(student_name, outcome, scenario=None, choices_made=None, **reflections):
+    """Return the sheet row for one reflection submission"""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    choices_summary = " → ".join([choice["choice"] for choice in choices_made]) if choices_made else "No choices recorded"
+    
+    # Start with basic fields
+    row_data = [
+        timestamp,
+        student_name,
+        scenario or "Unknown Scenario",
+        outcome,
+        choices_summary
+    ]
+    
+    # Add reflection responses in order
+    reflection_keys = sorted([k for k in reflections.keys() if k.startswith('reflection_')])
+    for key in reflection_keys:
+        row_data.append(reflections[key])
+    
+    # Add completion status
+    row_data.append("Completed")
+    return row_data
+
+@traced("sheets.append_reflection")
+def append_reflection_row(row_data, sheet_url):
+    """Append a prepared row without touching the page; raises on failure so it can run off the script thread"""
+    if not sheet_url:
+        raise RuntimeError("Google Sheet URL not configured in environment or secrets.")
+    client = _authorize_client()
+    with span("sheets.open_by_url"):
+        spreadsheet = client.open_by_url(sheet_url)
+    # With SCENARIO_SHEET_PARTITION set, the row goes to its term (and scenario) worksheet
+    sheet = sheet_partitions.worksheet_for_row(spreadsheet, row_data) if sheet_partitions.partitioned() \
+        else spreadsheet.sheet1
+    with span("sheets.append_row"):
+        sheet.append_row(row_data)
+    return True
+
+@traced("sheets.save_reflection")
 def save_reflection_to_sheets(student_name, outcome, scenario=None, choices_made=None, **reflections):
     """Save reflection data to Google Sheets with flexible reflection fields"""
     try:
-        sheet = get_or_create_sheet()
-        if not sheet:
+        spreadsheet = get_spreadsheet()
+        if not spreadsheet:
             return False
         
-        # Prepare the row data
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        choices_summary = " → ".join([choice["choice"] for choice in choices_made]) if choices_made else "No choices recorded"
-        
-        # Start with basic fields
-        row_data = [
-            timestamp,
-            student_name,
-            scenario or "Unknown Scenario",
-            outcome,
-            choices_summary
-        ]
-        
-        # Add reflection responses in order
-        reflection_keys = sorted([k for k in reflections.keys() if k.startswith('reflection_')])
-        for key in reflection_keys:
-            row_data.append(reflections[key])
+        row_data = build_reflection_row(student_name, outcome, scenario, choices_made, **reflections)
         
-        # Add completion status
-        row_data.append("Completed")
+        # With SCENARIO_SHEET_PARTITION set, the row goes to its term (and scenario) worksheet
+        if sheet_partitions.partitioned():
+            sheet = sheet_partitions.worksheet_for_row(spreadsheet, row_data)
+        else:
+            sheet = spreadsheet.sheet1
         
         # Append the row
-        sheet.append_row(row_data)
+        with span("sheets.append_row"):
+            sheet.append_row(row_data)
         return True
         
     except Exception as e:
         st.error(f"Error saving to Google Sheets: {str(e)}")
         return False
 
+@traced("sheets.initialize")
 def initialize_google_sheet():
     """Initialize the Google Sheet with headers if it's empty."""
+    # Partitions get their header row when they are created
+    if sheet_partitions.partitioned():
+        return True
+
     try:
         sheet = get_or_create_sheet()
         if not sheet:
             return False
         
-        # Check if headers exist
-        if not sheet.get_all_values():
+        # Check if headers exist (one metadata call while the spreadsheet is unchanged)
+        if not sheet_cache.has_rows(sheet):
             headers = [
                 "Timestamp",
                 "Student Name",
@@ -128,7 +180,8 @@ def initialize_google_sheet():
                 "Reflection 3",
                 "Completion Status"
             ]
-            sheet.append_row(headers)
+            with span("sheets.append_row"):
+                sheet.append_row(headers)
             return True
             
     except Exception as e:
@@ -0,0 +1,59 @@
+"""
+Signed, URL-safe tokens carrying a session's scenario progress.
+
+The engine writes the current progress to ?state=<token> after every rerun.
+When a dropped websocket gives the student a fresh session, the token in the
+URL restores their scene, choices and variables with one decode. The server
+stores nothing.
+
+A token is the ScenarioProgress snapshot plus a truncated HMAC-SHA256, both
+base64url-encoded. Set SCENARIO_STATE_SECRET so tokens survive server
+restarts. Without it, a random per-process secret is used and tokens from a
+previous process are ignored.
+"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+import os
+import secrets
+
+from scenario_state import ScenarioProgress
+
+QUERY_PARAM = "state"
+SIGNATURE_BYTES = 16
+
+_process_secret = secrets.token_bytes(32)
+
+
+def _secret():
+    configured = os.getenv("SCENARIO_STATE_SECRET")
+    return configured.encode("utf-8") if configured else _process_secret
+
+
+def _sign(payload):
+    return hmac.new(_secret(), payload, hashlib.sha256).digest()[:SIGNATURE_BYTES]
+
+
+def encode(progress):
+    """Return a signed token for the progress."""
+    payload = progress.to_bytes()
+    return base64.urlsafe_b64encode(payload + _sign(payload)).rstrip(b"=").decode("ascii")
+
+
+def decode(token):
+    """Return the ScenarioProgress in a token, or None if it is malformed or not signed by us."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except (binascii.Error, ValueError):
+        return None
+    payload, signature = raw[:-SIGNATURE_BYTES], raw[-SIGNATURE_BYTES:]
+    if len(payload) == 0 or not hmac.compare_digest(signature, _sign(payload)):
+        return None
+    try:
+        return ScenarioProgress.from_bytes(payload)
+    except ValueError:
+        return None
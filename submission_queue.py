@@ -0,0 +1,92 @@
+"""
+Background worker pool for reflection submissions.
+
+Saving a reflection means authorizing a Sheets client, opening the sheet and
+appending a row, which can take seconds when Google is slow. Running it on
+the Streamlit script thread freezes the student's page for that long and lets
+a second click send a duplicate row.
+
+Instead, the page hands the prepared row to submit() with an idempotency token
+and polls status() until the write finishes. Submitting a token that is
+already pending or succeeded returns the existing job, so repeated clicks send
+one write. A failed token can be submitted again to retry.
+
+SCENARIO_SUBMIT_WORKERS (default 4) bounds the number of concurrent writes.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from tracing import register_collector
+
+MAX_WORKERS = int(os.getenv("SCENARIO_SUBMIT_WORKERS", "4"))
+# Finished jobs kept so late polls and repeat clicks still find their result
+MAX_FINISHED = 1000
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+_executor = None
+_jobs = OrderedDict()
+_jobs_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _jobs_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="reflection-submit")
+        return _executor
+
+
+def _prune_finished():
+    """Drop the oldest finished jobs beyond MAX_FINISHED; caller holds _jobs_lock."""
+    finished = [token for token, future in _jobs.items() if future.done()]
+    for token in finished[:max(0, len(finished) - MAX_FINISHED)]:
+        del _jobs[token]
+
+
+def submit(token, fn, *args, **kwargs):
+    """Run fn(*args, **kwargs) in the pool once per token and return its future."""
+    executor = _get_executor()
+    with _jobs_lock:
+        future = _jobs.get(token)
+        if future is not None and not (future.done() and future.exception() is not None):
+            return future
+        future = executor.submit(fn, *args, **kwargs)
+        _jobs[token] = future
+        _prune_finished()
+        return future
+
+
+def status(token):
+    """Return (state, error message) for a token; state is None if it was never submitted."""
+    with _jobs_lock:
+        future = _jobs.get(token)
+    if future is None:
+        return None, None
+    if not future.done():
+        return PENDING, None
+    error = future.exception()
+    if error is not None:
+        return FAILED, str(error)
+    return DONE, None
+
+
+def pending_count():
+    with _jobs_lock:
+        return sum(1 for future in _jobs.values() if not future.done())
+
+
+def _collect_metrics():
+    return [
+        "# HELP scenario_submissions_pending Reflection writes queued or in flight",
+        "# TYPE scenario_submissions_pending gauge",
+        f"scenario_submissions_pending {pending_count()}",
+    ]
+
+
+register_collector(_collect_metrics)
@@ -0,0 +1,407 @@
+"""
+Generate synthetic term-scale data for the grade pipeline.
+
+Produces rosters of any size and reflection sheets that look like a real end
+of year: pre-cutoff free-form names, post-cutoff "LastName, FirstName" names,
+typos, students missing from the roster, duplicate submissions, empty rows,
+other completion statuses, and header or no-header layouts. Choice paths are
+random walks through the real scenarios.
+
+Data can be written to CSV files or served through LocalSheetsClient, a small
+in-memory stand-in for the gspread client used by generate_grades.py.
+
+Usage:
+    python synthetic_data.py write --rows 50000 --roster-size 2000 --out synthetic/
+    python synthetic_data.py scale --sizes 1000 10000 100000
+"""
+
+import argparse
+import csv
+import random
+import re
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from generate_grades import EXPECTED_HEADERS
+
+CUTOFF_DATE = datetime(2025, 10, 9)
+TERM_START = datetime(2025, 8, 25)
+TERM_END = datetime(2025, 12, 12)
+
+FIRST_NAMES = [
+    "Kyleigh", "Toluwalase", "Lucero", "Jaelynn", "Barakah", "Raymond", "Stephanie", "Abubakar",
+    "Leo", "Genesis", "Marcus", "Priya", "Diego", "Hannah", "Jamal", "Mei", "Olivia", "Ethan",
+    "Sofia", "Liam", "Aaliyah", "Mateo", "Chloe", "Isaiah", "Zoe", "Andre", "Camila", "Tyler",
+    "Nia", "Gabriel", "Destiny", "Luis", "Madison", "Kevin", "Aisha", "Brandon", "Jasmine", "Omar",
+]
+LAST_NAMES = [
+    "Adams", "Adelakun", "Albelo", "Alexander", "Alimi", "Appleberry", "Acosta", "Aiyepola",
+    "Akporumeta", "Aragon Ramos", "Brooks", "Chen", "Garcia", "Nguyen", "Okafor", "Patel",
+    "Ramirez", "Robinson", "Sanchez", "Thompson", "Washington", "Williams", "Young", "Zamora",
+    "Hernandez", "Johnson", "Kim", "Lopez", "Martinez", "Nelson", "Ortiz", "Perez", "Reyes",
+]
+REFLECTION_WORDS = (
+    "the choices showed how hard it is to balance competing interests in government "
+    "I learned that compromise often means nobody gets everything they want and "
+    "federal state local authority constitution rights citizens community pressure "
+    "leaders voters coalition support opposition consequences decision policy law "
+    "history fairness power responsibility public opinion media advocacy protest"
+).split()
+
+
+def generate_roster(size, sections=4, seed=0):
+    """Build roster rows with unique names and a Class Period for each student."""
+    rng = random.Random(seed)
+    combos = [(last, first) for last in LAST_NAMES for first in FIRST_NAMES]
+    rng.shuffle(combos)
+
+    # Hyphenated last names extend the pool once simple combinations run out
+    if size > len(combos):
+        hyphenated = [(f"{a}-{b}", first) for a in LAST_NAMES for b in LAST_NAMES if a != b
+                      for first in FIRST_NAMES]
+        rng.shuffle(hyphenated)
+        combos.extend(hyphenated)
+    if size > len(combos):
+        raise ValueError(f"Roster size {size} exceeds the {len(combos)} unique synthetic names")
+
+    rows = []
+    for i, (last, first) in enumerate(combos[:size]):
+        rows.append({
+            "OrgDefinedId": f"#5{i:07d}",
+            "Last Name": last,
+            "First Name": first,
+            "Email": f"{first[0].lower()}{last.lower().replace(' ', '')}{i}@example.edu",
+            "Class Period": f"Group {i % sections + 1}",
+            "End-of-Line Indicator": "#",
+        })
+    return rows
+
+
+def load_scenarios(scenarios_dir="scenarios"):
+    """Load a ScenarioEngine for every scenario directory with a config."""
+    from scenario_engine import ScenarioEngine
+
+    return [ScenarioEngine(config_file.parent) for config_file in sorted(Path(scenarios_dir).glob("*/config.json"))]
+
+
+def random_walk(engine, rng):
+    """Follow random choices from scene "1" to an end scene; return (choice texts, outcome)."""
+    variables = dict(engine.variables)
+    texts = []
+    scene_id = "1"
+    for _ in range(200):
+        scene = engine.scenes[scene_id]
+        if scene["type"] == "end":
+            return texts, scene.get("outcome", "unknown")
+        if scene["type"] == "choice":
+            choice = rng.choice(scene["choices"])
+            for var_name, change in (choice.get("effects") or {}).items():
+                if var_name in variables:
+                    variables[var_name] += change
+            texts.append(choice["text"])
+            scene_id = choice["next"]
+        elif scene["type"] == "auto_advance":
+            scene_id = scene["next"]
+        else:
+            scene_id = scene.get("default")
+            for condition_obj in scene.get("conditions", []):
+                if engine.evaluate_condition(condition_obj["condition"], variables):
+                    scene_id = condition_obj["next"]
+                    break
+    return texts, "unknown"
+
+
+def _typo(name, rng):
+    """Introduce a single realistic typo: dropped, doubled or swapped letters."""
+    if len(name) < 4:
+        return name
+    i = rng.randrange(1, len(name) - 1)
+    kind = rng.randrange(3)
+    if kind == 0:
+        return name[:i] + name[i + 1:]
+    if kind == 1:
+        return name[:i] + name[i] + name[i:]
+    return name[:i - 1] + name[i] + name[i - 1] + name[i + 1:]
+
+
+def _free_form_name(student, rng, typo_rate):
+    """Name as a student typed it before the roster dropdown existed."""
+    first, last = student["First Name"], student["Last Name"]
+    style = rng.random()
+    if style < 0.6:
+        name = f"{first} {last}"
+    elif style < 0.8:
+        name = f"{last}, {first}"
+    elif style < 0.9:
+        name = f"{first.lower()} {last.lower()}"
+    else:
+        name = f"  {first}  {last} "
+    if rng.random() < typo_rate:
+        name = _typo(name, rng)
+    return name
+
+
+def _reflection(rng, words=40):
+    return " ".join(rng.choice(REFLECTION_WORDS) for _ in range(words)).capitalize() + "."
+
+
+def generate_sheet_values(rows, roster, scenarios=None, header=True, seed=0,
+                          pre_cutoff_share=0.35, typo_rate=0.08, unknown_rate=0.02,
+                          duplicate_rate=0.1, empty_row_rate=0.01, incomplete_rate=0.03,
+                          copy_rate=0.02):
+    """Build raw reflection sheet values (a list of row lists) as gspread returns them."""
+    rng = random.Random(seed)
+    scenarios = scenarios if scenarios is not None else load_scenarios()
+    titles = [engine.metadata.get("title", engine.scenario_path.name) for engine in scenarios]
+
+    term_seconds = (TERM_END - TERM_START).total_seconds()
+    cutoff_offset = (CUTOFF_DATE - TERM_START).total_seconds()
+
+    values = [list(EXPECTED_HEADERS)] if header else []
+    previous = []
+    while len(values) < rows + (1 if header else 0):
+        if rng.random() < empty_row_rate:
+            values.append([""] * len(EXPECTED_HEADERS) if rng.random() < 0.5 else [])
+            continue
+
+        # Resubmit an earlier completion, possibly after the cutoff
+        if previous and rng.random() < duplicate_rate:
+            student, scenario_index, submitted = rng.choice(previous)
+            submitted += timedelta(minutes=rng.randint(5, 60 * 24 * 7))
+        else:
+            student = rng.choice(roster)
+            scenario_index = rng.randrange(len(scenarios))
+            if rng.random() < pre_cutoff_share:
+                submitted = TERM_START + timedelta(seconds=rng.uniform(0, cutoff_offset))
+            else:
+                submitted = CUTOFF_DATE + timedelta(seconds=rng.uniform(0, term_seconds - cutoff_offset))
+            previous.append((student, scenario_index, submitted))
+
+        if rng.random() < unknown_rate:
+            student = {"First Name": rng.choice(FIRST_NAMES), "Last Name": "Unenrolled"}
+
+        if submitted < CUTOFF_DATE:
+            name = _free_form_name(student, rng, typo_rate)
+        else:
+            name = f"{student['Last Name']}, {student['First Name']}"
+
+        texts, outcome = random_walk(scenarios[scenario_index], rng)
+        if rng.random() < copy_rate and len(values) > 2:
+            source = rng.choice(values[1:] if header else values)
+            reflections = source[5:8] if len(source) >= 8 and source[5] else [_reflection(rng) for _ in range(3)]
+        else:
+            reflections = [_reflection(rng) for _ in range(3)]
+
+        status = "Completed" if rng.random() >= incomplete_rate else rng.choice(["", "In Progress"])
+        values.append([
+            submitted.strftime("%Y-%m-%d %H:%M:%S"),
+            name,
+            titles[scenario_index],
+            outcome,
+            " → ".join(texts) if texts else "No choices recorded",
+            *reflections,
+            status,
+        ])
+    return values
+
+
+def write_roster_csv(roster, path):
+    """Write roster rows in the same layout as fall25roster.csv."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(roster[0].keys()))
+        writer.writeheader()
+        writer.writerows(roster)
+
+
+def write_sheet_csv(values, path):
+    """Write raw sheet values as a CSV export."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(values)
+
+
+class LocalWorksheet:
+    """In-memory worksheet implementing the gspread calls the app makes."""
+
+    def __init__(self, values=None, title="Sheet1", id=0):
+        self.title = title
+        self.id = id
+        self.spreadsheet = None
+        self._values = [list(row) for row in (values or [])]
+        self.reads = 0
+        self.revision = 0
+
+    def get_all_values(self):
+        self.reads += 1
+        return [list(row) for row in self._values]
+
+    def get(self, range_name):
+        """Rows from an A1 range such as "A120:I" or "A5:I9", trimmed like the Sheets API trims them."""
+        self.reads += 1
+        match = re.match(r"[A-Z]+(\d+)(?::[A-Z]+(\d+))?", range_name)
+        start, end = int(match.group(1)), match.group(2) and int(match.group(2))
+        rows = [list(row) for row in self._values[start - 1:end]]
+        while rows and not any(rows[-1]):
+            rows.pop()
+        for row in rows:
+            while row and row[-1] == "":
+                row.pop()
+        return rows
+
+    def append_row(self, values, **kwargs):
+        self._values.append([str(value) for value in values])
+        self.revision += 1
+
+    def append_rows(self, values, **kwargs):
+        self._values.extend([str(value) for value in row] for row in values)
+        self.revision += 1
+
+    def update_cell(self, row, col, value):
+        """Set one cell (1-based), as a hand edit in the Sheets UI would."""
+        while len(self._values) < row:
+            self._values.append([])
+        cells = self._values[row - 1]
+        cells.extend([""] * (col - len(cells)))
+        cells[col - 1] = str(value)
+        self.revision += 1
+
+    def update_title(self, title):
+        self.title = title
+        self.revision += 1
+
+    def delete_rows(self, start_index, end_index=None):
+        """Delete sheet rows start_index..end_index (1-based, inclusive)."""
+        del self._values[start_index - 1:end_index or start_index]
+        self.revision += 1
+
+    @property
+    def row_count(self):
+        return len(self._values)
+
+
+class LocalSpreadsheet:
+    """In-memory spreadsheet holding LocalWorksheet objects."""
+
+    def __init__(self, worksheets, id="local"):
+        self.id = id
+        self._worksheets = worksheets
+        self.metadata_reads = 0
+        for worksheet in worksheets:
+            worksheet.spreadsheet = self
+
+    @property
+    def sheet1(self):
+        return self._worksheets[0]
+
+    def worksheets(self):
+        self.metadata_reads += 1
+        return list(self._worksheets)
+
+    def add_worksheet(self, title, rows=1000, cols=26, **kwargs):
+        if any(worksheet.title == title for worksheet in self._worksheets):
+            raise ValueError(f'A sheet with the name "{title}" already exists.')
+        worksheet = LocalWorksheet(title=title, id=max(worksheet.id for worksheet in self._worksheets) + 1)
+        worksheet.spreadsheet = self
+        self._worksheets.append(worksheet)
+        return worksheet
+
+    def del_worksheet(self, worksheet):
+        self._worksheets.remove(worksheet)
+        self._worksheets[0].revision += worksheet.revision + 1  # keep the spreadsheet revision increasing
+
+    def get_lastUpdateTime(self):
+        """Stand-in for the Drive modifiedTime: changes whenever a worksheet is appended to."""
+        self.metadata_reads += 1
+        return f"revision-{sum(worksheet.revision for worksheet in self._worksheets)}"
+
+
+class LocalSheetsClient:
+    """Stand-in for a gspread client that serves spreadsheets from memory by URL."""
+
+    def __init__(self, spreadsheets=None):
+        self.spreadsheets = spreadsheets or {}
+
+    def add_sheet(self, url, values):
+        self.spreadsheets[url] = LocalSpreadsheet([LocalWorksheet(values)], id=url)
+        return self.spreadsheets[url]
+
+    def open_by_url(self, url):
+        if url not in self.spreadsheets:
+            raise KeyError(f"No local spreadsheet registered for {url}")
+        return self.spreadsheets[url]
+
+
+def measure_grade_pipeline(rows, roster_size=500, seed=0):
+    """Run generate_grade_csvs on a synthetic sheet; return timing and peak memory."""
+    import contextlib
+    import io
+    import tempfile
+
+    from generate_grades import generate_grade_csvs, load_roster, parse_sheet_values
+
+    roster = generate_roster(roster_size, seed=seed)
+    values = generate_sheet_values(rows, roster, seed=seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        roster_file = Path(tmp) / "roster.csv"
+        write_roster_csv(roster, roster_file)
+        lastname_first, firstname_last, all_names = load_roster(str(roster_file))
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            tracemalloc.start()
+            start = time.perf_counter()
+            records = parse_sheet_values(values, verbose=False)
+            csv_files = generate_grade_csvs(records, lastname_first, firstname_last, all_names,
+                                            output_dir=str(Path(tmp) / "grades"))
+            seconds = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+    return {
+        "rows": rows,
+        "roster_size": roster_size,
+        "seconds": seconds,
+        "peak_bytes": peak,
+        "graded": sum(count for _, count in csv_files),
+    }
+
+
+def main():
+    """Command line entry point for writing datasets and running scaling measurements."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    write = subparsers.add_parser("write", help="Write a synthetic roster and sheet export")
+    write.add_argument("--rows", type=int, default=10000)
+    write.add_argument("--roster-size", type=int, default=500)
+    write.add_argument("--sections", type=int, default=4)
+    write.add_argument("--no-header", action="store_true")
+    write.add_argument("--seed", type=int, default=0)
+    write.add_argument("--out", default="synthetic")
+
+    scale = subparsers.add_parser("scale", help="Measure grade generation runtime and memory by row count")
+    scale.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    scale.add_argument("--roster-size", type=int, default=500)
+
+    args = parser.parse_args()
+
+    if args.command == "write":
+        out = Path(args.out)
+        out.mkdir(parents=True, exist_ok=True)
+        roster = generate_roster(args.roster_size, args.sections, args.seed)
+        values = generate_sheet_values(args.rows, roster, header=not args.no_header, seed=args.seed)
+        write_roster_csv(roster, out / "roster.csv")
+        write_sheet_csv(values, out / "sheet.csv")
+        print(f"Wrote {len(roster)} students to {out / 'roster.csv'} and {args.rows} rows to {out / 'sheet.csv'}")
+
+    elif args.command == "scale":
+        print(f"{'rows':>10} {'seconds':>10} {'us/row':>10} {'peak MB':>10} {'graded':>10}")
+        for rows in args.sizes:
+            result = measure_grade_pipeline(rows, args.roster_size)
+            print(f"{rows:>10} {result['seconds']:>10.3f} {result['seconds'] / rows * 1e6:>10.1f} "
+                  f"{result['peak_bytes'] / 1e6:>10.1f} {result['graded']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Test script for analytics.py
+
+Runs the reports over synthetic submissions and checks them against simple
+per-row counts, plus the data-version cache.
+"""
+
+from analytics import analyze, records_version
+from generate_grades import parse_sheet_values
+from synthetic_data import generate_roster, generate_sheet_values, write_roster_csv
+
+
+def make_records(rows=600):
+    roster = generate_roster(60, sections=3)
+    return roster, parse_sheet_values(generate_sheet_values(rows, roster), verbose=False)
+
+
+def test_reports_match_row_counts(tmp_path):
+    roster, records = make_records()
+    roster_file = tmp_path / "roster.csv"
+    write_roster_csv(roster, roster_file)
+    analytics = analyze(records, str(roster_file))
+
+    completed = [r for r in records if r["Completion Status"] == "Completed" and r["Scenario Title"]]
+    outcomes = analytics.outcome_distribution()
+    assert outcomes["count"].sum() == len(completed)
+    assert (outcomes.groupby("scenario")["share"].sum().round(9) == 1).all()
+
+    # Every submission with choices reaches step 1 and ends exactly once
+    drop_off = analytics.drop_off()
+    with_choices = [r for r in records if r["Scenario Title"] and r["Choices Made"] not in ("", "No choices recorded")]
+    assert drop_off.loc[drop_off["step"] == 1, "reached"].sum() == len(with_choices)
+    assert drop_off["ended"].sum() == len(with_choices)
+
+    paths = analytics.common_paths(top=2)
+    assert paths.groupby("scenario").size().max() <= 2
+
+    sections = analytics.by_section()
+    assert set(sections["section"]) <= {"Group 1", "Group 2", "Group 3", "Unmatched"}
+    assert sections["submissions"].sum() == len(completed)
+
+
+def test_cached_by_data_version():
+    _, records = make_records(200)
+    first = analyze(records)
+    assert analyze(list(records)) is first
+    assert first.outcome_distribution() is first.outcome_distribution()
+
+    more = records + [dict(records[0], Timestamp="2025-12-01 10:00:00")]
+    assert records_version(more) != records_version(records)
+    assert analyze(more) is not first
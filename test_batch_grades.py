@@ -0,0 +1,79 @@
+"""
+Test script for batch_grades.py
+
+Runs a manifest of jobs over local sheets (two jobs sharing one sheet) and
+checks each job's CSVs against a sequential generate_grade_csvs run, plus the
+unmatched-students report and a failing job.
+"""
+
+import csv
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+import sheet_cache
+from batch_grades import load_manifest, run_batch
+from generate_grades import generate_grade_csvs, load_roster, parse_sheet_values
+from name_aliases import UNMATCHED_REPORT
+from synthetic_data import LocalSheetsClient, generate_roster, generate_sheet_values, write_roster_csv
+
+
+def read_outputs(directory):
+    return {name: open(os.path.join(directory, name), encoding="utf-8").read()
+            for name in sorted(os.listdir(directory)) if name.endswith("_grades.csv")}
+
+
+@pytest.fixture
+def setup(tmp_path, monkeypatch):
+    monkeypatch.setattr(sheet_cache, "CACHE_DIR", "off")
+    client = LocalSheetsClient()
+    for term, seed in (("fall", 1), ("spring", 2)):
+        roster = generate_roster(80, seed=seed)
+        write_roster_csv(roster, tmp_path / f"{term}.csv")
+        client.add_sheet(f"local://{term}", generate_sheet_values(600, roster, seed=seed))
+
+    manifest = tmp_path / "jobs.json"
+    manifest.write_text(json.dumps({"jobs": [
+        {"name": "fall", "sheet_url": "local://fall", "roster": "fall.csv", "output_dir": "out/fall"},
+        {"name": "fall-strict", "sheet_url": "local://fall", "roster": "fall.csv", "output_dir": "out/fall-strict",
+         "cutoff_date": "2025-08-01"},
+        {"name": "spring", "sheet_url": "local://spring", "roster": "spring.csv", "output_dir": "out/spring"},
+        {"name": "missing", "sheet_url": "local://missing", "roster": "spring.csv", "output_dir": "out/missing"},
+    ]}))
+    return tmp_path, client, load_manifest(manifest)
+
+
+def test_batch_matches_sequential_runs(setup):
+    tmp_path, client, jobs = setup
+    results = run_batch(jobs, fetch_workers=3, match_workers=2, client=client)
+    assert [result["name"] for result in results] == ["fall", "fall-strict", "spring", "missing"]
+    assert client.spreadsheets["local://fall"].sheet1.reads == 1
+
+    for job, result in zip(jobs[:3], results):
+        assert result["error"] is None
+        records = parse_sheet_values(client.open_by_url(job["sheet_url"]).sheet1.get_all_values(), verbose=False)
+        expected_dir = tmp_path / "expected" / job["name"]
+        generate_grade_csvs(records, *load_roster(job["roster"]), output_dir=str(expected_dir),
+                            cutoff_date=job["cutoff_date"])
+        assert read_outputs(job["output_dir"]) == read_outputs(expected_dir)
+    # With the cutoff before term start, free-form names are no longer fuzzy-matched
+    assert jobs[1]["cutoff_date"] == datetime(2025, 8, 1)
+    assert results[1]["unmatched"] > results[0]["unmatched"]
+
+    assert [os.path.basename(name) for name, _ in results[0]["gradebooks"]][0] == "gradebook.csv"
+
+    assert results[3]["error"]
+    assert not (tmp_path / "out" / "missing").exists()
+
+
+def test_unmatched_report(setup):
+    _, client, jobs = setup
+    result = run_batch(jobs[:1], client=client)[0]
+    with open(result["unmatched_report"], newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert result["unmatched"] > 0
+    assert len(rows) == result["unmatched_names"]
+    assert sum(int(row["Submissions"]) for row in rows) == result["unmatched"]
+    assert result["unmatched_report"].endswith(UNMATCHED_REPORT)
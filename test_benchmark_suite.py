@@ -0,0 +1,38 @@
+"""
+Test script for benchmark_suite.py
+
+Checks the regression comparison and runs the fastest benchmarks once.
+"""
+
+from benchmark_suite import compare_results, run_benchmarks
+
+
+def test_compare_results():
+    """Only cases slower than the threshold are reported as regressions."""
+    baseline = {"a[10]": 1.0, "b[10]": 1.0, "c[10]": 1.0}
+    results = {"a[10]": 1.1, "b[10]": 1.5, "c[10]": 0.5, "d[10]": 9.0}
+
+    regressions = compare_results(results, baseline, threshold=0.25)
+    assert [case for case, *_ in regressions] == ["b[10]"]
+
+
+def test_compare_results_ignores_jitter():
+    """Sub-millisecond differences on fast cases are not regressions."""
+    regressions = compare_results({"fast[1]": 2e-7, "index[10]": 6.6e-5, "similar[10]": 4.8e-3},
+                                  {"fast[1]": 1e-7, "index[10]": 4.2e-5, "similar[10]": 3.9e-3}, threshold=0.25)
+    assert regressions == []
+
+
+def test_run_benchmarks():
+    """Benchmarks produce one timing per case and size."""
+    results = run_benchmarks(["evaluate_condition", "load_config"])
+    assert "evaluate_condition[2]" in results
+    assert "load_config[1000]" in results
+    assert all(seconds > 0 for seconds in results.values())
+
+
+if __name__ == "__main__":
+    test_compare_results()
+    test_compare_results_ignores_jitter()
+    test_run_benchmarks()
+    print("[OK] All benchmark suite tests passed")
@@ -0,0 +1,103 @@
+"""
+Test script for dashboard_data.py
+
+Feeds a local worksheet to the live dashboard, appends rows between refreshes
+and checks the running totals against a full recount (also after rows are
+deleted, as archiving does), the read throttle and the instructor page.
+"""
+
+from streamlit.testing.v1 import AppTest
+
+import dashboard_data
+import sheet_partitions
+from analytics import analyze
+from generate_grades import parse_sheet_values
+from synthetic_data import LocalSheetsClient, LocalWorksheet, generate_roster, generate_sheet_values, write_roster_csv
+
+
+def make_dashboard(tmp_path, values, **kwargs):
+    roster = generate_roster(40, sections=2)
+    roster_file = tmp_path / "roster.csv"
+    write_roster_csv(roster, roster_file)
+    worksheet = LocalWorksheet(values(roster))
+    dashboard = dashboard_data.LiveDashboard(lambda: worksheet, str(roster_file), **kwargs)
+    return dashboard, worksheet, roster_file
+
+
+def test_incremental_totals_match_full_recount(tmp_path):
+    all_values = []
+
+    def values(roster):
+        all_values.extend(generate_sheet_values(400, roster, seed=3))
+        return all_values[:200]
+
+    dashboard, worksheet, roster_file = make_dashboard(tmp_path, values, refresh_seconds=0)
+    dashboard.refresh()
+    for row in all_values[200:]:
+        worksheet.append_row(row)
+    dashboard.refresh()
+    assert dashboard.error is None
+
+    full = analyze(parse_sheet_values([list(row) for row in all_values], verbose=False), str(roster_file))
+    sections = full.by_section()
+    completions = dashboard.aggregates.completions
+    assert completions["submissions"].sum() == sections["submissions"].sum()
+    merged = completions.merge(sections, on=["section", "scenario"], suffixes=("", "_full"))
+    assert (merged["students"] == merged["students_full"]).all()
+
+
+def test_deleted_rows_trigger_rebuild(tmp_path):
+    dashboard, worksheet, roster_file = make_dashboard(tmp_path, lambda roster: generate_sheet_values(300, roster),
+                                                       refresh_seconds=0)
+    dashboard.refresh()
+    worksheet.delete_rows(2, 101)
+    extra = generate_sheet_values(20, generate_roster(40, sections=2), header=False, seed=9)
+    for row in extra:
+        worksheet.append_row(row)
+    dashboard.refresh()
+    assert dashboard.error is None
+
+    full = analyze(parse_sheet_values(worksheet.get_all_values(), verbose=False), str(roster_file))
+    assert dashboard.aggregates.completions["submissions"].sum() == full.by_section()["submissions"].sum()
+
+
+def test_partitioned_counts_unsplit_history(tmp_path, monkeypatch):
+    monkeypatch.setattr(sheet_partitions, "PARTITION_MODE", "term")
+    monkeypatch.setattr(sheet_partitions, "TERM", "Fall 2025")
+    sheet_partitions.clear()
+    roster = generate_roster(40, sections=2)
+    write_roster_csv(roster, tmp_path / "roster.csv")
+    values = generate_sheet_values(200, roster, seed=3)
+    spreadsheet = LocalSheetsClient().add_sheet("local://sheet", values[:150])
+    for row in filter(any, values[150:]):
+        sheet_partitions.worksheet_for_row(spreadsheet, row).append_row(row)
+
+    dashboard = dashboard_data.LiveDashboard(lambda: sheet_partitions.select_partitions(spreadsheet, ["Fall 2025"]),
+                                             str(tmp_path / "roster.csv"))
+    dashboard.refresh()
+    assert dashboard.error is None
+    full = analyze(parse_sheet_values(values, verbose=False), str(tmp_path / "roster.csv"))
+    assert dashboard.aggregates.completions["submissions"].sum() == full.by_section()["submissions"].sum()
+    sheet_partitions.clear()
+
+
+def test_refresh_is_throttled(tmp_path):
+    dashboard, worksheet, _ = make_dashboard(tmp_path, lambda roster: generate_sheet_values(50, roster),
+                                             refresh_seconds=60)
+    for _ in range(20):
+        dashboard.refresh()
+    assert worksheet.reads == 1
+
+
+def test_instructor_page(tmp_path, monkeypatch):
+    dashboard, _, _ = make_dashboard(tmp_path, lambda roster: generate_sheet_values(100, roster))
+    monkeypatch.setattr(dashboard_data, "_dashboard", dashboard)
+    monkeypatch.setenv("SCENARIO_INSTRUCTOR_TOKEN", "teacher")
+
+    app = AppTest.from_file("app.py", default_timeout=30)
+    app.query_params["page"] = "instructor"
+    app.query_params["key"] = "teacher"
+    app.run()
+    assert not app.exception
+    assert app.metric[0].label == "Students finished"
+    assert int(app.metric[1].value) == dashboard.aggregates.completions["submissions"].sum()
@@ -10,6 +10,7 @@ import os
 from datetime import datetime
 from generate_grades import (
     load_roster,
+    load_roster_students,
     match_student_name,
     generate_grade_csvs
 )
@@ -170,6 +171,41 @@ def test_grade_generation():
             print(f.read())
 
 
+def test_gradebook():
+    """The gradebook matrix and section files agree with the per-scenario CSVs."""
+    roster_lastname_first, roster_firstname_last, all_names = load_roster()
+    test_output_dir = "test_grade_outputs"
+    csv_files = generate_grade_csvs(
+        create_sample_sheet_records(),
+        roster_lastname_first,
+        roster_firstname_last,
+        all_names,
+        output_dir=test_output_dir,
+        roster_file="fall25roster.csv"
+    )
+
+    with open(os.path.join(test_output_dir, "gradebook.csv"), newline='', encoding='utf-8') as f:
+        gradebook = list(csv.DictReader(f))
+    students = load_roster_students()
+    assert [row['OrgDefinedId'] for row in gradebook] == [org_id.lstrip('#') for org_id, *_ in students]
+
+    # Every per-scenario grade appears in the matrix, and nothing else does
+    for filename, count in csv_files:
+        with open(filename, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            column = next(reader)[1]
+            graded = {row[0] for row in reader}
+        assert {row['OrgDefinedId'] for row in gradebook if row[column]} == graded
+
+    sections = {}
+    for org_id, _, _, class_period in students:
+        sections[class_period] = sections.get(class_period, 0) + 1
+    for class_period, count in sections.items():
+        with open(os.path.join(test_output_dir, f"gradebook_{class_period.replace(' ', '_')}.csv"),
+                  newline='', encoding='utf-8') as f:
+            assert len(list(csv.DictReader(f))) == count
+
+
 def main():
     """Run all tests."""
     print("\n" + "=" * 60)
@@ -179,6 +215,7 @@ def main():
     test_name_matching()
     print("\n")
     test_grade_generation()
+    test_gradebook()
 
     print("\n" + "=" * 60)
     print("[OK] All tests completed!")
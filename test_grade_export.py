@@ -0,0 +1,97 @@
+"""
+Test script for grade_export.py
+
+Checks that the in-memory ZIP holds exactly the files generate_grade_csvs
+writes to disk, that reading the sheet and building the ZIP write nothing,
+and the app's grade page, which stays closed without an instructor token and
+warns when there is no archive to add archived terms from.
+"""
+
+import io
+import os
+import zipfile
+
+from streamlit.testing.v1 import AppTest
+
+import grade_export
+import sheet_archive
+import sheet_cache
+import sheet_partitions
+import sheets_integration
+from generate_grades import generate_grade_csvs, load_roster, parse_sheet_values
+from synthetic_data import LocalSheetsClient, generate_roster, generate_sheet_values, write_roster_csv
+
+
+def make_records(tmp_path):
+    roster = generate_roster(60, sections=3)
+    roster_file = tmp_path / "roster" / "roster.csv"
+    roster_file.parent.mkdir()
+    write_roster_csv(roster, roster_file)
+    return parse_sheet_values(generate_sheet_values(400, roster, seed=5), verbose=False), str(roster_file)
+
+
+def test_zip_matches_files_on_disk(tmp_path):
+    records, roster_file = make_records(tmp_path)
+    data, summary = grade_export.build_grade_zip(records, roster_file)
+    assert os.listdir(tmp_path / "roster") == ["roster.csv"]
+
+    generate_grade_csvs(records, *load_roster(roster_file), output_dir=str(tmp_path / "disk"),
+                        roster_file=roster_file)
+    on_disk = {name: (tmp_path / "disk" / name).read_bytes() for name in os.listdir(tmp_path / "disk")}
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+        in_zip = {name: archive.read(name) for name in archive.namelist()}
+    assert in_zip == on_disk
+    assert [filename for filename, _ in summary["files"]] == list(in_zip)
+    assert "gradebook.csv" in in_zip and "unmatched_students.csv" in in_zip
+    assert summary["unmatched"] > 0 and summary["records"] == len(records)
+
+
+def test_sheet_read_leaves_no_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(sheet_cache, "CACHE_DIR", str(tmp_path / "snapshots"))
+    sheet_cache.clear()
+    values = generate_sheet_values(50, generate_roster(20), seed=5)
+    client = LocalSheetsClient()
+    client.add_sheet("local://sheet", values)
+    monkeypatch.setattr(sheets_integration, "_authorize_client", lambda: client)
+    monkeypatch.setenv("GOOGLE_SHEET_URL", "local://sheet")
+
+    assert grade_export.read_reflection_records() == parse_sheet_values(values, verbose=False)
+    assert not (tmp_path / "snapshots").exists()
+    sheet_cache.clear()
+
+
+def test_grade_page(tmp_path, monkeypatch):
+    records, roster_file = make_records(tmp_path)
+    monkeypatch.setattr(grade_export, "read_reflection_records", lambda: records)
+    monkeypatch.setattr(grade_export, "ROSTER_FILE", roster_file)
+    monkeypatch.setattr(sheet_archive, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    monkeypatch.setattr(sheet_partitions, "PARTITION_MODE", "off")
+
+    # No token configured: the page stays closed
+    monkeypatch.delenv("SCENARIO_INSTRUCTOR_TOKEN", raising=False)
+    app = AppTest.from_file("app.py", default_timeout=30)
+    app.query_params["page"] = "grades"
+    app.run()
+    assert app.error and not app.button
+
+    monkeypatch.setenv("SCENARIO_INSTRUCTOR_TOKEN", "teacher")
+    app = AppTest.from_file("app.py", default_timeout=30)
+    app.query_params["page"] = "grades"
+    app.query_params["key"] = "teacher"
+    app.run()
+    assert not app.exception
+    app.button[0].click().run()
+    assert not app.exception and not app.error
+    _, summary = grade_export.build_grade_zip(records, roster_file)
+    assert int(app.metric[0].value) == summary["graded"]
+    assert int(app.metric[1].value) == summary["unmatched"]
+    assert any("covers the live sheet only" in warning.value for warning in app.warning)
+
+    # With an archive on this server the export is complete
+    old_row = ["2024-10-01 09:00:00", "Adams, Kyleigh", "Liberty Park", "Good outcome", "A → B", "one", "two",
+               "three", "Completed"]
+    sheet_archive.write_archive({("Fall 2024", "Liberty Park"): [old_row]})
+    app.button[0].click().run()
+    assert not app.exception
+    assert not any("covers the live sheet only" in warning.value for warning in app.warning)
@@ -0,0 +1,126 @@
+"""
+Test script for name_aliases.py
+
+Checks that learned aliases reproduce fresh fuzzy matching without searching
+again, that they are dropped when the roster changes, and that names resolved
+by hand through the unmatched report apply in both grade engines, and that
+concurrent saves to one roster's table keep every entry.
+"""
+
+import csv
+import threading
+
+import pytest
+
+import generate_grades
+import vectorized_grades
+from generate_grades import load_roster, match_completions, parse_sheet_values
+from name_aliases import NameAliases, alias_path, export_unmatched, import_resolved
+from synthetic_data import generate_roster, generate_sheet_values, write_roster_csv
+
+
+@pytest.fixture
+def roster(tmp_path):
+    rows = generate_roster(60)
+    write_roster_csv(rows, tmp_path / "roster.csv")
+    return rows, str(tmp_path / "roster.csv")
+
+
+def no_fuzzy(*args, **kwargs):
+    raise AssertionError("fuzzy search should have been answered by the alias table")
+
+
+def test_learned_aliases(roster, monkeypatch):
+    roster_rows, roster_file = roster
+    records = parse_sheet_values(generate_sheet_values(800, roster_rows, seed=3), verbose=False)
+    expected = match_completions(records, *load_roster(roster_file), engine="rows")
+
+    aliases = NameAliases.for_roster(roster_file)
+    assert match_completions(records, *load_roster(roster_file), engine="rows", aliases=aliases) == expected
+    assert aliases.learned and "" in aliases.learned.values()
+    aliases.save()
+
+    monkeypatch.setattr(generate_grades, "get_close_matches", no_fuzzy)
+    monkeypatch.setattr(vectorized_grades, "get_close_matches", no_fuzzy)
+    for engine in ("rows", "pandas"):
+        reloaded = NameAliases.for_roster(roster_file)
+        assert match_completions(records, *load_roster(roster_file), engine=engine, aliases=reloaded) == expected
+        assert reloaded.save() == 0
+
+    # Any change to the roster makes learned aliases stale
+    with open(roster_file, "a", encoding="utf-8") as f:
+        f.write("#59999999,Newman,Pat,pnewman@example.edu,Group 1,#\n")
+    assert NameAliases.for_roster(roster_file).learned == {}
+
+
+def test_manual_aliases_from_report(roster, tmp_path):
+    roster_rows, roster_file = roster
+    student = roster_rows[5]
+    records = [
+        {"Timestamp": "2025-09-01 10:00:00", "Student Name": "Mystery Kid", "Scenario Title": "A",
+         "Completion Status": "Completed"},
+        {"Timestamp": "2025-10-20 10:00:00", "Student Name": "mystery kid", "Scenario Title": "B",
+         "Completion Status": "Completed"},
+        {"Timestamp": "2025-10-21 10:00:00", "Student Name": "Someone Else", "Scenario Title": "B",
+         "Completion Status": "Completed"},
+    ]
+    roster_indexes = load_roster(roster_file)
+    result = match_completions(records, *roster_indexes, engine="rows")
+    assert result["completions"] == {}
+    report, rows_written = export_unmatched(result["unmatched"], tmp_path / "out")
+    assert rows_written == 3
+
+    # The instructor places "Mystery Kid" (typing the id without its "#") and leaves the rest blank
+    with open(report, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    for row in rows:
+        if row["Student Name"] == "Mystery Kid":
+            row["OrgDefinedId"] = student["OrgDefinedId"].lstrip("#")
+        if row["Student Name"] == "Someone Else":
+            row["OrgDefinedId"] = "#00000000"
+    with open(report, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    aliases = NameAliases.for_roster(roster_file)
+    added, rejected = import_resolved(report, aliases)
+    assert added == 1 and [name for name, _ in rejected] == ["Someone Else"]
+    aliases.save()
+
+    for engine in ("rows", "pandas"):
+        result = match_completions(records, *roster_indexes, engine=engine,
+                                   aliases=NameAliases.for_roster(roster_file))
+        assert result["completions"] == {"A": [(student["OrgDefinedId"], "Mystery Kid")],
+                                         "B": [(student["OrgDefinedId"], "mystery kid")]}
+        assert [name for name, _, _ in result["unmatched"]] == ["Someone Else"]
+
+
+def test_concurrent_saves_merge(roster):
+    _, roster_file = roster
+    first, second = NameAliases.for_roster(roster_file), NameAliases.for_roster(roster_file)
+    first.learn("Kid One", None)
+    second.add("Kid Two", "#50000001")
+    first.save()
+    second.save()
+
+    merged = NameAliases.for_roster(roster_file)
+    assert merged.learned == {"Kid One": ""}
+    assert merged.manual == {"kid two": "#50000001"}
+    assert alias_path(roster_file).name == "roster_aliases.csv"
+
+    assert merged.remove("Kid Two")
+    merged.save()
+    assert NameAliases.for_roster(roster_file).manual == {}
+
+    # Simultaneous batch jobs on the same roster
+    tables = [NameAliases.for_roster(roster_file) for _ in range(8)]
+    for i, table in enumerate(tables):
+        table.learn(f"Student {i}", None)
+    threads = [threading.Thread(target=table.save) for table in tables]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(NameAliases.for_roster(roster_file).learned) == 9
+    assert not list(alias_path(roster_file).parent.glob("*.lock"))
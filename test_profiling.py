@@ -0,0 +1,85 @@
+"""
+Test script for profiling.py
+
+Captures a few profiled blocks, including one interrupted the way st.rerun()
+interrupts a script, and checks the report aggregation and that fragment
+reruns of a scenario are captured too.
+"""
+
+import pytest
+
+from profiling import (
+    biggest_allocators,
+    hottest_functions,
+    load_captures,
+    profile_rerun,
+    should_profile,
+)
+
+
+def busy_work():
+    return [str(i) * 10 for i in range(20000)]
+
+
+def test_should_profile(monkeypatch):
+    """Only a matching admin token or the environment switch enables capture."""
+    monkeypatch.delenv("SCENARIO_PROFILE", raising=False)
+    monkeypatch.setenv("SCENARIO_PROFILE_TOKEN", "s3cret")
+    assert should_profile({"profile": "s3cret"})
+    assert not should_profile({"profile": "guess"})
+    assert not should_profile({})
+
+    monkeypatch.setenv("SCENARIO_PROFILE", "1")
+    monkeypatch.setenv("SCENARIO_PROFILE_SAMPLE", "1.0")
+    assert should_profile({})
+
+
+def test_capture_and_report(tmp_path):
+    """Captures are written with tags and aggregated by the report helpers."""
+    with profile_rerun("rio_grande", "1", output_dir=tmp_path):
+        busy_work()
+
+    class RerunException(Exception):
+        pass
+
+    with pytest.raises(RerunException):
+        with profile_rerun("rio_grande", "2a", output_dir=tmp_path):
+            busy_work()
+            raise RerunException()
+
+    with profile_rerun("liberty_park", "1", output_dir=tmp_path, enabled=False):
+        busy_work()
+
+    captures = load_captures(tmp_path)
+    assert len(captures) == 2
+    assert len(load_captures(tmp_path, scenario="rio_grande", scene="2a")) == 1
+
+    functions = hottest_functions(captures, top=50)
+    assert any("busy_work" in function for function, *_ in functions)
+    busy_calls = [calls for function, calls, *_ in functions if "busy_work" in function]
+    assert busy_calls == [2]
+
+    allocators = biggest_allocators(captures)
+    assert allocators and allocators[0][1] > 0
+
+
+
+def test_fragment_reruns_are_captured(tmp_path, monkeypatch):
+    """Navigation clicks rerun only the scene fragment, which app.main doesn't wrap; it is captured on its own."""
+    from streamlit.testing.v1 import AppTest
+
+    import profiling
+    import scenario_engine
+
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.delenv("SCENARIO_PROFILE", raising=False)
+    monkeypatch.delenv("SCENARIO_PROFILE_TOKEN", raising=False)
+    # AppTest reruns the whole script on clicks, so stand in for a fragment rerun
+    monkeypatch.setattr(scenario_engine, "_in_fragment_rerun", lambda: True)
+    monkeypatch.setattr(scenario_engine, "should_profile", lambda query_params=None: True)
+
+    app = AppTest.from_file("app.py", default_timeout=30)
+    app.query_params["scenario"] = "rio_grande"
+    app.run()
+    assert not app.exception
+    assert [meta["scenario"] for _, meta in load_captures(tmp_path)] == ["rio_grande"]
@@ -0,0 +1,73 @@
+"""
+Test script for reflection_similarity.py
+
+Plants copied and lightly edited reflections among synthetic submissions and
+checks that the LSH detector finds them (and agrees with a brute-force
+comparison), while resubmissions and other scenarios are left alone.
+"""
+
+import random
+
+from generate_grades import parse_sheet_values
+from reflection_similarity import MIN_WORDS, REFLECTION_COLUMNS, find_similar_reflections
+from synthetic_data import generate_roster, generate_sheet_values, write_roster_csv
+
+
+def edited(text, rng, changes=3):
+    words = text.split()
+    for _ in range(changes):
+        words[rng.randrange(len(words))] = "whatever"
+    return " ".join(words)
+
+
+def brute_force_pairs(records, threshold):
+    def shingle_set(text):
+        words = [word.strip(".,").lower() for word in text.split()]
+        return {tuple(words[i:i + 3]) for i in range(len(words) - 2)} if len(words) >= MIN_WORDS else set()
+
+    pairs = set()
+    for a in range(len(records)):
+        for b in range(a + 1, len(records)):
+            first, second = records[a], records[b]
+            if first["Scenario Title"] != second["Scenario Title"] or \
+                    first["Student Name"].strip().lower() == second["Student Name"].strip().lower():
+                continue
+            for column in REFLECTION_COLUMNS:
+                x, y = shingle_set(first[column]), shingle_set(second[column])
+                if x and y and len(x & y) / len(x | y) >= threshold:
+                    pairs.add((first["Timestamp"], second["Timestamp"]))
+    return pairs
+
+
+def test_finds_copied_reflections(tmp_path):
+    rng = random.Random(7)
+    roster = generate_roster(40, sections=2)
+    records = parse_sheet_values(generate_sheet_values(400, roster, copy_rate=0, seed=7), verbose=False)
+    records = [r for r in records if r["Scenario Title"]]
+
+    source = records[10]
+    others = [r for r in records if r["Scenario Title"] == source["Scenario Title"]
+              and r["Student Name"] != source["Student Name"]]
+    others[0]["Reflection 2"] = source["Reflection 2"]
+    others[1]["Reflection 1"] = edited(source["Reflection 1"], rng)
+    elsewhere = next(r for r in records if r["Scenario Title"] != source["Scenario Title"])
+    elsewhere["Reflection 3"] = source["Reflection 3"]
+
+    roster_file = tmp_path / "roster.csv"
+    write_roster_csv(roster, roster_file)
+    flagged = find_similar_reflections(records, str(roster_file), threshold=0.6)
+
+    found = {frozenset((row.submitted_a, row.submitted_b)) for row in flagged.itertuples()}
+    assert frozenset((source["Timestamp"], others[0]["Timestamp"])) in found
+    assert frozenset((source["Timestamp"], others[1]["Timestamp"])) in found
+    assert frozenset((source["Timestamp"], elsewhere["Timestamp"])) not in found
+    assert found == {frozenset(pair) for pair in brute_force_pairs(records, 0.6)}
+    assert set(flagged["section_a"]) | set(flagged["section_b"]) <= {"Group 1", "Group 2", "Unmatched"}
+
+
+def test_ignores_resubmissions():
+    roster = generate_roster(10)
+    records = parse_sheet_values(generate_sheet_values(50, roster, copy_rate=0, seed=1), verbose=False)
+    records = [r for r in records if r["Scenario Title"]]
+    records.append(dict(records[0], Timestamp="2025-12-01 09:00:00", **{"Student Name": records[0]["Student Name"].upper()}))
+    assert find_similar_reflections(records).empty
@@ -0,0 +1,117 @@
+"""
+Test script for scenario_state.py
+
+Walks real scenarios through the compact progress representation and compares
+its size with the old dict-and-string session state.
+"""
+
+import pickle
+
+from scenario_engine import ScenarioEngine
+from scenario_state import CompiledScenario
+
+
+def load(scenario_id):
+    engine = ScenarioEngine(f"scenarios/{scenario_id}")
+    return engine, CompiledScenario(engine.scenes, engine.variables)
+
+
+def test_choices_and_effects():
+    """Choices move progress by index and update the variable vector."""
+    engine, compiled = load("rio_grande")
+    progress = compiled.new_progress("rio_grande")
+    assert compiled.scene_ids[progress.scene] == "1"
+
+    compiled.apply_choice(progress, 0)
+    first_choice = engine.scenes["1"]["choices"][0]
+    assert compiled.scene_ids[progress.scene] == first_choice["next"]
+    assert compiled.variables_dict(progress)["HardlineSupport"] == first_choice["effects"]["HardlineSupport"]
+    assert list(compiled.choice_pairs(progress)) == [("1", 0)]
+
+
+def test_go_back_only_undoes_choices_made_on_that_scene():
+    """Stepping back over a Continue scene leaves the recorded choices alone."""
+    engine, compiled = load("liberty_park")
+    progress = compiled.new_progress("liberty_park")
+
+    # Follow first options until a choice has been followed by a Continue
+    while True:
+        scene = engine.scenes[compiled.scene_ids[progress.scene]]
+        if scene["type"] == "choice":
+            compiled.apply_choice(progress, 0)
+        elif scene["type"] == "auto_advance" and progress.choices:
+            compiled.advance(progress, scene["next"])
+            break
+        elif scene["type"] == "auto_advance":
+            compiled.advance(progress, scene["next"])
+        else:
+            raise AssertionError("Expected a Continue scene after a choice")
+
+    choices_before = list(progress.choices)
+    compiled.go_back(progress)
+    assert list(progress.choices) == choices_before
+
+    compiled.go_back(progress)
+    assert len(progress.choices) == len(choices_before) - 2
+
+
+def test_unknown_next_scene_is_interned():
+    """Targets missing from the config still get an index so the engine can report them."""
+    scenes = {
+        "1": {"type": "choice", "choices": [{"text": "Go", "next": "missing"}]},
+    }
+    compiled = CompiledScenario(scenes, {})
+    progress = compiled.new_progress("broken")
+    compiled.apply_choice(progress, 0)
+    assert compiled.scene_ids[progress.scene] == "missing"
+
+
+def test_compact_state_is_smaller():
+    """The compact progress pickles far smaller than the old per-session keys."""
+    engine, compiled = load("rio_grande")
+    progress = compiled.new_progress("rio_grande")
+    old_choices, old_history = [], []
+    scene_id = "1"
+    while engine.scenes[scene_id]["type"] != "end":
+        scene = engine.scenes[scene_id]
+        old_history.append(scene_id)
+        if scene["type"] == "choice":
+            choice = scene["choices"][-1]
+            old_choices.append({"scene": scene_id, "choice": choice["text"], "next": choice["next"]})
+            compiled.apply_choice(progress, len(scene["choices"]) - 1)
+            scene_id = choice["next"]
+        else:
+            compiled.advance(progress, scene["next"])
+            scene_id = scene["next"]
+
+    old_state = {
+        "current_scene": scene_id,
+        "scene_history": old_history,
+        "choices_made": old_choices,
+        "scenario_variables": dict(engine.variables),
+    }
+    old_size = len(pickle.dumps(old_state))
+    new_size = len(pickle.dumps((progress.scene, progress.history, progress.choices, progress.variables)))
+    assert new_size * 2 < old_size
+
+
+def test_snapshot_round_trip():
+    """Progress packs to a few dozen bytes and unpacks to the same state."""
+    engine, compiled = load("rio_grande")
+    progress = compiled.new_progress("rio_grande")
+    compiled.apply_choice(progress, 0, at=1700000000.5)
+    compiled.advance(progress, "1")
+    progress.mark_submitted(3)
+
+    data = progress.to_bytes()
+    assert len(data) < 100
+    restored = type(progress).from_bytes(data)
+    for field in type(progress).__slots__:
+        assert getattr(restored, field) == getattr(progress, field)
+
+    try:
+        type(progress).from_bytes(data[:-1])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Truncated snapshot should be rejected")
@@ -0,0 +1,72 @@
+"""
+Test script for scene_index.py
+
+Checks that the offset index decodes every shipped scenario exactly as
+json.load does (down to the layout digest progress is stamped with), and that
+a walk through a scenario only decodes the scenes it visits.
+"""
+
+import json
+from pathlib import Path
+
+import scene_index
+from scenario_state import CompiledScenario
+
+
+def test_index_matches_json_load():
+    for config_file in sorted(Path("scenarios").glob("*/config.json")):
+        with open(config_file, "r") as f:
+            expected = json.load(f)
+        config = scene_index.load_config(config_file)
+        assert {key: value for key, value in config.items() if key != "scenes"} == \
+            {key: value for key, value in expected.items() if key != "scenes"}
+        assert list(config["scenes"]) == list(expected["scenes"])
+        for scene_id, scene in expected["scenes"].items():
+            assert config["scenes"][scene_id] == scene
+        variables = expected.get("variables", {})
+        assert CompiledScenario(config["scenes"], variables).layout == \
+            CompiledScenario(expected["scenes"], variables).layout
+
+
+def test_tricky_strings(tmp_path):
+    """Braces, colons and escaped quotes inside strings don't confuse the index."""
+    config = {
+        "metadata": {"title": "Braces { and } and \"quotes\": here"},
+        "scenes": {
+            "1": {"type": "choice", "narration": "He said \"{not: a scene}\" \\", "choices": [
+                {"text": "[go]", "next": "2.b", "effects": {}}]},
+            "2.b": {"type": "end", "narration": "ünïcode ✓"},
+        },
+        "variables": {},
+    }
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps(config, indent=2, ensure_ascii=False), encoding="utf-8")
+    loaded = scene_index.load_config(config_file)
+    assert loaded["metadata"] == config["metadata"]
+    assert dict(loaded["scenes"]) == config["scenes"]
+
+
+def test_walk_decodes_only_visited_scenes(tmp_path):
+    scenes = {"1": {"type": "choice", "choices": [{"text": "Go", "next": "2"}, {"text": "Skip", "next": "3"}]}}
+    for i in range(2, 500):
+        scenes[str(i)] = {"type": "choice", "narration": "x" * 200,
+                          "choices": [{"text": "Next", "next": str(i + 1)}]}
+    scenes["500"] = {"type": "end"}
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({"scenes": scenes, "variables": {}}))
+
+    config = scene_index.load_config(config_file)
+    lazy = config["scenes"]
+    assert lazy.cached() == []
+
+    compiled = CompiledScenario(lazy, config["variables"])
+    progress = compiled.new_progress("long")
+    for _ in range(5):
+        compiled.apply_choice(progress, 0)
+    assert compiled.scene_ids[progress.scene] == "6"
+    assert sorted(lazy.cached(), key=int) == ["1", "2", "3", "4", "5"]
+
+    # The cache stays bounded however far the student goes
+    for scene_id in list(lazy)[:100]:
+        lazy[scene_id]
+    assert len(lazy.cached()) == lazy.cache_size
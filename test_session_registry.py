@@ -0,0 +1,141 @@
+"""
+Test script for session_registry.py
+
+Parks idle sessions with each policy and checks that the student resumes on
+the same scene with their choices and pending submission token intact, and
+that the reaper backs off a session whose run starts while it is working.
+"""
+
+import threading
+import time
+
+import session_registry
+from scenario_engine import ScenarioEngine
+from scenario_state import CompiledScenario
+
+
+class FakeSessionState:
+    """The parts of Streamlit's SafeSessionState the registry uses."""
+
+    def __init__(self, values):
+        self.values = dict(values)
+
+    @property
+    def filtered_state(self):
+        return dict(self.values)
+
+    def __getitem__(self, key):
+        return self.values[key]
+
+    def __setitem__(self, key, value):
+        self.values[key] = value
+
+    def __delitem__(self, key):
+        del self.values[key]
+
+    def __contains__(self, key):
+        return key in self.values
+
+
+def make_session(monkeypatch, session_id):
+    engine = ScenarioEngine("scenarios/rio_grande")
+    compiled = CompiledScenario(engine.scenes, engine.variables)
+    progress = compiled.new_progress("rio_grande")
+    compiled.apply_choice(progress, 0)
+    state = FakeSessionState({
+        "scenario_progress": progress,
+        "reflection_1_6a": "An essay " * 200,
+        "submission_token_6a": "abc123",
+    })
+    monkeypatch.setattr(session_registry, "_current", lambda: (session_id, state))
+    session_registry.track()
+    return state, progress
+
+
+def check_resumed(state, progress):
+    resumed = session_registry.resume()
+    assert resumed.scene == progress.scene
+    assert list(resumed.choices) == list(progress.choices)
+    assert state["submission_token_6a"] == "abc123"
+
+
+def test_compact_and_resume(monkeypatch):
+    """Compaction keeps a packed snapshot in the session and frees the rest."""
+    state, progress = make_session(monkeypatch, "compact-session")
+    session_registry.reap(policy="off")
+    bytes_before = {row[0]: row[3] for row in session_registry.session_report()}["compact-session"]
+
+    acted = session_registry.reap(now=1e12, policy="compact", idle_seconds=60)
+    assert "compact-session" in acted
+    assert set(state.values) == {"scenario_snapshot", "submission_token_6a"}
+    bytes_after = {row[0]: row[3] for row in session_registry.session_report()}["compact-session"]
+    assert bytes_after * 5 < bytes_before
+
+    check_resumed(state, progress)
+
+
+def test_evict_and_resume(monkeypatch):
+    """Eviction empties the session and parks the snapshot in the registry."""
+    state, progress = make_session(monkeypatch, "evict-session")
+    acted = session_registry.reap(now=1e12, policy="evict", idle_seconds=60)
+    assert "evict-session" in acted
+    assert state.values == {}
+
+    check_resumed(state, progress)
+    assert session_registry.resume() is None
+
+
+def test_recent_sessions_are_left_alone(monkeypatch):
+    state, _ = make_session(monkeypatch, "busy-session")
+    assert "busy-session" not in session_registry.reap(policy="evict", idle_seconds=60)
+    assert "scenario_progress" in state
+
+
+def test_reaper_backs_off_a_session_that_starts_a_run(monkeypatch):
+    """A run that begins while the reaper waits on the session lock keeps its state."""
+    state, _ = make_session(monkeypatch, "returning-session")
+    session = session_registry._sessions["returning-session"]
+    session.last_seen = time.time() - 3600
+
+    acted = []
+    with session.lock:
+        reaper = threading.Thread(target=lambda: acted.extend(session_registry.reap(policy="evict", idle_seconds=60)))
+        reaper.start()
+        time.sleep(0.1)
+        # What track() does once the reaper lets go of the lock
+        session.last_seen = time.time()
+    reaper.join()
+
+    assert "returning-session" not in acted
+    assert "scenario_progress" in state
+    session_registry.track()
+    assert "scenario_progress" in state
+
+
+def test_real_session_survives_reruns():
+    """Streamlit wraps the session state anew for every run; the registry must outlive that."""
+    import gc
+
+    from streamlit.testing.v1 import AppTest
+
+    def script():
+        import streamlit as st
+
+        import session_registry
+
+        st.session_state.setdefault("reflection_1_6a", "An essay " * 200)
+        st.session_state["submission_token_6a"] = "abc123"
+        session_registry.track()
+
+    at = AppTest.from_function(script)
+    at.run()
+    at.run()
+    gc.collect()
+    session_id = "test session id"  # AppTest's fixed session id
+    assert session_id in {row[0] for row in session_registry.session_report()}
+    session_registry.reap(policy="off")
+    assert session_id in {row[0] for row in session_registry.session_report()}
+
+    assert session_id in session_registry.reap(now=1e12, policy="compact", idle_seconds=60)
+    assert "reflection_1_6a" not in at.session_state
+    assert at.session_state["submission_token_6a"] == "abc123"
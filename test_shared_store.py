@@ -0,0 +1,66 @@
+"""
+Test script for shared_store.py
+
+Publishes a store from a small scenario tree, attaches to it the way a second
+worker would, and checks that edits to the sources are never served stale.
+"""
+
+import json
+import os
+
+import shared_store
+
+CONFIG = {
+    "metadata": {"title": "Demo"},
+    "variables": {"Trust": 0},
+    "scenes": {
+        "1": {"type": "choice", "title": "Start", "choices": [{"text": "Go", "next": "2", "effects": {"Trust": 1}}]},
+        "2": {"type": "end", "title": "End"},
+    },
+}
+
+
+def make_tree(root):
+    scenario_dir = root / "scenarios" / "demo"
+    (scenario_dir / "images").mkdir(parents=True)
+    (scenario_dir / "config.json").write_text(json.dumps(CONFIG))
+    (scenario_dir / "images" / "scene_1.png").write_bytes(b"\x89PNG fake image bytes")
+    (root / "demo_roster.csv").write_text("Last Name,First Name\nZed,Ann\nAdams,Bo\n")
+    return scenario_dir
+
+
+def test_publish_and_attach(tmp_path):
+    scenario_dir = make_tree(tmp_path)
+    store_file = tmp_path / "store.bin"
+    shared_store.publish(store_file, root=tmp_path)
+
+    store = shared_store.attach(store_file, root=tmp_path, publish_if_stale=False)
+    assert store is not None
+
+    config, compiled = store.get(shared_store.scenario_key("demo"), scenario_dir / "config.json")
+    assert config == CONFIG
+    assert compiled.scene_ids == ["1", "2"]
+
+    image = scenario_dir / "images" / "scene_1.png"
+    assert store.get(shared_store.image_key(image), image) == image.read_bytes()
+
+    roster = tmp_path / "demo_roster.csv"
+    assert store.get(shared_store.roster_key(roster), roster) == ["Adams, Bo", "Zed, Ann"]
+
+
+def test_stale_sources_are_not_served(tmp_path):
+    scenario_dir = make_tree(tmp_path)
+    store_file = tmp_path / "store.bin"
+    shared_store.publish(store_file, root=tmp_path)
+    store = shared_store.attach(store_file, root=tmp_path, publish_if_stale=False)
+
+    config_file = scenario_dir / "config.json"
+    config_file.write_text(json.dumps({**CONFIG, "metadata": {"title": "Edited"}}))
+    os.utime(config_file, ns=(1, 1))
+    assert store.get(shared_store.scenario_key("demo"), config_file) is None
+
+    # A worker starting now republishes instead of attaching to the stale file
+    assert shared_store.attach(store_file, root=tmp_path, publish_if_stale=False) is None
+    fresh = shared_store.attach(store_file, root=tmp_path)
+    config, _ = fresh.get(shared_store.scenario_key("demo"), config_file)
+    assert config["metadata"]["title"] == "Edited"
@@ -0,0 +1,126 @@
+"""
+Test script for sheet_archive.py
+
+Archives a past term out of local spreadsheets (unpartitioned and
+partitioned), then checks that readers return the same records and grades as
+before, that re-running after an interruption doesn't duplicate rows, that the
+copy left behind by a split is trimmed without being archived twice, and that
+rows edited mid-archive are never deleted.
+"""
+
+import gzip
+
+import pandas as pd
+import pytest
+
+import sheet_archive
+import sheet_cache
+import sheet_partitions
+from generate_grades import load_roster, match_completions, read_google_sheet
+from synthetic_data import LocalSheetsClient, generate_roster, generate_sheet_values, write_roster_csv
+
+
+def spring_row(day, name, scenario="Liberty Park"):
+    return [f"2026-02-{day:02d} 09:00:00", name, scenario, "Good outcome", "A → B", "one", "two", "three",
+            "Completed"]
+
+
+@pytest.fixture
+def setup(tmp_path, monkeypatch):
+    monkeypatch.setattr(sheet_cache, "CACHE_DIR", "off")
+    monkeypatch.setattr(sheet_archive, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    monkeypatch.setattr(sheet_partitions, "PARTITION_MODE", "off")
+    sheet_cache.clear()
+    sheet_partitions.clear()
+
+    roster = generate_roster(60)
+    write_roster_csv(roster, tmp_path / "roster.csv")
+    names = [f"{student['Last Name']}, {student['First Name']}" for student in roster[:5]]
+    values = generate_sheet_values(500, roster, seed=6) + [spring_row(day, name) for day, name in enumerate(names, 1)]
+    client = LocalSheetsClient()
+    client.add_sheet("local://sheet", values)
+    yield client, tmp_path / "archive", load_roster(str(tmp_path / "roster.csv"))
+    sheet_cache.clear()
+    sheet_partitions.clear()
+
+
+def record_keys(records):
+    return sorted(tuple(record.values()) for record in records)
+
+
+def test_archive_is_transparent(setup):
+    client, archive_dir, roster_indexes = setup
+    spreadsheet = client.open_by_url("local://sheet")
+    before = read_google_sheet("local://sheet", client=client)
+
+    counts = sheet_archive.archive_sheet(spreadsheet, "Spring 2026")
+    assert {term for term, _ in counts} == {"Fall 2025"}
+    live = spreadsheet.sheet1.get_all_values()
+    assert sum(1 for row in live if row and row[0].startswith("2025")) == 0
+    assert sum(1 for row in live if row and row[0].startswith("2026")) == 5
+
+    after = read_google_sheet("local://sheet", client=client)
+    assert record_keys(after) == record_keys(before)
+    grades = lambda records: {scenario: sorted(org_id for org_id, _ in completions) for scenario, completions
+                              in match_completions(records, *roster_indexes)["completions"].items()}
+    assert grades(after) == grades(before)
+
+    manifest = sheet_archive.read_manifest()
+    assert sum(entry["rows"] for entry in manifest["files"]) == sum(counts.values())
+    entry = manifest["files"][0]
+    assert len(pd.read_csv(archive_dir / entry["path"])) == entry["rows"]
+    assert sheet_archive.load_archived_records(["Spring 2026"]) == []
+
+    # Nothing left to archive
+    assert sheet_archive.archive_sheet(spreadsheet, "Spring 2026") == {}
+    assert sheet_archive.read_manifest()["generation"] == manifest["generation"]
+
+
+def test_interrupted_archive_does_not_duplicate(setup, monkeypatch):
+    client, _, _ = setup
+    spreadsheet = client.open_by_url("local://sheet")
+    rows, _, _ = sheet_archive.plan_archive(spreadsheet, "Spring 2026")
+    sheet_archive.write_archive(rows)  # as if the run stopped before deleting anything
+    counts = sheet_archive.archive_sheet(spreadsheet, "Spring 2026")
+    assert sum(entry["rows"] for entry in sheet_archive.read_manifest()["files"]) == sum(counts.values())
+
+    # A row edited between archiving and deleting is left alone
+    client.add_sheet("local://other", [spring_row(1, "Adams, Kyleigh"), spring_row(2, "Baker, Ana")])
+    other = client.open_by_url("local://other")
+    other.sheet1._values[0][0] = "2025-11-01 09:00:00"
+    write_archive = sheet_archive.write_archive
+
+    def edit_then_write(rows, archive_dir=None):
+        added = write_archive(rows, archive_dir)
+        other.sheet1._values[0][5] = "edited"
+        return added
+
+    monkeypatch.setattr(sheet_archive, "write_archive", edit_then_write)
+    with pytest.raises(RuntimeError, match="changed while archiving"):
+        sheet_archive.archive_sheet(other, "Spring 2026")
+    assert len(other.sheet1.get_all_values()) == 2
+
+
+def test_partitioned_archive(setup, monkeypatch):
+    client, archive_dir, _ = setup
+    monkeypatch.setattr(sheet_partitions, "PARTITION_MODE", "scenario")
+    spreadsheet = client.open_by_url("local://sheet")
+    sheet_partitions.split_unpartitioned(spreadsheet)
+    fall_before = read_google_sheet("local://sheet", client=client, terms=["Fall 2025"])
+    spring_before = read_google_sheet("local://sheet", client=client, terms=["Spring 2026"])
+
+    sheet_archive.archive_sheet(spreadsheet, "Spring 2026")
+    assert all(sheet_partitions.parse_title(title)[0] == "Spring 2026"
+               for title in sheet_partitions.partition_index(spreadsheet))
+    # The split's leftover copy keeps only the live term, and its rows were archived once, from the partitions
+    copied = spreadsheet.sheet1
+    assert copied.title == sheet_partitions.COPIED_TITLE
+    left = [row[0] for row in copied.get_all_values()[1:] if row]
+    assert sum(timestamp.startswith("2026-02") for timestamp in left) == 5
+    assert not any(timestamp.startswith("2025") for timestamp in left)
+    assert sum(entry["rows"] for entry in sheet_archive.read_manifest()["files"]) == len(fall_before)
+    assert record_keys(read_google_sheet("local://sheet", client=client, terms=["Fall 2025"])) == \
+        record_keys(fall_before)
+    assert read_google_sheet("local://sheet", client=client, terms=["Spring 2026"]) == spring_before
+    with gzip.open(archive_dir / sheet_archive.read_manifest()["files"][0]["path"], "rt") as f:
+        assert f.readline().startswith("Timestamp,Student Name")
@@ -0,0 +1,52 @@
+"""
+Test script for sheet_cache.py
+
+Reads a local spreadsheet repeatedly and checks that data is downloaded only
+when its revision changes, that snapshots survive a new process (by clearing
+the in-memory copies) and that the header check skips reads on an idle sheet.
+"""
+
+import pytest
+
+import sheet_cache
+from generate_grades import read_google_sheet
+from synthetic_data import LocalSheetsClient, generate_roster, generate_sheet_values
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(sheet_cache, "CACHE_DIR", str(tmp_path / "snapshots"))
+    sheet_cache.clear()
+    client = LocalSheetsClient()
+    client.add_sheet("local://term", generate_sheet_values(100, generate_roster(20), seed=4))
+    yield client
+    sheet_cache.clear()
+
+
+def test_unchanged_sheet_is_read_once(client):
+    spreadsheet = client.open_by_url("local://term")
+    worksheet = spreadsheet.sheet1
+    first = read_google_sheet("local://term", client=client)
+    for _ in range(3):
+        assert read_google_sheet("local://term", client=client) == first
+    assert worksheet.reads == 1
+    assert spreadsheet.metadata_reads == 4
+
+    worksheet.append_row(list(first[0].values()))
+    assert len(read_google_sheet("local://term", client=client)) == len(first) + 1
+    assert worksheet.reads == 2
+
+
+def test_snapshot_on_disk_is_shared(client):
+    worksheet = client.open_by_url("local://term").sheet1
+    values = sheet_cache.get_all_values(worksheet)
+    sheet_cache.clear()
+    assert sheet_cache.get_all_values(worksheet) == values
+    assert worksheet.reads == 1
+
+
+def test_header_check(client):
+    worksheet = client.open_by_url("local://term").sheet1
+    for _ in range(5):
+        assert sheet_cache.has_rows(worksheet)
+    assert worksheet.reads == 1
@@ -0,0 +1,98 @@
+"""
+Test script for sheet_mirror.py
+
+Syncs a local worksheet into a temporary SQLite mirror and checks that new
+rows arrive through tail reads, edits and deletions are picked up (at once
+when the spreadsheet revision says so, otherwise at the scheduled verify), and
+the mirrored records match what parse_sheet_values() reads from the sheet.
+"""
+
+import sheet_mirror
+from generate_grades import parse_sheet_values
+from synthetic_data import LocalSheetsClient, LocalWorksheet, generate_roster, generate_sheet_values
+
+
+def make_sheet(rows=300):
+    values = generate_sheet_values(rows, generate_roster(30), seed=5)
+    return values, LocalWorksheet(values[:rows // 2])
+
+
+def mirrored(conn, worksheet):
+    return sheet_mirror.load_records(conn) == parse_sheet_values(worksheet.get_all_values(), verbose=False)
+
+
+def test_tail_sync_reads_only_new_rows(tmp_path):
+    values, worksheet = make_sheet()
+    conn = sheet_mirror.connect(str(tmp_path / "mirror.sqlite3"))
+    assert sheet_mirror.sync(conn, worksheet)["full"]
+
+    for row in values[len(worksheet._values):]:
+        worksheet.append_row(row)
+    result = sheet_mirror.sync(conn, worksheet)
+    assert not result["full"]
+    assert result["added"] == sum(1 for row in values[150:] if any(row))
+    assert mirrored(conn, worksheet)
+
+    version = sheet_mirror.data_version(conn)
+    assert sheet_mirror.sync(conn, worksheet)["added"] == 0
+    assert sheet_mirror.data_version(conn) == version
+
+
+def test_edits_and_deletions(tmp_path):
+    _, worksheet = make_sheet()
+    conn = sheet_mirror.connect(str(tmp_path / "mirror.sqlite3"))
+    sheet_mirror.sync(conn, worksheet)
+
+    # An edit above the tail is only seen by a verify sync
+    worksheet._values[5][1] = "Edited Name"
+    assert sheet_mirror.sync(conn, worksheet)["updated"] == 0
+    assert sheet_mirror.sync(conn, worksheet, verify=True)["updated"] == 1
+    assert sheet_mirror.load_records(conn, student="edited name")[0]["Student Name"] == "Edited Name"
+
+    # Deleting a row shifts the last row, which the tail check notices
+    del worksheet._values[10]
+    result = sheet_mirror.sync(conn, worksheet)
+    assert result["full"] and result["removed"] >= 1
+    assert mirrored(conn, worksheet)
+
+
+def test_filters_use_indexed_columns(tmp_path):
+    _, worksheet = make_sheet()
+    conn = sheet_mirror.connect(str(tmp_path / "mirror.sqlite3"))
+    sheet_mirror.sync(conn, worksheet)
+    records = parse_sheet_values(worksheet.get_all_values(), verbose=False)
+
+    scenario = records[0]["Scenario Title"]
+    expected = [r for r in records if r["Scenario Title"] == scenario and r["Completion Status"] == "Completed"]
+    assert sheet_mirror.load_records(conn, scenario=scenario, status="Completed") == expected
+    plan = conn.execute("EXPLAIN QUERY PLAN SELECT * FROM submissions WHERE scenario = ? AND status = ?",
+                        (scenario, "Completed")).fetchall()
+    assert "submissions_scenario" in str(plan)
+
+
+def test_revision_triggers_verify(tmp_path):
+    values, _ = make_sheet()
+    client = LocalSheetsClient()
+    worksheet = client.add_sheet("local://sheet", values[:150]).sheet1
+    db_path = str(tmp_path / "mirror.sqlite3")
+    sheet_mirror.read_mirrored_sheet("local://sheet", db_path, client=client)
+
+    # Unchanged revision: nothing is read
+    reads = worksheet.reads
+    sheet_mirror.read_mirrored_sheet("local://sheet", db_path, client=client)
+    assert worksheet.reads == reads
+
+    # A hand-corrected name with no new rows is found straight away
+    worksheet.update_cell(6, 2, "Corrected Name")
+    records = sheet_mirror.read_mirrored_sheet("local://sheet", db_path, client=client)
+    assert records == parse_sheet_values(worksheet.get_all_values(), verbose=False)
+
+    # An edit alongside new rows waits for the scheduled verify
+    worksheet.update_cell(7, 2, "Another Correction")
+    worksheet.append_row(values[150])
+    conn = sheet_mirror.connect(db_path)
+    assert sheet_mirror.sync(conn, worksheet, "local://sheet")["updated"] == 0
+    worksheet.append_row(values[151])
+    assert sheet_mirror.sync(conn, worksheet, "local://sheet", verify_seconds=0)["updated"] == 1
+    assert mirrored(conn, worksheet)
+    conn.close()
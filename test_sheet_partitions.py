@@ -0,0 +1,128 @@
+"""
+Test script for sheet_partitions.py
+
+Routes submissions into term and scenario worksheets of a local spreadsheet,
+then checks that term reads open only their partitions (and the history not yet
+split), that the partition index is cached, and that splitting the
+unpartitioned history neither loses nor duplicates rows, even when a split
+that failed part way is run again.
+"""
+
+import pytest
+
+import sheet_cache
+import sheet_partitions
+import sheets_integration
+from generate_grades import EXPECTED_HEADERS, parse_sheet_values, read_google_sheet
+from synthetic_data import LocalSheetsClient, generate_roster, generate_sheet_values
+
+
+@pytest.fixture
+def spreadsheet(monkeypatch):
+    monkeypatch.setattr(sheet_cache, "CACHE_DIR", "off")
+    monkeypatch.setattr(sheet_partitions, "PARTITION_MODE", "scenario")
+    monkeypatch.setattr(sheet_partitions, "TERM", None)
+    sheet_cache.clear()
+    sheet_partitions.clear()
+    yield LocalSheetsClient().add_sheet("local://sheet", generate_sheet_values(300, generate_roster(40), seed=4))
+    sheet_cache.clear()
+    sheet_partitions.clear()
+
+
+def row(timestamp, scenario, name="Adams, Kyleigh"):
+    return [timestamp, name, scenario, "Good outcome", "A → B", "one", "two", "three", "Completed"]
+
+
+def test_routing_and_term_reads(spreadsheet):
+    rows = [row("2025-10-01 09:00:00", "Liberty Park"), row("2025-11-01 09:00:00", "Probable Cause"),
+            row("2026-02-01 09:00:00", "Liberty Park"), row("2026-03-01 09:00:00", "Liberty Park")]
+    for data in rows:
+        sheet_partitions.worksheet_for_row(spreadsheet, data).append_row(data)
+    listed = spreadsheet.metadata_reads
+    sheet_partitions.worksheet_for_row(spreadsheet, rows[-1])
+    assert spreadsheet.metadata_reads == listed  # served from the cached index
+
+    index = sheet_partitions.partition_index(spreadsheet)
+    assert sorted(index) == ["Fall 2025 | Liberty Park", "Fall 2025 | Probable Cause", "Spring 2026 | Liberty Park"]
+    assert index["Spring 2026 | Liberty Park"].get_all_values()[0] == EXPECTED_HEADERS
+
+    reads = {worksheet.title: worksheet.reads for worksheet in spreadsheet.worksheets()}
+    spring = sheet_partitions.read_partitions(spreadsheet, ["Spring 2026"])
+    assert [record["Timestamp"] for record in spring] == ["2026-02-01 09:00:00", "2026-03-01 09:00:00"]
+    changed = [worksheet.title for worksheet in spreadsheet.worksheets() if worksheet.reads != reads[worksheet.title]]
+    assert changed == ["Sheet1", "Spring 2026 | Liberty Park"]
+
+    fall = sheet_partitions.read_partitions(spreadsheet, ["Fall 2025"], scenarios=["Probable Cause"])
+    assert [record["Scenario Title"] for record in fall] == ["Probable Cause"]
+
+    # Every read also includes the rows written before partitioning, from its terms
+    legacy = parse_sheet_values(spreadsheet.sheet1.get_all_values(), verbose=False)
+    assert len(sheet_partitions.read_partitions(spreadsheet)) == len(legacy) + len(rows)
+    legacy_fall = [record for record in legacy if sheet_partitions.row_term(record["Timestamp"]) == "Fall 2025"]
+    assert legacy_fall
+    assert len(sheet_partitions.read_partitions(spreadsheet, ["Fall 2025"])) == len(legacy_fall) + 2
+
+
+def test_split_unpartitioned(spreadsheet):
+    sheet_partitions.worksheet_for_row(spreadsheet, row("2026-02-01 09:00:00", "Liberty Park")).append_row(
+        row("2026-02-01 09:00:00", "Liberty Park"))
+    before = sheet_partitions.read_partitions(spreadsheet)
+
+    copied = sheet_partitions.split_unpartitioned(spreadsheet)
+    assert sum(copied.values()) == len(before) - 1
+    assert spreadsheet.sheet1.title == sheet_partitions.COPIED_TITLE
+    assert sheet_partitions.split_unpartitioned(spreadsheet) == {}
+
+    key = lambda record: (record["Timestamp"], record["Student Name"], record["Scenario Title"])
+    after = sheet_partitions.read_partitions(spreadsheet)
+    assert sorted(map(key, after)) == sorted(map(key, before))
+    for title in sheet_partitions.partition_index(spreadsheet):
+        term, _ = sheet_partitions.parse_title(title)
+        records = sheet_partitions.read_partitions(spreadsheet, [term])
+        assert all(sheet_partitions.row_term(record["Timestamp"]) == term for record in records)
+
+
+def test_split_again_after_a_failure(spreadsheet, monkeypatch):
+    """A split that dies after copying some partitions, or before the rename, can be rerun."""
+    before = sheet_partitions.read_partitions(spreadsheet)
+    get_partition = sheet_partitions.get_partition
+    calls = []
+
+    def fail(*args):
+        raise RuntimeError("quota exceeded")
+
+    def get_two_partitions(spreadsheet, title):
+        calls.append(title)
+        return get_partition(spreadsheet, title) if len(calls) < 3 else fail()
+
+    monkeypatch.setattr(sheet_partitions, "get_partition", get_two_partitions)
+    with pytest.raises(RuntimeError):
+        sheet_partitions.split_unpartitioned(spreadsheet)
+    monkeypatch.setattr(sheet_partitions, "get_partition", get_partition)
+
+    first = spreadsheet.sheet1
+    update_title = first.update_title
+    monkeypatch.setattr(first, "update_title", fail)
+    with pytest.raises(RuntimeError):
+        sheet_partitions.split_unpartitioned(spreadsheet)
+    monkeypatch.setattr(first, "update_title", update_title)
+
+    assert sum(sheet_partitions.split_unpartitioned(spreadsheet).values()) == 0
+    assert spreadsheet.sheet1.title == sheet_partitions.COPIED_TITLE
+    key = lambda record: (record["Timestamp"], record["Student Name"], record["Scenario Title"])
+    assert sorted(map(key, sheet_partitions.read_partitions(spreadsheet))) == sorted(map(key, before))
+
+
+def test_app_writes_and_grade_reads(spreadsheet, monkeypatch):
+    monkeypatch.setattr(sheet_partitions, "PARTITION_MODE", "term")
+    client = LocalSheetsClient({"local://sheet": spreadsheet})
+    monkeypatch.setattr(sheets_integration, "_authorize_client", lambda: client)
+
+    row_data = sheets_integration.build_reflection_row("Adams, Kyleigh", "Good outcome", "Liberty Park",
+                                                       reflection_1="one", reflection_2="two", reflection_3="three")
+    sheets_integration.append_reflection_row(row_data, "local://sheet")
+    term = sheet_partitions.current_term()
+    assert spreadsheet.worksheets()[-1].title == term
+
+    records = read_google_sheet("local://sheet", client=client, terms=[term])
+    assert [record["Student Name"] for record in records] == ["Adams, Kyleigh"]
@@ -0,0 +1,75 @@
+"""
+Test script for state_token.py
+
+Round-trips real progress through a URL token and checks that tampered,
+foreign or stale tokens are rejected, including progress recorded before the
+scenario's scenes, choices or variables were edited.
+"""
+
+import state_token
+from scenario_engine import ScenarioEngine
+from scenario_state import CompiledScenario
+
+
+def walked_progress():
+    engine = ScenarioEngine("scenarios/rio_grande")
+    compiled = CompiledScenario(engine.scenes, engine.variables)
+    progress = compiled.new_progress("rio_grande")
+    compiled.apply_choice(progress, 1)
+    return compiled, progress
+
+
+def test_round_trip(monkeypatch):
+    """A token restores the same scene, choices and variables."""
+    monkeypatch.setenv("SCENARIO_STATE_SECRET", "class-secret")
+    compiled, progress = walked_progress()
+    token = state_token.encode(progress)
+    assert len(token) < 200
+    assert all(c.isalnum() or c in "-_" for c in token)
+
+    restored = state_token.decode(token)
+    assert restored.scene == progress.scene
+    assert list(restored.choices) == list(progress.choices)
+    assert list(restored.variables) == list(progress.variables)
+    assert compiled.fits(restored)
+
+
+def test_rejects_tampered_and_foreign_tokens(monkeypatch):
+    monkeypatch.setenv("SCENARIO_STATE_SECRET", "class-secret")
+    _, progress = walked_progress()
+    token = state_token.encode(progress)
+
+    tampered = token[:4] + ("A" if token[4] != "A" else "B") + token[5:]
+    assert state_token.decode(tampered) is None
+    assert state_token.decode("not-a-token") is None
+    assert state_token.decode("") is None
+
+    monkeypatch.setenv("SCENARIO_STATE_SECRET", "other-server")
+    assert state_token.decode(token) is None
+
+
+def test_stale_progress_does_not_fit():
+    """Progress from a different scenario layout is refused instead of indexing past its tables."""
+    _, progress = walked_progress()
+    other = CompiledScenario({"1": {"type": "end"}}, {})
+    assert not other.fits(progress)
+
+
+def test_progress_from_an_edited_layout_does_not_fit(monkeypatch):
+    """Same table sizes, different choice target or variable names: start fresh rather than land elsewhere."""
+    monkeypatch.setenv("SCENARIO_STATE_SECRET", "class-secret")
+    engine = ScenarioEngine("scenarios/rio_grande")
+    scenes = {scene_id: engine.scenes[scene_id] for scene_id in engine.scenes}
+    compiled, progress = walked_progress()
+    restored = state_token.decode(state_token.encode(progress))
+    assert restored.layout == compiled.layout
+
+    first = dict(scenes["1"], choices=list(scenes["1"]["choices"]))
+    first["choices"][0], first["choices"][1] = first["choices"][1], first["choices"][0]
+    swapped = CompiledScenario(dict(scenes, **{"1": first}), engine.variables)
+    assert len(swapped.scene_ids) == len(compiled.scene_ids)
+    assert not swapped.fits(restored)
+
+    renamed = {f"{name}2": value for name, value in engine.variables.items()}
+    assert not CompiledScenario(scenes, renamed).fits(restored)
+    assert CompiledScenario(scenes, engine.variables).fits(restored)
@@ -0,0 +1,53 @@
+"""
+Test script for submission_queue.py
+
+Checks that a token is written once however often it is submitted, and that a
+failed write can be retried under the same token.
+"""
+
+import threading
+import uuid
+
+import submission_queue
+
+
+def test_repeated_submits_write_once():
+    """Clicks while a write is pending or after it succeeded reuse the first job."""
+    release = threading.Event()
+    writes = []
+
+    def slow_write(row):
+        release.wait(5)
+        writes.append(row)
+        return True
+
+    token = uuid.uuid4().hex
+    first = submission_queue.submit(token, slow_write, ["row"])
+    assert submission_queue.status(token) == (submission_queue.PENDING, None)
+    assert submission_queue.submit(token, slow_write, ["row"]) is first
+
+    release.set()
+    first.result(timeout=5)
+    assert submission_queue.status(token) == (submission_queue.DONE, None)
+    assert submission_queue.submit(token, slow_write, ["row"]) is first
+    assert writes == [["row"]]
+
+
+def test_failed_submit_can_retry():
+    """A failed write reports its error and the same token can be submitted again."""
+    attempts = []
+
+    def flaky_write():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("quota exceeded")
+        return True
+
+    token = uuid.uuid4().hex
+    submission_queue.submit(token, flaky_write).exception(timeout=5)
+    assert submission_queue.status(token) == (submission_queue.FAILED, "quota exceeded")
+
+    submission_queue.submit(token, flaky_write).result(timeout=5)
+    assert submission_queue.status(token) == (submission_queue.DONE, None)
+    assert len(attempts) == 2
+    assert submission_queue.status("never-submitted") == (None, None)
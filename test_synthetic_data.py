@@ -0,0 +1,98 @@
+"""
+Test script for synthetic_data.py
+
+Checks that generated rosters and sheets have the shapes generate_grades.py
+has to cope with, then prints runtime and memory as the row count grows.
+"""
+
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+import sheet_cache
+from generate_grades import parse_sheet_values, read_google_sheet
+from synthetic_data import (
+    CUTOFF_DATE,
+    LocalSheetsClient,
+    generate_roster,
+    generate_sheet_values,
+    load_scenarios,
+    measure_grade_pipeline,
+)
+
+
+def test_generate_roster():
+    """Rosters have unique names, IDs and sections at any size."""
+    roster = generate_roster(5000, sections=5)
+    names = {(row["Last Name"], row["First Name"]) for row in roster}
+    assert len(names) == 5000
+    assert len({row["OrgDefinedId"] for row in roster}) == 5000
+    assert {row["Class Period"] for row in roster} == {f"Group {i}" for i in range(1, 6)}
+
+
+def test_sheet_layouts():
+    """Sheets parse the same way with and without a header row."""
+    roster = generate_roster(100)
+    scenarios = load_scenarios()
+    with_header = generate_sheet_values(500, roster, scenarios, header=True, seed=3)
+    without_header = generate_sheet_values(500, roster, scenarios, header=False, seed=3)
+
+    assert with_header[1:] == without_header
+    assert parse_sheet_values(with_header, verbose=False) == parse_sheet_values(without_header, verbose=False)
+
+
+def test_sheet_contents():
+    """Sheets mix name formats around the cutoff, duplicates and empty rows."""
+    roster = generate_roster(200)
+    values = generate_sheet_values(3000, roster, header=False, seed=1)
+
+    assert any(not any(row) for row in values)
+    records = parse_sheet_values(values, verbose=False)
+    pre = [r for r in records if datetime.strptime(r["Timestamp"], "%Y-%m-%d %H:%M:%S") < CUTOFF_DATE]
+    post = [r for r in records if datetime.strptime(r["Timestamp"], "%Y-%m-%d %H:%M:%S") >= CUTOFF_DATE]
+    assert pre and post
+    assert all("," in r["Student Name"] for r in post)
+    assert any("," not in r["Student Name"] for r in pre)
+
+    keys = [(r["Student Name"], r["Scenario Title"]) for r in post]
+    assert len(set(keys)) < len(keys)
+
+
+def test_local_sheets_client(tmp_path, monkeypatch):
+    """read_google_sheet can read a synthetic sheet through the local stand-in."""
+    monkeypatch.setattr(sheet_cache, "CACHE_DIR", str(tmp_path))
+    roster = generate_roster(50)
+    values = generate_sheet_values(200, roster, seed=2)
+    client = LocalSheetsClient()
+    client.add_sheet("local://term", values)
+
+    records = read_google_sheet("local://term", client=client)
+    assert records == parse_sheet_values(values, verbose=False)
+
+
+def test_grade_pipeline_scaling():
+    """Report how runtime and memory grow with the row count."""
+    print(f"\n{'rows':>8} {'seconds':>9} {'us/row':>8} {'peak MB':>8}")
+    results = []
+    for rows in [500, 2000, 8000]:
+        result = measure_grade_pipeline(rows, roster_size=300)
+        results.append(result)
+        print(f"{rows:>8} {result['seconds']:>9.3f} {result['seconds'] / rows * 1e6:>8.1f} "
+              f"{result['peak_bytes'] / 1e6:>8.1f}")
+
+    assert all(result["graded"] > 0 for result in results)
+    # Memory should grow roughly with the input, not faster than it
+    growth = results[-1]["peak_bytes"] / results[0]["peak_bytes"]
+    assert growth < 16 * 2
+
+
+if __name__ == "__main__":
+    test_generate_roster()
+    test_sheet_layouts()
+    test_sheet_contents()
+    with tempfile.TemporaryDirectory() as tmp, pytest.MonkeyPatch.context() as monkeypatch:
+        test_local_sheets_client(Path(tmp), monkeypatch)
+    test_grade_pipeline_scaling()
+    print("[OK] All synthetic data tests passed")
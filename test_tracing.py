@@ -0,0 +1,93 @@
+"""
+Test script for tracing.py
+
+Checks that spans are free when tracing is off, and that enabled spans reach
+the JSONL file and the Prometheus-style metrics endpoint.
+"""
+
+import json
+import logging
+import socket
+import urllib.request
+
+import tracing
+
+
+def enable_tracing(tmp_path, port=0):
+    """Switch tracing on for one test, writing to a temporary trace file."""
+    tracing.ENABLED = True
+    tracing.TRACE_FILE = str(tmp_path / "spans.jsonl")
+    tracing.METRICS_PORT = port
+    tracing._logger = None
+    tracing._histograms.clear()
+    logging.getLogger("scenario.tracing").handlers.clear()
+
+
+def disable_tracing():
+    if tracing._server is not None:
+        tracing._server.shutdown()
+        tracing._server.server_close()
+        tracing._server = None
+    tracing.ENABLED = False
+    tracing._logger = None
+    for handler in logging.getLogger("scenario.tracing").handlers:
+        handler.close()
+    logging.getLogger("scenario.tracing").handlers.clear()
+
+
+def test_disabled_span_is_shared_noop():
+    """With tracing off, span() hands back the same no-op object."""
+    assert not tracing.ENABLED
+    assert tracing.span("a") is tracing.span("b", scene="1")
+    with tracing.span("engine.run") as current:
+        current.tag(scene="2")
+
+
+def test_spans_written_to_jsonl(tmp_path):
+    """Enabled spans carry the rerun context and are appended as JSON lines."""
+    enable_tracing(tmp_path)
+    try:
+        tracing.start_rerun(scenario="rio_grande")
+        tracing.set_context(scene="2a")
+        with tracing.span("engine.display_scene"):
+            pass
+
+        @tracing.traced("sheets.append_row")
+        def append_row():
+            raise ValueError("quota exceeded")
+
+        try:
+            append_row()
+        except ValueError:
+            pass
+    finally:
+        disable_tracing()
+
+    lines = [json.loads(line) for line in (tmp_path / "spans.jsonl").read_text().splitlines()]
+    assert [line["span"] for line in lines] == ["engine.display_scene", "sheets.append_row"]
+    assert lines[0]["scenario"] == "rio_grande" and lines[0]["scene"] == "2a"
+    assert lines[0]["rerun"] == lines[1]["rerun"]
+    assert lines[1]["error"] == "ValueError"
+
+
+def test_metrics_endpoint(tmp_path):
+    """The metrics endpoint serves cumulative histograms and collector lines."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+
+    enable_tracing(tmp_path, port)
+    tracing.register_collector(lambda: ["scenario_test_gauge 7"])
+    try:
+        tracing.start_rerun(scenario="liberty_park")
+        for _ in range(3):
+            with tracing.span("engine.run"):
+                pass
+        body = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5).read().decode()
+    finally:
+        tracing._collectors.clear()
+        disable_tracing()
+
+    assert 'scenario_span_seconds_count{span="engine.run",scenario="liberty_park",scene=""} 3' in body
+    assert 'le="+Inf"} 3' in body
+    assert "scenario_test_gauge 7" in body
@@ -0,0 +1,84 @@
+"""
+Test script for vectorized_grades.py
+
+Checks that the pandas engine returns exactly what the row-wise
+match_completions returns, on synthetic sheets, on awkward rows and with an
+alias table.
+"""
+
+from datetime import datetime
+
+from generate_grades import generate_grade_csvs, load_roster, match_completions, parse_sheet_values
+from name_aliases import NameAliases
+from synthetic_data import generate_roster, generate_sheet_values, write_roster_csv
+
+
+def load_test_roster(tmp_path, size=120):
+    roster = generate_roster(size)
+    write_roster_csv(roster, tmp_path / "roster.csv")
+    return roster, load_roster(str(tmp_path / "roster.csv"))
+
+
+def assert_same(records, roster, cutoff_date=datetime(2025, 10, 9)):
+    rows = match_completions(records, *roster, cutoff_date, engine="rows")
+    columns = match_completions(records, *roster, cutoff_date, engine="pandas")
+    assert columns == rows
+    assert list(columns["status_counts"]) == list(rows["status_counts"])
+    assert list(columns["completions"]) == list(rows["completions"])
+
+
+def test_matches_row_engine_on_synthetic_sheets(tmp_path):
+    roster_rows, roster = load_test_roster(tmp_path)
+    for seed in range(3):
+        records = parse_sheet_values(generate_sheet_values(1500, roster_rows, seed=seed), verbose=False)
+        assert_same(records, roster)
+        assert_same(records, roster, cutoff_date=datetime(2025, 11, 15))
+
+
+def test_awkward_rows(tmp_path):
+    roster_rows, roster = load_test_roster(tmp_path, 20)
+    student = roster_rows[0]
+    records = [
+        {"Timestamp": "not a date", "Student Name": f"{student['First Name']} {student['Last Name']}",
+         "Scenario Title": "A", "Completion Status": "COMPLETED "},
+        {"Timestamp": "9999-01-01 00:00:00", "Student Name": f"{student['Last Name']}, {student['First Name']}",
+         "Scenario Title": "A", "Completion Status": "Completed"},
+        {"Timestamp": "3000-01-01 00:00:00", "Student Name": f"{student['First Name']} {student['Last Name']}",
+         "Scenario Title": "B", "Completion Status": "Completed"},
+        {"Timestamp": "2025-09-01 10:00:00", "Student Name": "  ", "Scenario Title": "A",
+         "Completion Status": "Completed"},
+        {"Timestamp": "2025-09-01 10:00:00", "Student Name": "Nobody Here", "Scenario Title": "A",
+         "Completion Status": ""},
+        {"Timestamp": "", "Student Name": "Nobody Here", "Scenario Title": "A"},
+    ]
+    assert_same(records, roster)
+    assert_same([], roster)
+
+
+def test_manual_alias_with_unresolved_names(tmp_path):
+    roster_rows, roster = load_test_roster(tmp_path, 20)
+    records = [
+        {"Timestamp": "2025-09-01 10:00:00", "Student Name": "Kiddo Nickname", "Scenario Title": "A",
+         "Completion Status": "Completed"},
+        {"Timestamp": "2025-09-02 10:00:00", "Student Name": "Nobody Here", "Scenario Title": "A",
+         "Completion Status": "Completed"},
+    ]
+    results = []
+    for engine in ("rows", "pandas"):
+        aliases = NameAliases.for_roster(str(tmp_path / "roster.csv"))
+        aliases.add("Kiddo Nickname", roster_rows[0]["OrgDefinedId"])
+        results.append(match_completions(records, *roster, datetime(2025, 10, 9), engine, aliases))
+    assert results[1] == results[0]
+    assert [org_id for org_id, _ in results[0]["completions"]["A"]] == [roster_rows[0]["OrgDefinedId"]]
+
+
+def test_same_files(tmp_path):
+    roster_rows, roster = load_test_roster(tmp_path)
+    records = parse_sheet_values(generate_sheet_values(500, roster_rows, seed=9), verbose=False)
+    for engine in ("rows", "pandas"):
+        generate_grade_csvs(records, *roster, output_dir=str(tmp_path / engine), engine=engine,
+                            roster_file=str(tmp_path / "roster.csv"))
+    names = sorted(path.name for path in (tmp_path / "rows").iterdir())
+    assert names == sorted(path.name for path in (tmp_path / "pandas").iterdir())
+    for name in names:
+        assert (tmp_path / "rows" / name).read_bytes() == (tmp_path / "pandas" / name).read_bytes()
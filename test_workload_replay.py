@@ -0,0 +1,121 @@
+"""
+Test script for workload_replay.py
+
+Builds reflection sheet records from known scenario paths and checks that they
+convert into replayable workload sessions, then replays a short workload.
+Submitting during a replay needs a test sheet; the live one is refused.
+"""
+
+import pytest
+
+from workload_replay import (
+    load_engines,
+    records_to_workload,
+    replay_workload,
+    resolve_clicks,
+    session_from_choices_made,
+    summarize_events,
+)
+
+
+def first_choice_path(engine):
+    """Follow the first option of every choice scene and return the choice texts."""
+    texts = []
+    scene_id = "1"
+    while engine.scenes[scene_id]["type"] != "end":
+        scene = engine.scenes[scene_id]
+        if scene["type"] == "choice":
+            texts.append(scene["choices"][0]["text"])
+            scene_id = scene["choices"][0]["next"]
+        elif scene["type"] == "auto_advance":
+            scene_id = scene["next"]
+        else:
+            return None
+    return texts
+
+
+def test_resolve_clicks():
+    """Recorded choice texts resolve to the clicks that reach an end scene."""
+    engines_by_id, _ = load_engines()
+    engine = engines_by_id["rio_grande"]
+
+    texts = first_choice_path(engine)
+    clicks = resolve_clicks(engine, texts)
+    assert clicks is not None
+    assert [c["choice"] for c in clicks if c["choice"] is not None] == [0] * len(texts)
+
+    # A path with an unknown choice no longer fits the scenario
+    assert resolve_clicks(engine, ["Not a real choice"]) is None
+
+
+def test_records_to_workload():
+    """Sheet rows become sessions that preserve the original submission times."""
+    engines_by_id, _ = load_engines()
+    engine = engines_by_id["rio_grande"]
+    path = " → ".join(first_choice_path(engine))
+
+    records = [
+        {'Timestamp': '2025-10-15 09:00:00', 'Scenario Title': engine.metadata['title'],
+         'Choices Made': path, 'Completion Status': 'Completed'},
+        {'Timestamp': '2025-10-15 09:00:30', 'Scenario Title': engine.metadata['title'],
+         'Choices Made': path, 'Completion Status': 'Completed'},
+        {'Timestamp': '2025-10-15 09:01:00', 'Scenario Title': 'Retired Scenario',
+         'Choices Made': path, 'Completion Status': 'Completed'},
+    ]
+    sessions, skipped = records_to_workload(records, think_time=5, reflection_time=60)
+
+    assert len(sessions) == 2
+    assert skipped == 1
+    assert sessions[1]["submit_at"] - sessions[0]["submit_at"] == 30
+    clicks = sessions[0]["clicks"]
+    assert all(a["at"] < b["at"] for a, b in zip(clicks, clicks[1:]))
+    assert sessions[0]["submit_at"] - clicks[-1]["at"] == 60
+
+
+def test_live_trace_uses_recorded_times():
+    """Live traces keep the click times stored in choices_made."""
+    engines_by_id, _ = load_engines()
+    engine = engines_by_id["rio_grande"]
+    texts = first_choice_path(engine)
+
+    choices_made = [{"choice": text, "at": 1000.0 + 10 * i} for i, text in enumerate(texts)]
+    session = session_from_choices_made("rio_grande", choices_made, submitted_at=2000.0,
+                                        engines_by_id=engines_by_id)
+    recorded = [c["at"] for c in session["clicks"] if c["choice"] is not None]
+    assert recorded == [c["at"] for c in choices_made]
+
+
+def test_replay_workload():
+    """A short workload replays against app.py without errors."""
+    engines_by_id, _ = load_engines()
+    engine = engines_by_id["rio_grande"]
+    clicks = resolve_clicks(engine, first_choice_path(engine))
+    for i, click in enumerate(clicks):
+        click["at"] = 1.0 + i
+
+    sessions = [{"session": "s1", "scenario": "rio_grande", "start": 0.0, "clicks": clicks}]
+    events = replay_workload(sessions, speedup=100.0, max_workers=2)
+
+    assert len(events) == len(clicks) + 1
+    assert not any(event["error"] for event in events)
+    summary = summarize_events(events)
+    assert summary["click"]["count"] == len(clicks)
+
+
+def test_submit_requires_test_sheet():
+    sessions = [{"session": "s1", "scenario": "rio_grande", "start": 0.0, "clicks": []}]
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("GOOGLE_SHEET_URL", "https://docs.google.com/spreadsheets/d/live")
+        with pytest.raises(ValueError):
+            replay_workload(sessions, submit=True)
+        with pytest.raises(ValueError, match="live reflection sheet"):
+            replay_workload(sessions, submit=True, sheet_url="https://docs.google.com/spreadsheets/d/live")
+
+
+if __name__ == "__main__":
+    test_resolve_clicks()
+    test_records_to_workload()
+    test_live_trace_uses_recorded_times()
+    test_replay_workload()
+    test_submit_requires_test_sheet()
+    print("[OK] All workload replay tests passed")
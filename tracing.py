@@ -0,0 +1,221 @@
+"""
+Lightweight timing spans for the scenario engine and Google Sheets calls.
+
+Tracing is off unless the SCENARIO_TRACE environment variable is set. When it
+is off, span() returns a shared no-op context manager, so instrumented code
+pays for a single flag check.
+
+When it is on, every span is:
+1. Appended as one JSON line to a rotating log file (SCENARIO_TRACE_FILE,
+   default traces/spans.jsonl, rotated at SCENARIO_TRACE_MAX_BYTES)
+2. Aggregated into a histogram served in Prometheus text format on
+   http://127.0.0.1:<SCENARIO_METRICS_PORT>/metrics (default port 9464)
+
+Spans carry the scenario and scene set with set_context(), plus a rerun id so
+all stages of one Streamlit rerun can be grouped together.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+ENABLED = bool(os.getenv("SCENARIO_TRACE"))
+TRACE_FILE = os.getenv("SCENARIO_TRACE_FILE", "traces/spans.jsonl")
+TRACE_MAX_BYTES = int(os.getenv("SCENARIO_TRACE_MAX_BYTES", str(10 * 1024 * 1024)))
+TRACE_BACKUP_COUNT = int(os.getenv("SCENARIO_TRACE_BACKUPS", "5"))
+METRICS_PORT = int(os.getenv("SCENARIO_METRICS_PORT", "9464"))
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_context = ContextVar("trace_context", default={})
+_histograms = {}
+_histograms_lock = threading.Lock()
+_collectors = []
+_logger = None
+_setup_lock = threading.Lock()
+_server = None
+
+
+class _NoopSpan:
+    """Shared do-nothing span returned while tracing is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def tag(self, **tags):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    """A timed stage; records itself when the with-block exits."""
+
+    __slots__ = ("name", "tags", "start")
+
+    def __init__(self, name, tags):
+        self.name = name
+        self.tags = tags
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            # st.rerun() and st.stop() unwind through spans as ordinary control flow
+            if exc_type.__module__.startswith("streamlit"):
+                self.tags["interrupted"] = exc_type.__name__
+            else:
+                self.tags["error"] = exc_type.__name__
+        _record(self.name, duration, self.tags)
+        return False
+
+    def tag(self, **tags):
+        self.tags.update(tags)
+
+
+def span(name, **tags):
+    """Time a block of code: `with span("sheets.append_row"): ...`."""
+    if not ENABLED:
+        return _NOOP
+    return _Span(name, {**_context.get(), **tags})
+
+
+def traced(name):
+    """Decorator form of span() for whole functions."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def set_context(**tags):
+    """Set tags (such as scenario and scene) inherited by spans in this thread."""
+    if ENABLED:
+        _context.set({**_context.get(), **tags})
+
+
+def start_rerun(**tags):
+    """Begin a new rerun: reset the context and give it a fresh rerun id."""
+    if ENABLED:
+        _context.set({"rerun": uuid.uuid4().hex[:12], **tags})
+
+
+def register_collector(collector):
+    """Add a callable returning extra Prometheus text lines for /metrics."""
+    _collectors.append(collector)
+
+
+def _ensure_exporters():
+    """Create the rotating JSONL logger and start the metrics server once."""
+    global _logger, _server
+    if _logger is not None:
+        return
+    with _setup_lock:
+        if _logger is not None:
+            return
+        Path(TRACE_FILE).parent.mkdir(parents=True, exist_ok=True)
+        handler = RotatingFileHandler(TRACE_FILE, maxBytes=TRACE_MAX_BYTES, backupCount=TRACE_BACKUP_COUNT,
+                                      encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger = logging.getLogger("scenario.tracing")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(handler)
+
+        if METRICS_PORT:
+            try:
+                _server = ThreadingHTTPServer(("127.0.0.1", METRICS_PORT), _MetricsHandler)
+                threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+            except OSError as e:
+                # Another worker process already serves this port
+                print(f"Metrics endpoint not started on port {METRICS_PORT}: {str(e)}")
+        _logger = logger
+
+
+def _record(name, duration, tags):
+    _ensure_exporters()
+
+    key = (name, tags.get("scenario", ""), tags.get("scene", ""))
+    with _histograms_lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [[0] * len(BUCKETS), 0.0, 0]
+        for i, bound in enumerate(BUCKETS):
+            if duration <= bound:
+                histogram[0][i] += 1
+        histogram[1] += duration
+        histogram[2] += 1
+
+    _logger.info(json.dumps({
+        "ts": round(time.time(), 3),
+        "span": name,
+        "ms": round(duration * 1000, 3),
+        **tags,
+    }, ensure_ascii=False))
+
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_metrics():
+    """Return all span histograms and collector output in Prometheus text format."""
+    lines = [
+        "# HELP scenario_span_seconds Time spent in traced engine and Google Sheets stages",
+        "# TYPE scenario_span_seconds histogram",
+    ]
+    with _histograms_lock:
+        snapshot = {key: (list(h[0]), h[1], h[2]) for key, h in _histograms.items()}
+    for (name, scenario, scene), (buckets, total, count) in sorted(snapshot.items()):
+        labels = f'span="{_label_value(name)}",scenario="{_label_value(scenario)}",scene="{_label_value(scene)}"'
+        for bound, bucket_count in zip(BUCKETS, buckets):
+            lines.append(f'scenario_span_seconds_bucket{{{labels},le="{bound}"}} {bucket_count}')
+        lines.append(f'scenario_span_seconds_bucket{{{labels},le="+Inf"}} {count}')
+        lines.append(f"scenario_span_seconds_sum{{{labels}}} {total:.6f}")
+        lines.append(f"scenario_span_seconds_count{{{labels}}} {count}")
+
+    for collector in list(_collectors):
+        try:
+            lines.extend(collector())
+        except Exception as e:
+            lines.append(f"# collector {getattr(collector, '__name__', collector)} failed: {str(e)}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serves render_metrics() on /metrics."""
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,110 @@
+"""
+Columnar grade matching with pandas.
+
+A drop-in replacement for generate_grades.match_completions that produces
+the same result, in the same order, for large sheets:
+1. Records are loaded into one DataFrame. Timestamps are parsed with a
+   single to_datetime call, and names are stripped and lower-cased as
+   columns.
+2. Exact matches come from joins against the roster indexes: "LastName,
+   FirstName" for every entry, plus "FirstName LastName" before the cutoff.
+3. With an alias table (name_aliases.py), manual aliases and remembered
+   fuzzy results are joined the same way.
+4. Only the names still unmatched before the cutoff go to fuzzy matching,
+   once per distinct name rather than once per record.
+
+Select it with match_completions(..., engine="pandas") or
+SCENARIO_GRADE_ENGINE=pandas.
+"""
+
+from datetime import datetime
+from difflib import get_close_matches
+
+import pandas as pd
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+COLUMNS = ["Student Name", "Scenario Title", "Completion Status", "Timestamp"]
+
+
+def _text_column(frame, column):
+    # Object dtype keeps Python's str.strip()/str.lower() semantics, as in the row-wise path
+    if column not in frame:
+        return pd.Series("", index=frame.index, dtype=object)
+    return frame[column].astype(object).where(frame[column].notna(), "").map(str).str.strip()
+
+
+def _after_cutoff(timestamps, cutoff_date):
+    """Whether each entry is on or after the cutoff; unparseable timestamps count as before it."""
+    parsed = pd.to_datetime(timestamps, format=TIMESTAMP_FORMAT, errors="coerce")
+    after = (parsed >= cutoff_date).to_numpy(copy=True)
+
+    # Anything pandas couldn't represent (far-off years, say) gets the row-wise strptime
+    for position in (parsed.isna() & (timestamps != "")).to_numpy().nonzero()[0]:
+        try:
+            after[position] = datetime.strptime(timestamps.iat[position], TIMESTAMP_FORMAT) >= cutoff_date
+        except ValueError:
+            after[position] = False
+    return after
+
+
+def match_completions_frame(records, roster_lastname_first, roster_firstname_last, all_names, cutoff_date,
+                            aliases=None):
+    """Vectorized generate_grades.match_completions; returns the same dict."""
+    frame = pd.DataFrame.from_records(records, columns=None if records else COLUMNS)
+    student = _text_column(frame, "Student Name")
+    scenario = _text_column(frame, "Scenario Title")
+    status = _text_column(frame, "Completion Status")
+    timestamp = _text_column(frame, "Timestamp")
+
+    # Track statuses (in order of first appearance, like the row-wise dict)
+    status_keys = status.where(status != "", "(empty)")
+    status_counts = {key: int(count) for key, count in status_keys.value_counts(sort=False).items()}
+
+    completed = (status.str.lower() == "completed") & (student != "") & (scenario != "")
+    student, scenario, timestamp = student[completed], scenario[completed], timestamp[completed]
+    after = _after_cutoff(timestamp, cutoff_date)
+
+    # Exact matches: one join per roster index. org_id stays object dtype: filling it from a map
+    # would otherwise turn it into pandas' str dtype, which rejects the masked assignments below
+    lower = student.str.lower()
+    org_id = lower.map(roster_lastname_first).astype(object)
+    before = ~after
+    org_id[before] = org_id[before].fillna(lower[before].map(roster_firstname_last))
+
+    # Alias table: manual aliases for every entry, remembered fuzzy results before the cutoff
+    leftover = before & org_id.isna().to_numpy()
+    if aliases is not None:
+        org_id = org_id.fillna(lower.map(aliases.manual)).astype(object)
+        leftover = before & org_id.isna().to_numpy()
+        learned = student[leftover].map(aliases.learned)
+        org_id[leftover] = learned.where(learned != "")
+        leftover[leftover] = learned.isna().to_numpy()
+
+    # Fuzzy matching for what's left before the cutoff, once per distinct name
+    if leftover.any():
+        name_strings = [name for name, _ in all_names]
+        first_org_id = {}
+        for name, name_org_id in all_names:
+            first_org_id.setdefault(name, name_org_id)
+        fuzzy = {}
+        for name in pd.unique(student[leftover]):
+            matches = get_close_matches(name, name_strings, n=1, cutoff=0.85)
+            fuzzy[name] = first_org_id[matches[0]] if matches else None
+            if aliases is not None:
+                aliases.learn(name, fuzzy[name])
+        org_id[leftover] = student[leftover].map(fuzzy)
+
+    matched = org_id.notna().to_numpy()
+    scenario_completions = {}
+    firsts = pd.DataFrame({"scenario": scenario[matched], "org_id": org_id[matched], "student": student[matched]})
+    firsts = firsts.drop_duplicates(["scenario", "org_id"], keep="first")
+    for scenario_name, matched_org_id, student_name in zip(firsts["scenario"], firsts["org_id"], firsts["student"]):
+        scenario_completions.setdefault(scenario_name, []).append((matched_org_id, student_name))
+
+    unmatched = list(zip(student[~matched], scenario[~matched], timestamp[~matched]))
+    return {
+        "completions": scenario_completions,
+        "unmatched": unmatched,
+        "status_counts": status_counts,
+        "completed": int(completed.sum()),
+    }
@@ -0,0 +1,496 @@
+"""
+Record and replay real playthrough traces as a benchmark workload.
+
+A workload is a JSONL file with one student session per line:
+
+    {"session": "row-12", "scenario": "rio_grande", "start": 1760000000.0,
+     "clicks": [{"at": 1760000020.0, "scene": "1", "choice": 0}, ...],
+     "submit_at": 1760000400.0}
+
+Times are epoch seconds. `choice` is the choice index for choice scenes and
+null for Continue buttons. Sessions come from two sources:
+1. Rows of the reflection sheet (the "Choices Made" path joined by " → ")
+2. Live traces appended by the engine when SCENARIO_CAPTURE_FILE is set
+
+The replay driver runs each session against app.py with Streamlit's AppTest,
+compressing the original timeline by a speed-up factor so that real class
+traffic patterns (such as the burst of end-scene submissions) are preserved.
+With --submit the replay also submits each reflection, which writes a row per
+session. It therefore needs --sheet-url: a test sheet (never the live
+reflection sheet) or "local" for an in-memory sheet.
+
+Usage:
+    python workload_replay.py convert --csv sheet_export.csv -o workload.jsonl
+    python workload_replay.py replay workload.jsonl --speedup 20 --workers 30
+    python workload_replay.py replay workload.jsonl --submit --sheet-url local
+"""
+
+import argparse
+import csv
+import json
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+CHOICE_SEPARATOR = " → "
+DEFAULT_THINK_TIME = 20.0
+DEFAULT_REFLECTION_TIME = 300.0
+MAX_PATH_LENGTH = 200
+LOCAL_SHEET = "local"
+
+
+def load_engines(scenarios_dir="scenarios"):
+    """Load a ScenarioEngine for every scenario, keyed by id and by title."""
+    from scenario_engine import ScenarioEngine
+
+    engines_by_id = {}
+    ids_by_title = {}
+    for scenario_dir in sorted(Path(scenarios_dir).iterdir()):
+        if scenario_dir.is_dir() and (scenario_dir / "config.json").exists():
+            try:
+                engine = ScenarioEngine(scenario_dir)
+            except (json.JSONDecodeError, FileNotFoundError):
+                continue
+            engines_by_id[scenario_dir.name] = engine
+            title = engine.metadata.get("title", scenario_dir.name.replace("_", " ").title())
+            ids_by_title[title] = scenario_dir.name
+    return engines_by_id, ids_by_title
+
+
+def resolve_clicks(engine, choice_texts):
+    """
+    Walk a scenario from scene "1" following recorded choice texts.
+
+    Returns the list of clicks ({"scene", "choice"}) needed to reach the end
+    scene, or None if the path no longer fits the scenario configuration.
+    """
+    variables = dict(engine.variables)
+    clicks = []
+    scene_id = "1"
+    position = 0
+
+    while len(clicks) < MAX_PATH_LENGTH:
+        scene = engine.scenes.get(scene_id)
+        if scene is None:
+            return None
+
+        scene_type = scene.get("type")
+        if scene_type == "end":
+            return clicks if position == len(choice_texts) else None
+
+        if scene_type == "choice":
+            if position >= len(choice_texts):
+                return None
+            texts = [choice["text"].strip() for choice in scene["choices"]]
+            try:
+                index = texts.index(choice_texts[position].strip())
+            except ValueError:
+                return None
+            choice = scene["choices"][index]
+            for var_name, change in (choice.get("effects") or {}).items():
+                if var_name in variables:
+                    variables[var_name] += change
+            clicks.append({"scene": scene_id, "choice": index})
+            position += 1
+            scene_id = choice["next"]
+        elif scene_type == "auto_advance":
+            clicks.append({"scene": scene_id, "choice": None})
+            scene_id = scene["next"]
+        elif scene_type == "conditional":
+            next_scene = None
+            for condition_obj in scene.get("conditions", []):
+                if engine.evaluate_condition(condition_obj["condition"], variables):
+                    next_scene = condition_obj["next"]
+                    break
+            if next_scene is None:
+                next_scene = scene.get("default")
+            if next_scene is None:
+                return None
+            clicks.append({"scene": scene_id, "choice": None})
+            scene_id = next_scene
+        else:
+            return None
+
+    return None
+
+
+def _fill_click_times(clicks, finish_time, think_time):
+    """Give every click an "at" time, interpolating between known anchors."""
+    if not clicks:
+        return
+    if clicks[-1].get("at") is None:
+        clicks[-1]["at"] = finish_time
+
+    known = [i for i, click in enumerate(clicks) if click.get("at") is not None]
+
+    # Clicks before the first anchor are spaced back by the think time
+    first = known[0]
+    for i in range(first - 1, -1, -1):
+        clicks[i]["at"] = clicks[i + 1]["at"] - think_time
+
+    # Clicks between anchors are spread evenly
+    for left, right in zip(known, known[1:]):
+        gap = (clicks[right]["at"] - clicks[left]["at"]) / (right - left)
+        for i in range(left + 1, right):
+            clicks[i]["at"] = clicks[left]["at"] + gap * (i - left)
+
+
+def session_from_record(record, engines_by_id, ids_by_title, session_id,
+                        think_time=DEFAULT_THINK_TIME, reflection_time=DEFAULT_REFLECTION_TIME):
+    """Build a workload session from one reflection sheet record, or None."""
+    scenario_id = ids_by_title.get(record.get("Scenario Title", "").strip())
+    if scenario_id is None:
+        return None
+
+    try:
+        submit_at = datetime.strptime(record.get("Timestamp", "").strip(), "%Y-%m-%d %H:%M:%S").timestamp()
+    except ValueError:
+        return None
+
+    choices_summary = record.get("Choices Made", "").strip()
+    if not choices_summary or choices_summary == "No choices recorded":
+        choice_texts = []
+    else:
+        choice_texts = choices_summary.split(CHOICE_SEPARATOR)
+
+    clicks = resolve_clicks(engines_by_id[scenario_id], choice_texts)
+    if clicks is None:
+        return None
+
+    finish_time = submit_at - reflection_time
+    _fill_click_times(clicks, finish_time, think_time)
+    start = clicks[0]["at"] - think_time if clicks else finish_time
+
+    return {
+        "session": session_id,
+        "scenario": scenario_id,
+        "start": start,
+        "clicks": clicks,
+        "submit_at": submit_at,
+    }
+
+
+def session_from_choices_made(scenario_id, choices_made, submitted_at=None,
+                              engines_by_id=None, think_time=DEFAULT_THINK_TIME):
+    """Build a workload session from a live ScenarioEngine.choices_made() list."""
+    if engines_by_id is None:
+        engines_by_id, _ = load_engines()
+    engine = engines_by_id.get(scenario_id)
+    if engine is None:
+        return None
+
+    clicks = resolve_clicks(engine, [choice["choice"] for choice in choices_made])
+    if clicks is None:
+        return None
+
+    # Anchor the choice clicks on the times recorded when they were made
+    recorded_times = iter(choice.get("at") for choice in choices_made)
+    for click in clicks:
+        if click["choice"] is not None:
+            click["at"] = next(recorded_times, None)
+
+    submitted_at = submitted_at or time.time()
+    _fill_click_times(clicks, submitted_at, think_time)
+    start = clicks[0]["at"] - think_time if clicks else submitted_at
+
+    return {
+        "session": f"live-{int(submitted_at * 1000)}",
+        "scenario": scenario_id,
+        "start": start,
+        "clicks": clicks,
+        "submit_at": submitted_at,
+    }
+
+
+_capture_lock = threading.Lock()
+
+
+def capture_session_trace(path, scenario_id, choices_made, submitted_at=None):
+    """Append the current session's playthrough to a workload file."""
+    try:
+        session = session_from_choices_made(scenario_id, choices_made, submitted_at)
+        if session is None:
+            return False
+        line = json.dumps(session, ensure_ascii=False)
+        with _capture_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+        return True
+    except Exception as e:
+        print(f"Error capturing session trace: {str(e)}")
+        return False
+
+
+def records_to_workload(records, think_time=DEFAULT_THINK_TIME, reflection_time=DEFAULT_REFLECTION_TIME):
+    """Convert reflection sheet records into workload sessions."""
+    engines_by_id, ids_by_title = load_engines()
+    sessions = []
+    skipped = 0
+    for i, record in enumerate(records):
+        if record.get("Completion Status", "").strip().lower() != "completed":
+            continue
+        session = session_from_record(
+            record, engines_by_id, ids_by_title, f"row-{i + 1}",
+            think_time=think_time, reflection_time=reflection_time
+        )
+        if session is None:
+            skipped += 1
+        else:
+            sessions.append(session)
+    return sessions, skipped
+
+
+def load_sheet_export(csv_path):
+    """Read a CSV export of the reflection sheet into records."""
+    from generate_grades import parse_sheet_values
+
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        return parse_sheet_values(list(csv.reader(f)), verbose=False)
+
+
+def write_workload(sessions, path):
+    """Write sessions to a workload JSONL file, ordered by start time."""
+    with open(path, "w", encoding="utf-8") as f:
+        for session in sorted(sessions, key=lambda s: s["start"]):
+            f.write(json.dumps(session, ensure_ascii=False) + "\n")
+
+
+def read_workload(path):
+    """Read sessions from a workload JSONL file."""
+    sessions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                sessions.append(json.loads(line))
+    return sessions
+
+
+def _button_key(engine, click):
+    """Return the widget key of the button a click presses."""
+    scene = engine.scenes[click["scene"]]
+    if scene["type"] == "choice":
+        return f"choice_{click['scene']}_{click['choice']}"
+    if scene["type"] == "conditional":
+        return f"conditional_continue_{click['scene']}"
+    return f"continue_{click['scene']}"
+
+
+def _sleep_until(clock_start, offset):
+    delay = clock_start + offset - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
+
+
+def _replay_session(session, engine, origin, speedup, clock_start, app_file, submit, timeout):
+    """Replay one session in its own AppTest instance and return timing events."""
+    from streamlit.testing.v1 import AppTest
+
+    events = []
+
+    def timed(kind, scheduled, action):
+        _sleep_until(clock_start, scheduled)
+        started = time.monotonic()
+        error = None
+        try:
+            action()
+        except Exception as e:
+            error = str(e)
+        finished = time.monotonic()
+        events.append({
+            "session": session["session"],
+            "scenario": session["scenario"],
+            "kind": kind,
+            "scheduled": scheduled,
+            "started": started - clock_start,
+            "latency": finished - started,
+            "error": error,
+        })
+        return error is None
+
+    app = AppTest.from_file(app_file, default_timeout=timeout)
+    app.query_params["scenario"] = session["scenario"]
+
+    if not timed("load", (session["start"] - origin) / speedup, app.run):
+        return events
+
+    for click in session["clicks"]:
+        key = _button_key(engine, click)
+
+        def press(key=key):
+            matches = [button for button in app.button if button.key == key]
+            if not matches:
+                raise LookupError(f"Button '{key}' not rendered")
+            matches[0].click().run()
+
+        if not timed("click", (click["at"] - origin) / speedup, press):
+            return events
+
+    if submit and session.get("submit_at"):
+        progress = app.session_state["scenario_progress"]
+        end_scene_id = engine.compiled.scene_ids[progress.scene]
+
+        def submit_reflection():
+            selectbox = app.selectbox(key=f"student_name_{end_scene_id}")
+            if len(selectbox.options) > 1:
+                selectbox.select(selectbox.options[1])
+            for text_area in app.text_area:
+                text_area.input("Replayed reflection response")
+            app.button(key=f"submit_reflection_{end_scene_id}").click().run()
+
+        timed("submit", (session["submit_at"] - origin) / speedup, submit_reflection)
+
+    return events
+
+
+def route_submissions(sheet_url):
+    """Send the app's reflection writes to a test sheet, or to an in-memory one for "local".
+
+    Raises ValueError without a URL or for the live reflection sheet.
+    """
+    import sheets_integration
+
+    if not sheet_url:
+        raise ValueError('Replaying submissions writes to the sheet; pass a test sheet URL or "local"')
+    if sheet_url == LOCAL_SHEET:
+        from synthetic_data import LocalSheetsClient
+
+        client = LocalSheetsClient()
+        client.add_sheet("local://replay", [])
+        sheets_integration._authorize_client = lambda: client
+        sheet_url = "local://replay"
+    elif sheet_url == sheets_integration.get_sheet_url():
+        raise ValueError("Refusing to replay submissions into the live reflection sheet")
+    os.environ["GOOGLE_SHEET_URL"] = sheet_url
+    return sheet_url
+
+
+def replay_workload(sessions, speedup=1.0, max_workers=32, app_file="app.py", submit=False, timeout=30,
+                    sheet_url=None):
+    """Replay sessions concurrently against the app and return timing events.
+
+    With submit, reflections are written to sheet_url (see route_submissions).
+    """
+    if not sessions:
+        return []
+    if submit:
+        route_submissions(sheet_url)
+
+    engines_by_id, _ = load_engines()
+    origin = min(session["start"] for session in sessions)
+    clock_start = time.monotonic()
+
+    events = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                _replay_session, session, engines_by_id[session["scenario"]],
+                origin, speedup, clock_start, app_file, submit, timeout
+            )
+            for session in sorted(sessions, key=lambda s: s["start"])
+            if session["scenario"] in engines_by_id
+        ]
+        for future in futures:
+            events.extend(future.result())
+    return events
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize_events(events):
+    """Summarize replay latencies, scheduling lag and peak concurrency per event kind."""
+    summary = {}
+    for kind in sorted({event["kind"] for event in events}):
+        kind_events = [event for event in events if event["kind"] == kind]
+        latencies = [event["latency"] for event in kind_events]
+        lags = [max(0.0, event["started"] - event["scheduled"]) for event in kind_events]
+        summary[kind] = {
+            "count": len(kind_events),
+            "errors": sum(1 for event in kind_events if event["error"]),
+            "latency_p50": _percentile(latencies, 50),
+            "latency_p95": _percentile(latencies, 95),
+            "latency_p99": _percentile(latencies, 99),
+            "latency_max": max(latencies),
+            "latency_mean": statistics.fmean(latencies),
+            "lag_p95": _percentile(lags, 95),
+        }
+
+    # Peak number of requests in flight at the same moment
+    boundaries = []
+    for event in events:
+        boundaries.append((event["started"], 1))
+        boundaries.append((event["started"] + event["latency"], -1))
+    in_flight = peak = 0
+    for _, delta in sorted(boundaries):
+        in_flight += delta
+        peak = max(peak, in_flight)
+    summary["peak_concurrency"] = peak
+    return summary
+
+
+def main():
+    """Command line entry point for converting and replaying workloads."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert = subparsers.add_parser("convert", help="Build a workload from reflection sheet rows")
+    convert.add_argument("--csv", help="CSV export of the reflection sheet (default: read GOOGLE_SHEET_URL)")
+    convert.add_argument("-o", "--output", default="workload.jsonl")
+    convert.add_argument("--think-time", type=float, default=DEFAULT_THINK_TIME,
+                         help="Seconds between clicks when the sheet has no per-click times")
+    convert.add_argument("--reflection-time", type=float, default=DEFAULT_REFLECTION_TIME,
+                         help="Seconds spent writing the reflection before submitting")
+
+    replay = subparsers.add_parser("replay", help="Replay a workload against app.py")
+    replay.add_argument("workload")
+    replay.add_argument("--speedup", type=float, default=10.0)
+    replay.add_argument("--workers", type=int, default=32)
+    replay.add_argument("--limit", type=int, help="Replay only the first N sessions")
+    replay.add_argument("--submit", action="store_true", help="Also submit the reflection form")
+    replay.add_argument("--sheet-url", help='Test sheet for --submit, or "local" for an in-memory sheet')
+    replay.add_argument("--events", help="Write per-request timing events to this JSONL file")
+
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        if args.csv:
+            records = load_sheet_export(args.csv)
+        else:
+            from generate_grades import read_google_sheet
+            sheet_url = os.getenv("GOOGLE_SHEET_URL")
+            if not sheet_url:
+                print("Error: pass --csv or set GOOGLE_SHEET_URL")
+                return
+            records = read_google_sheet(sheet_url) or []
+        sessions, skipped = records_to_workload(records, args.think_time, args.reflection_time)
+        write_workload(sessions, args.output)
+        print(f"Wrote {len(sessions)} sessions to {args.output} ({skipped} rows did not fit current scenarios)")
+
+    elif args.command == "replay":
+        if args.submit and not args.sheet_url:
+            parser.error('--submit writes reflections; pass --sheet-url with a test sheet or "local"')
+        sessions = read_workload(args.workload)
+        if args.limit:
+            sessions = sorted(sessions, key=lambda s: s["start"])[:args.limit]
+        print(f"Replaying {len(sessions)} sessions at {args.speedup}x with {args.workers} workers...")
+        try:
+            events = replay_workload(sessions, speedup=args.speedup, max_workers=args.workers, submit=args.submit,
+                                     sheet_url=args.sheet_url)
+        except ValueError as e:
+            print(f"Error: {str(e)}")
+            return
+        if args.events:
+            with open(args.events, "w", encoding="utf-8") as f:
+                for event in events:
+                    f.write(json.dumps(event) + "\n")
+        print(json.dumps(summarize_events(events), indent=2))
+
+
+if __name__ == "__main__":
+    main()